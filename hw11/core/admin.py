@@ -0,0 +1,19 @@
+from django.contrib import admin
+
+from .models import QueryFingerprint
+
+
+@admin.register(QueryFingerprint)
+class QueryFingerprintAdmin(admin.ModelAdmin):
+    list_display = ('sql', 'reason', 'view', 'count', 'total_time', 'max_time', 'average_time', 'last_seen')
+    list_filter = ('reason', 'view')
+    search_fields = ('sql', 'view', 'call_site')
+    readonly_fields = ('fingerprint', 'reason', 'sql', 'sample_sql', 'sample_params', 'view', 'call_site', 'plan',
+                       'count', 'total_time', 'max_time', 'first_seen', 'last_seen')
+
+    @admin.display(description='average time (s)')
+    def average_time(self, obj):
+        return round(obj.total_time / obj.count, 4) if obj.count else 0
+
+    def has_add_permission(self, request):
+        return False
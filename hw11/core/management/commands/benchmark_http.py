@@ -0,0 +1,392 @@
+import json
+import random
+import re
+import secrets
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date
+from socketserver import ThreadingMixIn
+from typing import Callable, NamedTuple
+from unittest import mock
+from wsgiref.simple_server import make_server, WSGIServer, WSGIRequestHandler
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import get_resolver, reverse, URLResolver
+
+from accounts.models import CustomUser, Profile, PasswordResetToken
+from blog.models import Category, Post, Comment, PostLike, CommentLike, Follow
+from weather.geo import encode_geohash
+from weather.http_client import session
+from weather.models import Country, City, UserCity, WeatherSnapshot, AlertSubscription, AlertNotification
+from weather.quota import quota_manager
+from weather.simulator import UpstreamSimulator, FaultProfile, LatencyModel
+
+
+NAMESPACES = ('blog', 'accounts', 'weather')
+
+SERVER_TIMING_QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+BENCHMARK_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmark-http',
+    }
+}
+
+
+class Route(NamedTuple):
+    name: str
+    method: str = 'GET'
+    kwargs: Callable[[dict], dict] = lambda data: {}
+    params: Callable[[dict, int], dict] = lambda data, index: {}
+
+
+ROUTES = (
+    Route('blog:post_list'),
+    Route('blog:post_category', kwargs=lambda data: {'category': data['category'].slug}),
+    Route('blog:search_posts', params=lambda data, index: {'search_query': 'post', 'search_param': 'post'}),
+    Route('blog:post_detail', kwargs=lambda data: {'year': data['post'].publish.year,
+                                                   'month': data['post'].publish.month,
+                                                   'day': data['post'].publish.day,
+                                                   'post_slug': data['post'].slug}),
+    Route('blog:add_post'),
+    Route('blog:update_post', kwargs=lambda data: {'post_id': data['post'].id}),
+    Route('blog:post_like', 'POST', kwargs=lambda data: {'post_id': data['sandbox_post'].id}),
+    Route('blog:post_dislike', 'POST', kwargs=lambda data: {'post_id': data['sandbox_post'].id}),
+    Route('blog:add_comment', 'POST', kwargs=lambda data: {'post_id': data['sandbox_post'].id},
+          params=lambda data, index: {'body': f'Benchmark comment {index}'}),
+    Route('blog:comment_like', 'POST', kwargs=lambda data: {'comment_id': data['sandbox_comment'].id}),
+    Route('blog:comment_dislike', 'POST', kwargs=lambda data: {'comment_id': data['sandbox_comment'].id}),
+    Route('blog:toggle_comment_active', 'POST', kwargs=lambda data: {'comment_id': data['sandbox_comment'].id}),
+    Route('accounts:register'),
+    Route('accounts:reactivate_sent'),
+    Route('accounts:password_reset_sent'),
+    Route('accounts:password_reset_done', kwargs=lambda data: {'username': data['other'].username,
+                                                               'token': data['reset_token'].token}),
+    Route('accounts:password_change', kwargs=lambda data: {'username': data['user'].username}),
+    Route('accounts:login'),
+    Route('accounts:profile_create'),
+    Route('accounts:profile_update', kwargs=lambda data: {'username': data['user'].username}),
+    Route('accounts:profile_detail', kwargs=lambda data: {'username': data['user'].username}),
+    Route('accounts:follow_user', kwargs=lambda data: {'username': data['other'].username}),
+    Route('accounts:unfollow_user', kwargs=lambda data: {'username': data['other'].username}),
+    Route('accounts:followers', kwargs=lambda data: {'username': data['user'].username}),
+    Route('accounts:following', kwargs=lambda data: {'username': data['user'].username}),
+    Route('weather:today'),
+    Route('weather:today', 'POST', params=lambda data, index: {'city': data['city'].name}),
+    Route('weather:city_autocomplete', params=lambda data, index: {'q': data['city'].name[:3]}),
+    Route('weather:user_city_create', 'POST', params=lambda data, index: {
+        'city': f'Benchmark City {index}', 'country_code': data['country'].code,
+        'lat': random.Random(index).uniform(-80, 80), 'lon': random.Random(index).uniform(-180, 180)}),
+    Route('weather:user_city_import'),
+    Route('weather:user_city_list'),
+    Route('weather:user_city_delete', 'POST'),
+    Route('weather:city_detail', kwargs=lambda data: {'slug': data['city'].slug}),
+    Route('weather:city_forecast', kwargs=lambda data: {'slug': data['city'].slug}),
+    Route('weather:user_forecast_json'),
+    Route('weather:alert_create', 'POST', kwargs=lambda data: {'slug': data['city'].slug},
+          params=lambda data, index: {'metric': AlertSubscription.TEMPERATURE, 'upper': 30 + index}),
+    Route('weather:notification_list'),
+    Route('weather:quota_usage'),
+    Route('weather:country_detail', kwargs=lambda data: {'slug': data['country'].slug}),
+)
+
+SKIPPED = {
+    'blog:delete_post': 'removes the seeded post',
+    'blog:delete_comment': 'removes the seeded comment',
+    'accounts:activate': 'consumes a single-use token',
+    'accounts:logout': 'ends the benchmark session',
+    'weather:alert_delete': 'removes the seeded alert',
+}
+
+
+class Command(BaseCommand):
+    help = 'Benchmark every blog, accounts and weather route on a seeded test database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help='Requests per route')
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--server', action='store_true',
+                            help='Serve the project over a threaded WSGI server instead of the test client')
+        parser.add_argument('--routes', nargs='*', help='Only run routes whose name contains one of these')
+        parser.add_argument('--posts', type=int, default=100)
+        parser.add_argument('--comments', type=int, default=20, help='Comments per post')
+        parser.add_argument('--cities', type=int, default=100)
+        parser.add_argument('--latency', default='fixed:20', help='Upstream latency, see benchmark_upstreams')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write results as JSON to this path')
+        parser.add_argument('--baseline', help='Compare against results previously written with --output')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Allowed relative p95 growth before a route counts as a regression')
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **options):
+        self._check_coverage()
+        routes = [route for route in ROUTES
+                  if not options['routes'] or any(part in route.name for part in options['routes'])]
+
+        results = {}
+        profile = FaultProfile(latency=LatencyModel.parse(options['latency']))
+        with UpstreamSimulator(default=profile, seed=options['seed']) as simulator, quota_manager.override({}), \
+                self._test_database():
+            simulator.install(session)
+            try:
+                data = self._seed(options)
+                with self._clients(data['user'], options['server']) as client_factory:
+                    for route in routes:
+                        key = f'{route.method} {route.name}'
+                        results[key] = self._run(route, data, client_factory, options['requests'],
+                                                 options['concurrency'])
+                        self._report(key, results[key])
+            finally:
+                simulator.uninstall(session)
+
+        if options['output']:
+            report = {'options': {key: options[key] for key in ('requests', 'concurrency', 'server', 'posts',
+                                                                'comments', 'cities', 'latency', 'seed')},
+                      'results': results}
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Results written to {options["output"]}'))
+
+        if options['baseline']:
+            regressions = self._compare(results, options['baseline'], options['tolerance'])
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f'{regressions} routes regressed against {options["baseline"]}')
+
+    def _check_coverage(self):
+        names = set()
+        for resolver in get_resolver().url_patterns:
+            if isinstance(resolver, URLResolver) and resolver.namespace in NAMESPACES:
+                names.update(f'{resolver.namespace}:{pattern.name}' for pattern in resolver.url_patterns
+                             if pattern.name)
+        missing = names - {route.name for route in ROUTES} - set(SKIPPED)
+        for name in sorted(missing):
+            self.stderr.write(self.style.WARNING(f'{name} is not covered by the benchmark'))
+        for name, reason in SKIPPED.items():
+            self.stdout.write(f'Skipping {name}: {reason}')
+
+    def _run(self, route, data, client_factory, requests_count, concurrency):
+        url = reverse(route.name, kwargs=route.kwargs(data))
+        allocated = self._measure_allocations(route, data, url, client_factory)
+
+        latencies, queries, errors = [], [], 0
+        lock = threading.Lock()
+        local = threading.local()
+
+        def call(index):
+            nonlocal errors
+            if not hasattr(local, 'client'):
+                local.client = client_factory()
+            started = time.perf_counter()
+            try:
+                status, server_timing = local.client(route.method, url, route.params(data, index))
+                failed = status >= 400
+            except Exception:
+                status, server_timing, failed = None, '', True
+            elapsed = time.perf_counter() - started
+            match = SERVER_TIMING_QUERIES.search(server_timing)
+            with lock:
+                latencies.append(elapsed)
+                errors += failed
+                if match:
+                    queries.append(int(match.group(1)))
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(call, range(requests_count)))
+        duration = time.perf_counter() - started
+
+        quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+        return {
+            'url': url,
+            'requests': requests_count,
+            'errors': errors,
+            'throughput': round(requests_count / duration, 2),
+            'p50_ms': round(quantiles[49] * 1000, 2),
+            'p95_ms': round(quantiles[94] * 1000, 2),
+            'p99_ms': round(quantiles[98] * 1000, 2),
+            'queries': statistics.median(queries) if queries else None,
+            'allocated_kb': allocated,
+        }
+
+    @staticmethod
+    def _measure_allocations(route, data, url, client_factory):
+        client = client_factory()
+        client(route.method, url, route.params(data, -1))
+        tracemalloc.start()
+        try:
+            client(route.method, url, route.params(data, -2))
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return round(peak / 1024, 1)
+
+    def _report(self, key, result):
+        self.stdout.write(f'{key:<42} p50 {result["p50_ms"]:>8} ms  p95 {result["p95_ms"]:>8} ms  '
+                          f'p99 {result["p99_ms"]:>8} ms  {result["queries"] or "-":>5} queries  '
+                          f'{result["allocated_kb"]:>9} KiB  errors {result["errors"]}/{result["requests"]}')
+
+    def _compare(self, results, baseline_path, tolerance):
+        try:
+            with open(baseline_path) as file:
+                baseline = json.load(file)['results']
+        except (OSError, ValueError, KeyError) as error:
+            raise CommandError(f'Cannot read baseline {baseline_path}: {error}')
+
+        regressions = 0
+        self.stdout.write(f'\nCompared with {baseline_path}:')
+        for key, result in results.items():
+            previous = baseline.get(key)
+            if previous is None:
+                self.stdout.write(f'{key:<42} new route')
+                continue
+            change = (result['p95_ms'] - previous['p95_ms']) / previous['p95_ms'] if previous['p95_ms'] else 0
+            more_queries = (result['queries'] or 0) > (previous['queries'] or 0)
+            line = (f'{key:<42} p95 {previous["p95_ms"]:>8} -> {result["p95_ms"]:>8} ms ({change:+.0%})  '
+                    f'queries {previous["queries"] or "-"} -> {result["queries"] or "-"}')
+            if change > tolerance or more_queries:
+                regressions += 1
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(line)
+        return regressions
+
+    def _seed(self, options):
+        rng = random.Random(options['seed'])
+        user = CustomUser.objects.create_user('bench@example.com', 'bench', 'Bench', 'User', 'benchmark-password',
+                                              is_superuser=True)
+        other = CustomUser.objects.create_user('other@example.com', 'other', 'Other', 'User', 'benchmark-password')
+        for account in (user, other):
+            Profile(user=account, gender='male', date_of_birth=date(1990, 1, 1), bio='-', info='-').save()
+        Follow.objects.create(follower=other, followed=user)
+
+        categories = Category.objects.bulk_create(Category(name=f'Category {index}', slug=f'category-{index}')
+                                                  for index in range(5))
+        posts = Post.objects.bulk_create(
+            Post(title=f'Benchmark post {index}', slug=f'benchmark-post-{index}', author=user,
+                 body='Lorem ipsum dolor sit amet. ' * 40, status='published',
+                 image_url='https://example.com/post.png', category=rng.choice(categories))
+            for index in range(options['posts'] + 1))
+        comments = Comment.objects.bulk_create(
+            Comment(post=post, author=rng.choice((user, other)), body=f'Comment {index}')
+            for post in posts for index in range(options['comments']))
+        PostLike.objects.bulk_create(PostLike(post=post, user=other) for post in posts)
+        CommentLike.objects.bulk_create(CommentLike(comment=comment, user=other) for comment in comments[::2])
+
+        country = Country.objects.create(name='Ukraine', slug='ukraine', code='UA')
+        cities = City.objects.bulk_create(
+            City(name=f'Benchmark Town {index}', slug=f'benchmark-town-{index}', lat=44 + index * 0.05,
+                 lon=22 + index * 0.1, geohash=encode_geohash(44 + index * 0.05, 22 + index * 0.1), country=country)
+            for index in range(options['cities']))
+        UserCity.objects.bulk_create(UserCity(user=user, city=city) for city in cities)
+        WeatherSnapshot.objects.bulk_create(
+            WeatherSnapshot(city=city, condition='Clouds', icon='04d', temperature=rng.randint(-10, 30),
+                            wind_speed=rng.uniform(0, 15), humidity=rng.randint(20, 100),
+                            observed=posts[0].publish)
+            for city in cities)
+        alert = AlertSubscription.objects.create(user_city=UserCity.objects.filter(user=user).first(),
+                                                 metric=AlertSubscription.TEMPERATURE, upper=25)
+        AlertNotification.objects.create(subscription=alert, value=27, window=0)
+
+        return {
+            'user': user,
+            'other': other,
+            'reset_token': PasswordResetToken.objects.create(user=other),
+            'category': categories[0],
+            'post': Post.objects.exclude(id=posts[-1].id).first(),
+            'sandbox_post': posts[-1],
+            'sandbox_comment': Comment.objects.filter(post=posts[-1]).first(),
+            'country': country,
+            'city': cities[0],
+        }
+
+    @contextmanager
+    def _clients(self, user, server):
+        if not server:
+            def client_factory():
+                client = Client(raise_request_exception=False)
+                client.force_login(user)
+
+                def call(method, url, params):
+                    if method == 'GET':
+                        response = client.get(url, params, HTTP_REFERER=url)
+                    else:
+                        response = client.post(url, params, HTTP_REFERER=url)
+                    return response.status_code, response.get('Server-Timing', '')
+                return call
+
+            yield client_factory
+            return
+
+        application = get_wsgi_application()
+        httpd = make_server('127.0.0.1', 0, application, server_class=_ThreadingWSGIServer,
+                            handler_class=_QuietHandler)
+        thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+        thread.start()
+        base_url = f'http://127.0.0.1:{httpd.server_port}'
+        login = Client()
+        login.force_login(user)
+        session_id = login.cookies[settings.SESSION_COOKIE_NAME].value
+
+        def client_factory():
+            http_session = requests.Session()
+            csrf_token = secrets.token_hex(16)
+            http_session.cookies.set(settings.SESSION_COOKIE_NAME, session_id)
+            http_session.cookies.set(settings.CSRF_COOKIE_NAME, csrf_token)
+            http_session.headers['X-CSRFToken'] = csrf_token
+
+            def call(method, url, params):
+                if method == 'GET':
+                    response = http_session.get(base_url + url, params=params, headers={'Referer': base_url + url},
+                                                allow_redirects=False)
+                else:
+                    response = http_session.post(base_url + url, data=params, headers={'Referer': base_url + url},
+                                                 allow_redirects=False)
+                return response.status_code, response.headers.get('Server-Timing', '')
+            return call
+
+        try:
+            yield client_factory
+        finally:
+            httpd.shutdown()
+            httpd.server_close()
+
+    @contextmanager
+    def _test_database(self):
+        setup_test_environment()
+        settings.ALLOWED_HOSTS = ['*']
+        settings.DATABASES['default'].setdefault('TEST', {})['NAME'] = \
+            tempfile.NamedTemporaryFile(suffix='.sqlite3').name
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            # Background enrichment would outlive the temporary database, so only the request itself is measured
+            with override_settings(CACHES=BENCHMARK_CACHES), mock.patch('weather.views.enqueue_city_enrichment'):
+                try:
+                    yield
+                finally:
+                    cache.clear()
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
@@ -0,0 +1,125 @@
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, connections, transaction, OperationalError
+
+from blog.models import Post, PostLike
+
+
+PROFILES = (
+    ('default', 'django.db.backends.sqlite3', 'delete'),
+    ('tuned', 'core.sqlite_backend', 'wal'),
+)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark mixed read/write throughput of the default and the tuned SQLite connection profile'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--duration', type=float, default=10, help='Seconds per profile')
+        parser.add_argument('--write-ratio', type=float, default=0.2)
+        parser.add_argument('--scale', type=float, default=0.01, help='Size of the generated dataset')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        with self._test_database() as source:
+            call_command('generate_fake_data', scale=options['scale'], seed=options['seed'], reactions=0,
+                         stdout=open(os.devnull, 'w'))
+            users = list(Post.objects.values_list('author_id', flat=True).distinct()[:1000])
+            posts = list(Post.objects.values_list('id', flat=True)[:1000])
+
+            results = {}
+            for name, engine, journal_mode in PROFILES:
+                path = os.path.join(os.path.dirname(source), f'{name}.sqlite3')
+                with sqlite3.connect(path) as target:
+                    connection.connection.backup(target)
+                    target.execute(f'PRAGMA journal_mode = {journal_mode}')
+                connections.settings[name] = {**connection.settings_dict, 'ENGINE': engine, 'NAME': path}
+                results[name] = self._run(name, users, posts, options)
+                self._report(name, results[name], options['duration'])
+
+        baseline, tuned = (len(results[name]['latencies']) / options['duration'] for name, _, _ in PROFILES)
+        self.stdout.write(self.style.SUCCESS(f'Throughput x{tuned / baseline:.2f}'))
+
+    @contextmanager
+    def _test_database(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, 'source.sqlite3')
+            settings.DATABASES['default'].setdefault('TEST', {})['NAME'] = source
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+            try:
+                yield source
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def _run(self, alias, users, posts, options):
+        results = {'latencies': [], 'reads': 0, 'writes': 0, 'errors': 0}
+        lock = threading.Lock()
+        deadline = time.perf_counter() + options['duration']
+
+        def worker(index):
+            rng = random.Random(options['seed'] * 1000 + index)
+            latencies, reads, writes, errors = [], 0, 0, 0
+            try:
+                while time.perf_counter() < deadline:
+                    write = rng.random() < options['write_ratio']
+                    started = time.perf_counter()
+                    try:
+                        if write:
+                            self._toggle_like(alias, rng.choice(posts), rng.choice(users))
+                        else:
+                            self._read_posts(alias, rng.choice(users))
+                    except OperationalError:
+                        errors += 1
+                        continue
+                    latencies.append(time.perf_counter() - started)
+                    writes += write
+                    reads += not write
+            finally:
+                connections[alias].close()
+            with lock:
+                results['latencies'].extend(latencies)
+                results['reads'] += reads
+                results['writes'] += writes
+                results['errors'] += errors
+
+        with ThreadPoolExecutor(max_workers=options['threads']) as executor:
+            list(executor.map(worker, range(options['threads'])))
+        return results
+
+    @staticmethod
+    def _read_posts(alias, user_id):
+        list(Post.objects.using(alias).filter(status='published').select_related('author', 'category')
+             .order_by('-publish')[:20])
+        PostLike.objects.using(alias).filter(user_id=user_id).count()
+
+    @staticmethod
+    def _toggle_like(alias, post_id, user_id):
+        with transaction.atomic(using=alias):
+            like = PostLike.objects.using(alias).filter(post_id=post_id, user_id=user_id).first()
+            if like is None:
+                PostLike.objects.using(alias).create(post_id=post_id, user_id=user_id)
+            else:
+                like.delete()
+
+    def _report(self, name, results, duration):
+        latencies = sorted(results['latencies'])
+        if not latencies:
+            self.stdout.write(f'{name:<8} no successful operations, {results["errors"]} errors')
+            return
+        self.stdout.write(f'{name:<8} {len(latencies) / duration:>9.1f} ops/s  '
+                          f'reads {results["reads"]:>7}  writes {results["writes"]:>6}  '
+                          f'errors {results["errors"]:>5}  '
+                          f'p50 {statistics.median(latencies) * 1000:>7.2f} ms  '
+                          f'p95 {latencies[int(len(latencies) * 0.95)] * 1000:>7.2f} ms')
@@ -0,0 +1,317 @@
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils.text import slugify
+
+from accounts.models import CustomUser, Profile
+from blog.models import Category, Post, Comment, PostLike, PostDislike, CommentLike, CommentDislike, Follow
+from weather.geo import encode_geohash
+from weather.models import Country, City, UserCity
+
+
+FIRST_NAMES = ('Olena', 'Andrii', 'Iryna', 'Taras', 'Oksana', 'Dmytro', 'Kateryna', 'Mykola', 'Sofia', 'Yurii',
+               'Anna', 'Petro', 'Maria', 'Bohdan', 'Natalia', 'Serhii')
+LAST_NAMES = ('Shevchenko', 'Kovalenko', 'Bondarenko', 'Tkachenko', 'Kravchenko', 'Oliinyk', 'Shevchuk',
+              'Koval', 'Polishchuk', 'Bondar', 'Melnyk', 'Boiko')
+WORDS = ('weather', 'city', 'travel', 'river', 'morning', 'forecast', 'mountain', 'coffee', 'street', 'winter',
+         'summer', 'garden', 'museum', 'market', 'bridge', 'sunset', 'cloud', 'train', 'story', 'music')
+CATEGORIES = ('Travel', 'Weather', 'Food', 'Culture', 'History', 'Nature', 'Sport', 'Technology')
+COUNTRIES = (('UA', 'Ukraine'), ('PL', 'Poland'), ('DE', 'Germany'), ('FR', 'France'), ('IT', 'Italy'),
+             ('ES', 'Spain'), ('GB', 'United Kingdom'), ('US', 'United States'), ('CA', 'Canada'), ('JP', 'Japan'))
+
+POOL_SIZE = 4096
+
+
+class TableWriter:
+    def __init__(self, model, fields, batch_size):
+        quote_name = connection.ops.quote_name
+        meta = model._meta
+        columns = ', '.join(quote_name(meta.get_field(field).column) for field in fields)
+        placeholders = ', '.join(['%s'] * len(fields))
+        self.model = model
+        self.rows = 0
+        self._batch_size = batch_size
+        self._sql = f'INSERT INTO {quote_name(meta.db_table)} ({columns}) VALUES ({placeholders})'
+
+    def write(self, rows) -> None:
+        with connection.cursor() as cursor:
+            for start in range(0, len(rows), self._batch_size):
+                cursor.executemany(self._sql, rows[start:start + self._batch_size])
+        self.rows += len(rows)
+
+
+class Command(BaseCommand):
+    help = 'Fill the database with a large deterministic synthetic dataset for blog, accounts and weather'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100_000)
+        parser.add_argument('--posts', type=int, default=1_000_000)
+        parser.add_argument('--comments', type=int, default=5_000_000)
+        parser.add_argument('--reactions', type=int, default=10_000_000,
+                            help='Post and comment likes and dislikes together')
+        parser.add_argument('--follows', type=float, default=20, help='Average number of users each user follows')
+        parser.add_argument('--cities', type=int, default=20_000)
+        parser.add_argument('--user-cities', type=float, default=3, help='Average number of cities per user')
+        parser.add_argument('--scale', type=float, default=1, help='Multiply every count by this factor')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=10_000)
+        parser.add_argument('--keep-indexes', action='store_true',
+                            help='Do not drop secondary indexes while loading')
+
+    def handle(self, *args, **options):
+        scale = options['scale']
+        self._rng = np.random.default_rng(options['seed'])
+        self._batch_size = options['batch_size']
+        self._now = datetime(2026, 1, 1, tzinfo=dt_timezone.utc)
+        self._timestamps = [connection.ops.adapt_datetimefield_value(self._now - timedelta(seconds=int(offset)))
+                            for offset in np.sort(self._rng.integers(0, 2 * 365 * 24 * 3600, POOL_SIZE))[::-1]]
+        self._sentences = [' '.join(self._rng.choice(WORDS, 12)).capitalize() + '.' for _ in range(POOL_SIZE)]
+
+        counts = {
+            'users': int(options['users'] * scale),
+            'posts': int(options['posts'] * scale),
+            'comments': int(options['comments'] * scale),
+            'reactions': int(options['reactions'] * scale),
+            'cities': int(options['cities'] * scale),
+        }
+        models = (CustomUser, Profile, Post, Comment, PostLike, PostDislike, CommentLike, CommentDislike, Follow,
+                  City, UserCity)
+
+        started = time.perf_counter()
+        writers = []
+        with self._bulk_load(models, defer_indexes=not options['keep_indexes']):
+            users = self._generate_users(counts['users'], writers)
+            posts = self._generate_posts(counts['posts'], users, writers)
+            comments = self._generate_comments(counts['comments'], posts, users, writers)
+            self._generate_reactions(counts['reactions'], posts, comments, users, writers)
+            self._generate_follows(options['follows'], users, writers)
+            cities = self._generate_cities(counts['cities'], writers)
+            self._generate_user_cities(options['user_cities'], users, cities, writers)
+        duration = time.perf_counter() - started
+
+        total = sum(writer.rows for writer in writers)
+        for writer in writers:
+            self.stdout.write(f'{writer.model.__name__:<16} {writer.rows:>12,} rows')
+        self.stdout.write(self.style.SUCCESS(f'Inserted {total:,} rows in {duration:.1f} s '
+                                             f'({total / duration:,.0f} rows/s)'))
+
+    @contextmanager
+    def _bulk_load(self, models, defer_indexes):
+        indexes = self._drop_indexes(models) if defer_indexes else []
+        try:
+            with connection.constraint_checks_disabled():
+                if connection.vendor == 'sqlite':
+                    with connection.cursor() as cursor:
+                        cursor.execute('PRAGMA synchronous = OFF')
+                        cursor.execute('PRAGMA cache_size = -200000')
+                yield
+        finally:
+            if indexes:
+                started = time.perf_counter()
+                with connection.cursor() as cursor:
+                    for sql in indexes:
+                        cursor.execute(sql)
+                self.stdout.write(f'Recreated {len(indexes)} indexes in {time.perf_counter() - started:.1f} s')
+
+    @staticmethod
+    def _drop_indexes(models):
+        if connection.vendor != 'sqlite':
+            return []
+        tables = [model._meta.db_table for model in models]
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT name, sql FROM sqlite_master WHERE type = %s AND sql IS NOT NULL '
+                           f'AND tbl_name IN ({", ".join(["%s"] * len(tables))})', ['index', *tables])
+            indexes = cursor.fetchall()
+            for name, _ in indexes:
+                cursor.execute(f'DROP INDEX {connection.ops.quote_name(name)}')
+        return [sql for _, sql in indexes]
+
+    def _writer(self, writers, model, fields):
+        writer = TableWriter(model, fields, self._batch_size)
+        writers.append(writer)
+        return writer
+
+    def _batches(self, count):
+        for start in range(0, count, self._batch_size):
+            yield start, min(self._batch_size, count - start)
+
+    def _times(self, size):
+        return [self._timestamps[index] for index in self._rng.integers(0, POOL_SIZE, size).tolist()]
+
+    def _texts(self, size):
+        return [self._sentences[index] for index in self._rng.integers(0, POOL_SIZE, size).tolist()]
+
+    @staticmethod
+    def _next_id(model):
+        return (model.objects.order_by('-id').values_list('id', flat=True).first() or 0) + 1
+
+    def _power_law(self, size, exponent):
+        weights = 1 / np.arange(1, size + 1) ** exponent
+        return self._rng.permutation(weights / weights.sum())
+
+    def _generate_users(self, count, writers):
+        first_id = self._next_id(CustomUser)
+        first_profile_id = self._next_id(Profile)
+        password = make_password('fake-password', salt='fakedata')
+        users = self._writer(writers, CustomUser, ['id', 'password', 'is_superuser', 'first_name', 'last_name',
+                                                   'is_staff', 'is_active', 'date_joined', 'username', 'email'])
+        profiles = self._writer(writers, Profile, ['id', 'user_id', 'avatar', 'gender', 'date_of_birth', 'bio',
+                                                   'info'])
+        birth_dates = [date(1950, 1, 1) + timedelta(days=days) for days in range(0, 50 * 365, 7)]
+
+        for start, size in self._batches(count):
+            with transaction.atomic():
+                ids = range(first_id + start, first_id + start + size)
+                first_names = self._rng.integers(0, len(FIRST_NAMES), size).tolist()
+                last_names = self._rng.integers(0, len(LAST_NAMES), size).tolist()
+                users.write(list(zip(ids, [password] * size, [False] * size,
+                                     [FIRST_NAMES[index] for index in first_names],
+                                     [LAST_NAMES[index] for index in last_names],
+                                     [False] * size, [True] * size, self._times(size),
+                                     [f'fake{user_id}' for user_id in ids],
+                                     [f'fake{user_id}@example.com' for user_id in ids])))
+                profiles.write(list(zip(range(first_profile_id + start, first_profile_id + start + size), ids,
+                                        [''] * size, self._rng.choice(('male', 'female'), size).tolist(),
+                                        [connection.ops.adapt_datefield_value(birth_dates[index]) for index in
+                                         self._rng.integers(0, len(birth_dates), size).tolist()],
+                                        self._texts(size), self._texts(size))))
+        return np.arange(first_id, first_id + count)
+
+    def _generate_posts(self, count, users, writers):
+        categories = [Category.objects.get_or_create(name=name, defaults={'slug': slugify(name)})[0].id
+                      for name in CATEGORIES]
+        first_id = self._next_id(Post)
+        authors = self._power_law(len(users), 1.2)
+        posts = self._writer(writers, Post, ['id', 'title', 'slug', 'author_id', 'body', 'publish', 'created',
+                                             'updated', 'image_url', 'status', 'category_id'])
+
+        for start, size in self._batches(count):
+            with transaction.atomic():
+                ids = range(first_id + start, first_id + start + size)
+                times = self._times(size)
+                titles = self._texts(size)
+                posts.write(list(zip(ids, titles, [f'{slugify(title)[:180]}-{post_id}'
+                                                   for title, post_id in zip(titles, ids)],
+                                     self._rng.choice(users, size, p=authors).tolist(),
+                                     self._texts(size), times, times, times,
+                                     ['https://picsum.photos/seed/post/800/400'] * size,
+                                     np.where(self._rng.random(size) < 0.9, 'published', 'draft').tolist(),
+                                     self._rng.choice(categories, size).tolist())))
+        return np.arange(first_id, first_id + count)
+
+    def _generate_comments(self, count, posts, users, writers):
+        first_id = self._next_id(Comment)
+        popularity = self._power_law(len(posts), 1.1) if len(posts) else None
+        comments = self._writer(writers, Comment, ['id', 'post_id', 'author_id', 'body', 'created', 'updated',
+                                                   'active'])
+
+        for start, size in self._batches(count if len(posts) else 0):
+            with transaction.atomic():
+                times = self._times(size)
+                comments.write(list(zip(range(first_id + start, first_id + start + size),
+                                        self._rng.choice(posts, size, p=popularity).tolist(),
+                                        self._rng.choice(users, size).tolist(),
+                                        [text[:255] for text in self._texts(size)], times, times,
+                                        (self._rng.random(size) < 0.97).tolist())))
+        return np.arange(first_id, first_id + count if len(posts) else first_id)
+
+    def _generate_reactions(self, count, posts, comments, users, writers):
+        post_count = int(count * 0.6) if len(comments) else count
+        for targets, total, likes_model, dislikes_model, target_field in (
+                (posts, post_count, PostLike, PostDislike, 'post_id'),
+                (comments, count - post_count, CommentLike, CommentDislike, 'comment_id')):
+            likes = self._writer(writers, likes_model, ['id', target_field, 'user_id', 'created'])
+            dislikes = self._writer(writers, dislikes_model, ['id', target_field, 'user_id', 'created'])
+            if not len(targets) or not total:
+                continue
+
+            per_target = np.minimum(self._rng.multinomial(total, self._power_law(len(targets), 1.0)), len(users))
+            next_ids = [self._next_id(likes_model), self._next_id(dislikes_model)]
+            step = self._coprime_step(len(users))
+            offsets = self._rng.integers(0, len(users), len(targets))
+
+            for start, size in self._batches(len(targets)):
+                reactions = per_target[start:start + size]
+                target_ids = np.repeat(targets[start:start + size], reactions)
+                ranks = np.arange(reactions.sum()) - np.repeat(np.cumsum(reactions) - reactions, reactions)
+                user_ids = users[(np.repeat(offsets[start:start + size], reactions) + ranks * step) % len(users)]
+                is_like = ranks < np.repeat(np.ceil(reactions * 0.8), reactions)
+
+                with transaction.atomic():
+                    for writer, mask, index in ((likes, is_like, 0), (dislikes, ~is_like, 1)):
+                        size = int(mask.sum())
+                        writer.write(list(zip(range(next_ids[index], next_ids[index] + size),
+                                              target_ids[mask].tolist(), user_ids[mask].tolist(),
+                                              self._times(size))))
+                        next_ids[index] += size
+
+    def _generate_follows(self, average, users, writers):
+        follows = self._writer(writers, Follow, ['id', 'follower_id', 'followed_id', 'created'])
+        if len(users) < 2:
+            return
+        next_id = self._next_id(Follow)
+        popularity = self._power_law(len(users), 1.1)
+
+        for start, size in self._batches(len(users)):
+            followers = users[start:start + size]
+            degrees = np.minimum(self._rng.zipf(2.0, size) * average / 2.5, len(users) - 1).astype(np.int64)
+            follower_ids = np.repeat(followers, degrees)
+            followed_ids = self._rng.choice(users, len(follower_ids), p=popularity)
+            pairs = np.unique(np.column_stack((follower_ids, followed_ids)), axis=0)
+            pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+
+            with transaction.atomic():
+                follows.write(list(zip(range(next_id, next_id + len(pairs)), pairs[:, 0].tolist(),
+                                       pairs[:, 1].tolist(), self._times(len(pairs)))))
+            next_id += len(pairs)
+
+    def _generate_cities(self, count, writers):
+        countries = []
+        for code, name in COUNTRIES:
+            country, _ = Country.objects.get_or_create(code=code, defaults={
+                'name': name, 'slug': slugify(name), 'enrichment_status': Country.DONE})
+            countries.append(country.id)
+
+        first_id = self._next_id(City)
+        cities = self._writer(writers, City, ['id', 'name', 'slug', 'image', 'lat', 'lon', 'geohash', 'country_id',
+                                              'enrichment_status', 'enrichment_attempts', 'summary',
+                                              'description_zlib'])
+        for start, size in self._batches(count):
+            with transaction.atomic():
+                ids = range(first_id + start, first_id + start + size)
+                lat = np.round(self._rng.uniform(-60, 70, size), 5).tolist()
+                lon = np.round(self._rng.uniform(-180, 180, size), 5).tolist()
+                cities.write(list(zip(ids, [f'Fake City {city_id}' for city_id in ids],
+                                      [f'fake-city-{city_id}' for city_id in ids], [''] * size, lat, lon,
+                                      [encode_geohash(*point) for point in zip(lat, lon)],
+                                      self._rng.choice(countries, size).tolist(), [City.DONE] * size,
+                                      [0] * size, [''] * size, [b''] * size)))
+        return np.arange(first_id, first_id + count)
+
+    def _generate_user_cities(self, average, users, cities, writers):
+        user_cities = self._writer(writers, UserCity, ['id', 'user_id', 'city_id', 'created'])
+        if not len(cities):
+            return
+        next_id = self._next_id(UserCity)
+        popularity = self._power_law(len(cities), 1.0)
+
+        for start, size in self._batches(len(users)):
+            counts = self._rng.poisson(average, size)
+            pairs = np.unique(np.column_stack((np.repeat(users[start:start + size], counts),
+                                               self._rng.choice(cities, counts.sum(), p=popularity))), axis=0)
+            with transaction.atomic():
+                user_cities.write(list(zip(range(next_id, next_id + len(pairs)), pairs[:, 0].tolist(),
+                                           pairs[:, 1].tolist(), self._times(len(pairs)))))
+            next_id += len(pairs)
+
+    @staticmethod
+    def _coprime_step(size):
+        step = max(1, int(size * 0.618))
+        while np.gcd(step, size) != 1:
+            step += 1
+        return step
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.sqlite import sqlite_profile
+
+
+class Command(BaseCommand):
+    help = 'Run PRAGMA optimize and checkpoint the WAL of a SQLite database; meant to be scheduled periodically'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--checkpoint', default='TRUNCATE', choices=('PASSIVE', 'FULL', 'RESTART', 'TRUNCATE'))
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'sqlite':
+            raise CommandError(f'{options["database"]} is not a SQLite database')
+
+        busy, log, checkpointed = sqlite_profile.maintain(connection, checkpoint=options['checkpoint'])
+        if busy:
+            self.stdout.write(self.style.WARNING(f'Checkpoint was blocked, {checkpointed} of {log} WAL pages '
+                                                 f'written back'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Optimized, {checkpointed} of {log} WAL pages written back'))
@@ -0,0 +1,160 @@
+import bisect
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+from django.template.backends.django import DjangoTemplates, Template
+
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    _METRICS = {
+        'http_request_duration_seconds': ('histogram', 'Request wall time by URL name', DURATION_BUCKETS),
+        'http_requests_total': ('counter', 'Requests by URL name, method and status', None),
+        'template_render_duration_seconds': ('histogram', 'Template render time per request', DURATION_BUCKETS),
+        'db_query_duration_seconds': ('histogram', 'SQL time per request', DURATION_BUCKETS),
+        'db_queries_per_request': ('histogram', 'SQL queries per request', COUNT_BUCKETS),
+        'upstream_duration_seconds': ('histogram', 'Upstream HTTP time per request', DURATION_BUCKETS),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, Tuple], Histogram] = {}
+        self._counters: Dict[Tuple[str, Tuple], int] = defaultdict(int)
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self._METRICS[name][2])
+            histogram.observe(value)
+
+    def inc(self, name: str, **labels) -> None:
+        with self._lock:
+            self._counters[(name, tuple(sorted(labels.items())))] += 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def render(self) -> str:
+        with self._lock:
+            series = defaultdict(list)
+            for (name, labels), histogram in self._histograms.items():
+                series[name].append((labels, histogram.buckets, list(histogram.counts), histogram.sum,
+                                     histogram.count))
+            for (name, labels), value in self._counters.items():
+                series[name].append((labels, value))
+
+        lines = []
+        for name, (kind, help_text, _) in self._METRICS.items():
+            if name not in series:
+                continue
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for sample in sorted(series[name], key=lambda sample: sample[0]):
+                if kind == 'counter':
+                    labels, value = sample
+                    lines.append(f'{name}{_format_labels(labels)} {value}')
+                    continue
+                labels, buckets, counts, total, count = sample
+                cumulative = 0
+                for bound, bucket_count in zip(buckets + ('+Inf',), counts):
+                    cumulative += bucket_count
+                    lines.append(f'{name}_bucket{_format_labels(labels + (("le", str(bound)),))} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {round(total, 6)}')
+                lines.append(f'{name}_count{_format_labels(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(labels: Tuple) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class RequestTimings:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.template = 0.0
+        self.db = 0.0
+        self.queries = 0
+        self.upstreams: Dict[str, float] = defaultdict(float)
+
+    def add_template(self, duration: float) -> None:
+        with self._lock:
+            self.template += duration
+
+    def add_query(self, duration: float) -> None:
+        with self._lock:
+            self.db += duration
+            self.queries += 1
+
+    def add_upstream(self, name: str, duration: float) -> None:
+        with self._lock:
+            self.upstreams[name] += duration
+
+    def server_timing(self, total: float) -> str:
+        entries = [f'total;dur={total * 1000:.1f}',
+                   f'db;dur={self.db * 1000:.1f};desc="{self.queries} queries"',
+                   f'tpl;dur={self.template * 1000:.1f}']
+        entries.extend(f'upstream-{name};dur={duration * 1000:.1f}' for name, duration in self.upstreams.items())
+        return ', '.join(entries)
+
+
+current_timings: ContextVar[Optional[RequestTimings]] = ContextVar('current_timings', default=None)
+
+
+def record_upstream(name: str, duration: float) -> None:
+    timings = current_timings.get()
+    if timings is not None:
+        timings.add_upstream(name, duration)
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        timings = current_timings.get()
+        if timings is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            timings.add_template(time.perf_counter() - started)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
+
+
+metrics = MetricsRegistry()
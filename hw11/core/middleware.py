@@ -1,5 +1,11 @@
+import time
+from contextlib import ExitStack
+
 from django.core.exceptions import PermissionDenied
+from django.db import connections
 from django.http import Http404
+from core.metrics import metrics, current_timings, RequestTimings
+from core.query_log import query_log_recorder
 from core.views import handler403, handler404
 
 
@@ -24,3 +30,62 @@ class PageNotFoundMiddleware(BaseMiddleware):
     def process_exception(self, request, exception):
         if isinstance(exception, Http404):
             return handler404(request, exception)
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(self._make_wrapper(timings)))
+                response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+
+        total = time.perf_counter() - timings.started
+        response['Server-Timing'] = timings.server_timing(total)
+        self._record(request, response, timings, total)
+        return response
+
+    @staticmethod
+    def _make_wrapper(timings):
+        def wrapper(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                timings.add_query(time.perf_counter() - started)
+        return wrapper
+
+    @staticmethod
+    def _record(request, response, timings, total):
+        match = request.resolver_match
+        view = match.view_name if match is not None else 'unresolved'
+        metrics.inc('http_requests_total', view=view, method=request.method, status=response.status_code)
+        metrics.observe('http_request_duration_seconds', total, view=view)
+        metrics.observe('template_render_duration_seconds', timings.template, view=view)
+        metrics.observe('db_query_duration_seconds', timings.db, view=view)
+        metrics.observe('db_queries_per_request', timings.queries, view=view)
+        for upstream, duration in timings.upstreams.items():
+            metrics.observe('upstream_duration_seconds', duration, view=view, upstream=upstream)
+
+
+class QueryLogMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        query_log = query_log_recorder.new_log()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(query_log.make_wrapper(connection.alias)))
+            response = self.get_response(request)
+
+        match = request.resolver_match
+        query_log_recorder.record(match.view_name if match is not None else request.path, query_log.queries)
+        return response
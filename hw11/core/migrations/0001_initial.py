@@ -0,0 +1,36 @@
+# Generated by Django 4.2 on 2026-10-19 15:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueryFingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(max_length=40, unique=True)),
+                ('reason', models.CharField(choices=[('slow', 'Slow query'), ('repeated', 'Repeated query')], max_length=10)),
+                ('sql', models.TextField(verbose_name='normalized SQL')),
+                ('sample_sql', models.TextField()),
+                ('sample_params', models.TextField(blank=True)),
+                ('view', models.CharField(max_length=200)),
+                ('call_site', models.CharField(max_length=500)),
+                ('plan', models.TextField(blank=True, verbose_name='query plan')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('total_time', models.FloatField(default=0, verbose_name='total time (s)')),
+                ('max_time', models.FloatField(default=0, verbose_name='max time (s)')),
+                ('first_seen', models.DateTimeField(auto_now_add=True)),
+                ('last_seen', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ('-total_time',),
+            },
+        ),
+    ]
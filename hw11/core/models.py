@@ -0,0 +1,32 @@
+from django.db import models
+
+
+class QueryFingerprint(models.Model):
+    SLOW = 'slow'
+    REPEATED = 'repeated'
+    REASON_CHOICES = (
+        (SLOW, 'Slow query'),
+        (REPEATED, 'Repeated query'),
+    )
+
+    fingerprint = models.CharField(max_length=40, unique=True)
+    reason = models.CharField(max_length=10, choices=REASON_CHOICES)
+    sql = models.TextField(verbose_name='normalized SQL')
+    sample_sql = models.TextField()
+    sample_params = models.TextField(blank=True)
+    view = models.CharField(max_length=200)
+    call_site = models.CharField(max_length=500)
+    plan = models.TextField(blank=True, verbose_name='query plan')
+    count = models.PositiveIntegerField(default=0)
+    total_time = models.FloatField(default=0, verbose_name='total time (s)')
+    max_time = models.FloatField(default=0, verbose_name='max time (s)')
+    first_seen = models.DateTimeField(auto_now_add=True)
+    last_seen = models.DateTimeField(auto_now=True)
+
+    objects = models.Manager()
+
+    def __str__(self):
+        return self.sql[:100]
+
+    class Meta:
+        ordering = ('-total_time',)
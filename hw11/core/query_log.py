@@ -0,0 +1,156 @@
+import hashlib
+import logging
+import os
+import re
+import sys
+import time
+from collections import Counter, defaultdict
+from typing import List, NamedTuple, Optional
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, connections
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from core.models import QueryFingerprint
+
+
+logger = logging.getLogger('core.query_log')
+
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_NUMBERS = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LISTS = re.compile(r'\bIN\s*\((?:\s*(?:%s|\?)\s*,?)+\)', re.IGNORECASE)
+_SPACES = re.compile(r'\s+')
+_INSTRUMENTATION_DIR = os.path.dirname(__file__)
+
+
+def normalize_sql(sql: str) -> str:
+    sql = _STRINGS.sub('?', sql)
+    sql = _NUMBERS.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _IN_LISTS.sub('IN (...)', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+def fingerprint(sql: str) -> str:
+    return hashlib.sha1(normalize_sql(sql).encode()).hexdigest()
+
+
+class QueryRecord(NamedTuple):
+    alias: str
+    sql: str
+    params: object
+    many: bool
+    duration: float
+    call_site: str
+
+
+def find_call_site(base_dir: str) -> str:
+    frame = sys._getframe(2)
+    code_site = template_site = None
+    while frame is not None:
+        code = frame.f_code
+        if code.co_name == 'render_annotated' and code.co_filename.endswith('template/base.py'):
+            node = frame.f_locals.get('self')
+            origin = getattr(node, 'origin', None)
+            token = getattr(node, 'token', None)
+            if origin is not None and token is not None:
+                template_site = f'{origin.template_name}:{token.lineno}'
+        if code_site is None and code.co_filename.startswith(base_dir) \
+                and 'site-packages' not in code.co_filename \
+                and not code.co_filename.startswith(_INSTRUMENTATION_DIR):
+            code_site = f'{code.co_filename[len(base_dir):].lstrip("/")}:{frame.f_lineno} in {code.co_name}'
+        if template_site is not None:
+            break
+        frame = frame.f_back
+    return ' / '.join(site for site in (code_site, template_site) if site) or 'unknown'
+
+
+def common_call_site(queries: List[QueryRecord]) -> str:
+    sites = Counter(query.call_site for query in queries if query.call_site)
+    return sites.most_common(1)[0][0] if sites else 'unknown'
+
+
+class QueryLog:
+    def __init__(self, slow_threshold: float, max_queries: int):
+        self.queries: List[QueryRecord] = []
+        self._slow_threshold = slow_threshold
+        self._max_queries = max_queries
+        self._base_dir = str(settings.BASE_DIR)
+
+    def make_wrapper(self, alias: str):
+        def wrapper(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                duration = time.perf_counter() - started
+                traced = duration >= self._slow_threshold or len(self.queries) >= self._max_queries
+                self.queries.append(QueryRecord(alias, sql, params, many, duration,
+                                                find_call_site(self._base_dir) if traced else ''))
+        return wrapper
+
+
+class QueryLogRecorder:
+    def __init__(self, slow_threshold: float, max_queries: int):
+        self._slow_threshold = slow_threshold
+        self._max_queries = max_queries
+
+    def new_log(self) -> QueryLog:
+        return QueryLog(self._slow_threshold, self._max_queries)
+
+    def record(self, view: str, queries: List[QueryRecord]) -> None:
+        slow = [query for query in queries if query.duration >= self._slow_threshold]
+        for query in slow:
+            plan = self.explain(query)
+            logger.warning('Slow query %.1f ms in %s at %s\n%s\nparams: %r\nplan:\n%s', query.duration * 1000,
+                           view, query.call_site, query.sql, query.params, plan or '-')
+            self._store(QueryFingerprint.SLOW, view, [query], plan)
+
+        if len(queries) > self._max_queries:
+            groups = defaultdict(list)
+            for query in queries:
+                groups[fingerprint(query.sql)].append(query)
+            repeated = sorted((group for group in groups.values() if len(group) > 1), key=len, reverse=True)
+            logger.warning('%s made %d queries (%d distinct)\n%s', view, len(queries), len(groups), '\n'.join(
+                f'{len(group):>5} x {sum(query.duration for query in group) * 1000:8.1f} ms  '
+                f'{common_call_site(group)}  {normalize_sql(group[0].sql)}' for group in repeated))
+            for group in repeated:
+                self._store(QueryFingerprint.REPEATED, view, group)
+
+    def explain(self, query: QueryRecord) -> str:
+        if query.many or not query.sql.lstrip().upper().startswith('SELECT'):
+            return ''
+        connection = connections[query.alias]
+        prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(prefix + query.sql, query.params)
+                return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+        except DatabaseError:
+            return ''
+
+    def _store(self, reason: str, view: str, group: List[QueryRecord], plan: Optional[str] = None) -> None:
+        sample = max(group, key=lambda query: query.duration)
+        key = fingerprint(sample.sql)
+        duration = sum(query.duration for query in group)
+        try:
+            updated = QueryFingerprint.objects.filter(fingerprint=key).update(
+                count=F('count') + len(group), total_time=F('total_time') + duration,
+                max_time=Greatest('max_time', sample.duration), last_seen=timezone.now())
+            if not updated:
+                QueryFingerprint.objects.create(
+                    fingerprint=key, reason=reason, sql=normalize_sql(sample.sql), sample_sql=sample.sql,
+                    sample_params=repr(sample.params), view=view, call_site=common_call_site(group),
+                    plan=self.explain(sample) if plan is None else plan,
+                    count=len(group), total_time=duration, max_time=sample.duration)
+        except IntegrityError:
+            QueryFingerprint.objects.filter(fingerprint=key).update(
+                count=F('count') + len(group), total_time=F('total_time') + duration, last_seen=timezone.now())
+        except DatabaseError:
+            pass
+
+
+query_log_recorder = QueryLogRecorder(slow_threshold=settings.QUERY_LOG_SLOW_MS / 1000,
+                                      max_queries=settings.QUERY_LOG_MAX_QUERIES)
@@ -23,6 +23,31 @@ load_dotenv(BASE_DIR.joinpath('.env'))
 WEATHER_API_KEY = os.getenv('WEATHER_API_KEY')
 COUNTRY_API_KEY = os.getenv('COUNTRY_API_KEY')
 
+WEATHER_BATCH_TIMEOUT = 1.5
+WEATHER_SNAPSHOT_MAX_AGE = 60 * 60
+WEATHER_REFRESH_INTERVAL = 60 * 10
+WEATHER_REFRESH_CALLS_PER_MINUTE = 50
+WEATHER_HISTORY_DIR = BASE_DIR / 'weather_history'
+WEATHER_CITY_DEDUP_RADIUS = 5
+WEATHER_NEARBY_RADIUS = 500
+WEATHER_ENRICHMENT_MAX_ATTEMPTS = 5
+WEATHER_ENRICHMENT_RETRY_DELAY = 5
+WEATHER_ENRICHMENT_BUDGET = 10
+WEATHER_REQUEST_BUDGET = 4
+WEATHER_ALERT_WINDOW = 60 * 60 * 6
+WEATHER_FORECAST_TIMEOUT = 3
+WEATHER_FORECAST_UPDATE_INTERVAL = 60 * 60 * 6
+WEATHER_FORECAST_UPDATE_DELAY = 60 * 60 * 4
+WEATHER_PAGE_CACHE_TIMEOUT = 60 * 60 * 24
+WEATHER_IMPORT_MAX_ROWS = 500
+WEATHER_IMPORT_CONCURRENCY = 4
+UPSTREAM_QUOTAS = {
+    'openweather': {'per_minute': 60, 'per_day': 30000},
+    'geonames': {'per_minute': 15, 'per_day': 10000},
+}
+WEATHER_GAZETTEER_PATH = BASE_DIR / 'weather' / 'data' / 'cities.txt'
+WEATHER_COUNTRIES_SNAPSHOT = BASE_DIR / 'weather' / 'data' / 'countries.json'
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/4.2/howto/deployment/checklist/
 
@@ -34,6 +59,23 @@ DEBUG = True
 
 ALLOWED_HOSTS = []
 
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+
+QUERY_LOG_SLOW_MS = 100
+QUERY_LOG_MAX_QUERIES = 50
+QUERY_LOG_FILE = BASE_DIR / 'slow_queries.log'
+
+SQLITE_PRAGMAS = {
+    'synchronous': 'normal',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'temp_store': 'memory',
+}
+# Databases switched to WAL so readers do not block on writers; set SQLITE_WAL_DATABASES= (empty) to opt out
+SQLITE_WAL_DATABASES = [alias for alias in os.getenv('SQLITE_WAL_DATABASES', 'default').split(',') if alias]
+SQLITE_MAINTENANCE_INTERVAL = 60 * 60
+
 
 # Application definition
 
@@ -46,6 +88,7 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
 
     # user apps
+    'core.apps.CoreConfig',
     'accounts.apps.AccountsConfig',
     'blog.apps.BlogConfig',
     'weather.apps.WeatherConfig',
@@ -62,6 +105,8 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 
     # user middleware
+    'core.middleware.QueryLogMiddleware',
+    'core.middleware.MetricsMiddleware',
     'accounts.middleware.ProfileCompletionMiddleware',
     'core.middleware.PermissionDeniedMiddleware',
     'core.middleware.PageNotFoundMiddleware',
@@ -71,7 +116,7 @@ ROOT_URLCONF = 'core.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.metrics.TimedDjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -96,11 +141,18 @@ WSGI_APPLICATION = 'core.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.sqlite_backend',
         'NAME': BASE_DIR / 'itea_blog.sqlite3',
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'page_cache',
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -150,3 +202,24 @@ AUTH_USER_MODEL = 'accounts.CustomUser'
 
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'query_log': {'format': '%(asctime)s %(message)s'},
+    },
+    'handlers': {
+        'query_log': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': QUERY_LOG_FILE,
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'delay': True,
+            'formatter': 'query_log',
+        },
+    },
+    'loggers': {
+        'core.query_log': {'handlers': ['query_log'], 'level': 'WARNING', 'propagate': False},
+    },
+}
+
@@ -0,0 +1,10 @@
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from .sqlite import sqlite_profile
+from .sqlite_backend.base import DatabaseWrapper
+
+
+@receiver(connection_created, sender=DatabaseWrapper)
+def configure_sqlite(sender, connection, **kwargs):
+    sqlite_profile.configure(connection)
@@ -0,0 +1,43 @@
+import threading
+import time
+from typing import Dict, Iterable, Tuple
+
+from django.conf import settings
+
+
+class SQLiteProfile:
+    def __init__(self, pragmas: Dict[str, object], maintenance_interval: float, wal_databases: Iterable[str] = ()):
+        self._pragmas = pragmas
+        self._wal_databases = set(wal_databases)
+        self._maintenance_interval = maintenance_interval
+        self._maintained: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, connection) -> None:
+        with connection.cursor() as cursor:
+            for name, value in self._pragmas.items():
+                cursor.execute(f'PRAGMA {name} = {value}')
+            if connection.alias in self._wal_databases:
+                cursor.execute('PRAGMA journal_mode = wal')
+        if self._maintenance_due(str(connection.settings_dict['NAME'])):
+            self.maintain(connection)
+
+    def maintain(self, connection, checkpoint: str = 'PASSIVE') -> Tuple[int, int, int]:
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA optimize')
+            cursor.execute(f'PRAGMA wal_checkpoint({checkpoint})')
+            return tuple(cursor.fetchone())
+
+    def _maintenance_due(self, name: str) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            last = self._maintained.get(name)
+            if last is not None and now - last < self._maintenance_interval:
+                return False
+            self._maintained[name] = now
+        return last is not None
+
+
+sqlite_profile = SQLiteProfile(pragmas=settings.SQLITE_PRAGMAS,
+                               maintenance_interval=settings.SQLITE_MAINTENANCE_INTERVAL,
+                               wal_databases=settings.SQLITE_WAL_DATABASES)
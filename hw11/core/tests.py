@@ -0,0 +1,152 @@
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from blog.models import Post, PostLike
+from core.metrics import Histogram, MetricsRegistry, RequestTimings, metrics
+from core.models import QueryFingerprint
+from core.sqlite import SQLiteProfile
+from core.sqlite_backend.base import DatabaseWrapper
+from core.query_log import QueryLog, QueryLogRecorder, fingerprint, normalize_sql
+from weather.models import City, Country, EnrichableModel
+
+
+class GenerateFakeDataTestCase(TransactionTestCase):
+    def generate(self, seed=1):
+        call_command('generate_fake_data', users=50, posts=200, comments=500, reactions=1000, cities=20, seed=seed,
+                     batch_size=64, stdout=StringIO())
+
+    def test_generated_rows_are_deterministic(self):
+        self.generate()
+        first = list(PostLike.objects.order_by('id').values_list('post_id', 'user_id'))
+        titles = list(Post.objects.order_by('id').values_list('title', flat=True))
+        PostLike.objects.all().delete()
+        Post.objects.all().delete()
+        City.objects.all().delete()
+        self.assertEqual(len(first), len(set(first)))
+
+        self.generate()
+        self.assertEqual([(post_id, user_id - 50) for post_id, user_id in
+                          PostLike.objects.order_by('id').values_list('post_id', 'user_id')], first)
+        self.assertEqual(list(Post.objects.order_by('id').values_list('title', flat=True)), titles)
+
+    def test_generated_places_are_not_queued_for_enrichment(self):
+        self.generate()
+        self.assertEqual(City.objects.count(), 20)
+        self.assertFalse(City.objects.exclude(enrichment_status=EnrichableModel.DONE).exists())
+        self.assertFalse(Country.objects.exclude(enrichment_status=EnrichableModel.DONE).exists())
+
+
+class QueryLogTestCase(TestCase):
+    def run_queries(self, query_log, count):
+        with connection.execute_wrapper(query_log.make_wrapper(connection.alias)):
+            for post_id in range(count):
+                list(Post.objects.filter(id=post_id))
+
+    def test_normalize_sql_collapses_literals(self):
+        self.assertEqual(normalize_sql("SELECT * FROM t WHERE a = 'x''y' AND b IN (%s, %s,%s) LIMIT 21"),
+                         'SELECT * FROM t WHERE a = ? AND b IN (...) LIMIT ?')
+        self.assertEqual(fingerprint('SELECT 1'), fingerprint('SELECT  2'))
+
+    def test_call_site_is_captured_only_past_the_query_limit(self):
+        query_log = QueryLog(slow_threshold=60, max_queries=3)
+        self.run_queries(query_log, 5)
+        sites = [query.call_site for query in query_log.queries]
+        self.assertEqual(sites[:3], ['', '', ''])
+        self.assertTrue(all(sites[3:]))
+
+    def test_slow_queries_are_traced_and_stored(self):
+        query_log = QueryLog(slow_threshold=0, max_queries=50)
+        self.run_queries(query_log, 1)
+        self.assertTrue(query_log.queries[0].call_site)
+
+        QueryLogRecorder(slow_threshold=0, max_queries=50).record('blog:post_list', query_log.queries)
+        stored = QueryFingerprint.objects.get()
+        self.assertEqual((stored.reason, stored.view, stored.count), (QueryFingerprint.SLOW, 'blog:post_list', 1))
+        self.assertIn('blog_post', stored.plan)
+
+    def test_repeated_queries_are_grouped(self):
+        query_log = QueryLog(slow_threshold=60, max_queries=3)
+        self.run_queries(query_log, 5)
+        with self.assertLogs('core.query_log', 'WARNING'):
+            QueryLogRecorder(slow_threshold=60, max_queries=3).record('blog:post_list', query_log.queries)
+        stored = QueryFingerprint.objects.get()
+        self.assertEqual((stored.reason, stored.count), (QueryFingerprint.REPEATED, 5))
+        self.assertNotEqual(stored.call_site, 'unknown')
+
+
+class SQLiteProfileTestCase(TestCase):
+    def journal_mode(self, alias, profile):
+        with tempfile.TemporaryDirectory() as directory:
+            wrapper = DatabaseWrapper({**connection.settings_dict, 'NAME': os.path.join(directory, 'db.sqlite3')},
+                                      alias=alias)
+            try:
+                with mock.patch('core.signals.sqlite_profile', profile), wrapper.cursor() as cursor:
+                    cursor.execute('PRAGMA journal_mode')
+                    mode = cursor.fetchone()[0]
+                    cursor.execute('PRAGMA synchronous')
+                    return mode, cursor.fetchone()[0]
+            finally:
+                wrapper.close()
+
+    def test_default_database_uses_wal(self):
+        self.assertEqual(settings.SQLITE_WAL_DATABASES, ['default'])
+        profile = SQLiteProfile({'synchronous': 'normal'}, maintenance_interval=60,
+                                wal_databases=settings.SQLITE_WAL_DATABASES)
+        self.assertEqual(self.journal_mode('default', profile), ('wal', 1))
+        self.assertEqual(self.journal_mode('other', profile), ('delete', 1))
+
+    def test_wal_can_be_turned_off(self):
+        profile = SQLiteProfile({'synchronous': 'normal'}, maintenance_interval=60, wal_databases=[])
+        self.assertEqual(self.journal_mode('default', profile), ('delete', 1))
+
+
+class MetricsTestCase(TestCase):
+    def setUp(self):
+        metrics.reset()
+
+    def test_histogram_buckets(self):
+        histogram = Histogram((1, 5))
+        for value in (0.5, 1, 3, 10):
+            histogram.observe(value)
+        self.assertEqual(histogram.counts, [2, 1, 1])
+        self.assertEqual((histogram.sum, histogram.count), (14.5, 4))
+
+    def test_render_is_cumulative(self):
+        registry = MetricsRegistry()
+        registry.observe('db_queries_per_request', 3, view='home')
+        registry.observe('db_queries_per_request', 30, view='home')
+        registry.inc('http_requests_total', view='home', method='GET', status=200)
+        lines = registry.render().splitlines()
+        self.assertIn('# TYPE db_queries_per_request histogram', lines)
+        self.assertIn('db_queries_per_request_bucket{view="home",le="5"} 1', lines)
+        self.assertIn('db_queries_per_request_bucket{view="home",le="+Inf"} 2', lines)
+        self.assertIn('db_queries_per_request_count{view="home"} 2', lines)
+        self.assertIn('http_requests_total{method="GET",status="200",view="home"} 1', lines)
+
+    def test_server_timing(self):
+        timings = RequestTimings()
+        timings.add_query(0.002)
+        timings.add_query(0.003)
+        timings.add_template(0.01)
+        timings.add_upstream('weather', 0.1)
+        self.assertEqual(timings.server_timing(0.2), 'total;dur=200.0, db;dur=5.0;desc="2 queries", tpl;dur=10.0, '
+                                                     'upstream-weather;dur=100.0')
+
+    def test_middleware_records_requests(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Server-Timing'].startswith('total;dur='))
+        self.assertIn('http_requests_total{method="GET",status="200",view="metrics"} 1',
+                      self.client.get(reverse('metrics')).content.decode())
+
+    @override_settings(METRICS_ALLOWED_IPS=[])
+    def test_metrics_are_staff_only(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
@@ -1,5 +1,10 @@
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
 from django.shortcuts import render
 
+from core.metrics import metrics
+
 
 def handler404(request, exception):
     context = {
@@ -16,3 +21,8 @@ def handler403(request, exception):
     }
     return render(request, 'error.html', context=context, status=403)
 
+
+def metrics_view(request):
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS and not request.user.is_staff:
+        raise PermissionDenied('Metrics are only available to staff')
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,29 @@
+document.addEventListener('DOMContentLoaded', function () {
+    let input = document.getElementById('id_city');
+    let suggestions = document.getElementById('city-suggestions');
+    if (!input || !suggestions) {
+        return;
+    }
+
+    let timer = null;
+    input.addEventListener('input', function () {
+        clearTimeout(timer);
+        timer = setTimeout(function () {
+            if (input.value.length < 2) {
+                return;
+            }
+            fetch(suggestions.dataset.url + '?q=' + encodeURIComponent(input.value))
+                .then(function (response) {
+                    return response.json();
+                })
+                .then(function (data) {
+                    suggestions.innerHTML = '';
+                    data.cities.forEach(function (city) {
+                        let option = document.createElement('option');
+                        option.value = city.name + ', ' + city.country_code;
+                        suggestions.appendChild(option);
+                    });
+                });
+        }, 150);
+    });
+});
@@ -0,0 +1,25 @@
+document.addEventListener('DOMContentLoaded', function () {
+    let series = JSON.parse(document.getElementById('historySeries').textContent);
+    let labels = series.timestamp.map(function (timestamp) {
+        return new Date(timestamp * 1000).toLocaleString([], {day: '2-digit', month: '2-digit', hour: '2-digit'});
+    });
+
+    new Chart(document.getElementById('historyChart'), {
+        type: 'line',
+        data: {
+            labels: labels,
+            datasets: [
+                {label: 'Temperature, °C', data: series.temperature, yAxisID: 'y'},
+                {label: 'Humidity, %', data: series.humidity, yAxisID: 'y1'},
+                {label: 'Wind, km/h', data: series.wind_speed, yAxisID: 'y'}
+            ]
+        },
+        options: {
+            pointRadius: 0,
+            scales: {
+                y: {position: 'left'},
+                y1: {position: 'right', min: 0, max: 100, grid: {drawOnChartArea: false}}
+            }
+        }
+    });
+})
@@ -1,19 +1,19 @@
 from django.contrib import admin
 
-from .models import Country, City, UserCity
+from .models import Country, City, UserCity, ServiceHealth, ApiQuota, AlertSubscription, AlertNotification
 
 
 @admin.register(Country)
 class CountryAdmin(admin.ModelAdmin):
     list_display = ('name', 'code', 'capital', 'flag')
-    search_fields = ('name', 'description')
+    search_fields = ('name', 'summary')
     prepopulated_fields = {'slug': ('name',)}
 
 
 @admin.register(City)
 class CityAdmin(admin.ModelAdmin):
-    list_display = ('name', 'country', 'image', 'lat', 'lon')
-    search_fields = ('name', 'description')
+    list_display = ('name', 'country', 'image', 'lat', 'lon', 'geohash')
+    search_fields = ('name', 'summary', 'geohash')
     prepopulated_fields = {'slug': ('name',)}
     list_filter = ('country',)
 
@@ -23,3 +23,28 @@ class UserCity(admin.ModelAdmin):
     list_display = ('user', 'city')
     search_fields = ('city', 'user')
     list_filter = ('user', 'city')
+
+
+@admin.register(ServiceHealth)
+class ServiceHealthAdmin(admin.ModelAdmin):
+    list_display = ('name', 'state', 'error_rate', 'avg_latency', 'score', 'updated')
+    list_filter = ('state',)
+    readonly_fields = ('name', 'state', 'error_rate', 'avg_latency', 'score', 'updated')
+
+
+@admin.register(ApiQuota)
+class ApiQuotaAdmin(admin.ModelAdmin):
+    list_display = ('name', 'per_minute', 'per_day', 'used_today', 'shed_today', 'day')
+    readonly_fields = ('name', 'per_minute', 'per_day', 'tokens', 'refilled', 'day', 'used_today', 'shed_today')
+
+
+@admin.register(AlertSubscription)
+class AlertSubscriptionAdmin(admin.ModelAdmin):
+    list_display = ('user_city', 'metric', 'lower', 'upper', 'is_active')
+    list_filter = ('metric', 'is_active')
+
+
+@admin.register(AlertNotification)
+class AlertNotificationAdmin(admin.ModelAdmin):
+    list_display = ('subscription', 'value', 'window', 'is_read', 'created')
+    list_filter = ('is_read',)
@@ -0,0 +1,59 @@
+import time
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from weather.models import AlertSubscription, AlertNotification, WeatherSnapshot
+
+
+METRICS = (AlertSubscription.TEMPERATURE, AlertSubscription.WIND_SPEED, AlertSubscription.HUMIDITY)
+
+
+class AlertEvaluator:
+    def __init__(self, window: int, max_age: int):
+        self._window = window
+        self._max_age = max_age
+
+    def evaluate(self) -> int:
+        subscriptions = list(AlertSubscription.objects
+                             .filter(is_active=True)
+                             .values_list('id', 'user_city__city_id', 'metric', 'lower', 'upper'))
+        if not subscriptions:
+            return 0
+
+        ids, city_ids, metrics, lower, upper = zip(*subscriptions)
+        city_ids = np.array(city_ids, dtype=np.int64)
+        readings_city_ids, readings = self._get_readings(np.unique(city_ids))
+        if not readings_city_ids.size:
+            return 0
+
+        positions = np.searchsorted(readings_city_ids, city_ids).clip(max=readings_city_ids.size - 1)
+        matched = readings_city_ids[positions] == city_ids
+        metric_index = np.array([METRICS.index(metric) for metric in metrics])
+        values = np.where(matched, readings[positions, metric_index], np.nan)
+        lower = np.array(lower, dtype=np.float64)
+        upper = np.array(upper, dtype=np.float64)
+
+        with np.errstate(invalid='ignore'):
+            triggered = np.flatnonzero((values < lower) | (values > upper))
+        if not triggered.size:
+            return 0
+
+        window = int(time.time()) // self._window * self._window
+        AlertNotification.objects.bulk_create(
+            [AlertNotification(subscription_id=ids[index], value=float(values[index]), window=window)
+             for index in triggered],
+            ignore_conflicts=True)
+        return int(triggered.size)
+
+    def _get_readings(self, city_ids: np.ndarray):
+        since = timezone.now() - timezone.timedelta(seconds=self._max_age)
+        rows = list(WeatherSnapshot.objects.latest_readings(city_ids.tolist(), since=since))
+        if not rows:
+            return np.empty(0, dtype=np.int64), np.empty((0, len(METRICS)))
+        rows = np.array(rows, dtype=np.float64)
+        return rows[:, 0].astype(np.int64), rows[:, 1:]
+
+
+alert_evaluator = AlertEvaluator(window=settings.WEATHER_ALERT_WINDOW, max_age=settings.WEATHER_SNAPSHOT_MAX_AGE)
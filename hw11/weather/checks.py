@@ -0,0 +1,15 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.checks import Error, register
+
+
+@register()
+def check_gazetteer(app_configs, **kwargs):
+    path = Path(settings.WEATHER_GAZETTEER_PATH)
+    if not path.is_file() or not path.stat().st_size:
+        return [Error(f'City gazetteer {path} is missing or empty',
+                      hint='Point WEATHER_GAZETTEER_PATH at weather/data/cities.txt or a GeoNames '
+                           'cities15000.zip dump',
+                      id='weather.E001')]
+    return []
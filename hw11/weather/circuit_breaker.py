@@ -0,0 +1,178 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict
+
+from django.db import DatabaseError
+
+from weather.models import ServiceHealth
+
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    _SYNC_INTERVAL = 5
+
+    def __init__(self, name: str, window_size: int = 20, min_calls: int = 5, failure_threshold: float = 0.5,
+                 recovery_timeout: float = 30, slow_call_threshold: float = 1.5, persist: bool = True):
+        self.name = name
+        self._persist = persist
+        self._window_size = window_size
+        self._min_calls = min_calls
+        self._failure_threshold = failure_threshold
+        self._recovery_timeout = recovery_timeout
+        self._slow_call_threshold = slow_call_threshold
+
+        self._lock = threading.Lock()
+        self._results = deque(maxlen=window_size)
+        self._latencies = deque(maxlen=window_size)
+        self._state = self.CLOSED
+        self._opened_at = None
+        self._probe_in_flight = False
+        self._last_sync = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    @property
+    def error_rate(self) -> float:
+        with self._lock:
+            return self._error_rate()
+
+    @property
+    def avg_latency(self) -> float:
+        with self._lock:
+            return self._avg_latency()
+
+    @property
+    def health_score(self) -> float:
+        with self._lock:
+            return self._health_score()
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self, latency: float) -> None:
+        with self._lock:
+            self._results.append(True)
+            self._latencies.append(latency)
+            state = self._current_state()
+            if state == self.HALF_OPEN:
+                self._close()
+        self._sync(force=state != self._state)
+
+    def record_failure(self, latency: float) -> None:
+        with self._lock:
+            self._results.append(False)
+            self._latencies.append(latency)
+            state = self._current_state()
+            if state == self.HALF_OPEN:
+                self._open()
+            elif state == self.CLOSED and len(self._results) >= self._min_calls \
+                    and self._error_rate() >= self._failure_threshold:
+                self._open()
+        self._sync(force=state != self._state)
+
+    def release_probe(self) -> None:
+        with self._lock:
+            self._probe_in_flight = False
+
+    def reset(self) -> None:
+        with self._lock:
+            self._results.clear()
+            self._latencies.clear()
+            self._close()
+
+    def _current_state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self._recovery_timeout:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def _open(self) -> None:
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._probe_in_flight = False
+
+    def _close(self) -> None:
+        self._state = self.CLOSED
+        self._opened_at = None
+        self._probe_in_flight = False
+        self._results.clear()
+
+    def _error_rate(self) -> float:
+        if not self._results:
+            return 0.0
+        return self._results.count(False) / len(self._results)
+
+    def _avg_latency(self) -> float:
+        if not self._latencies:
+            return 0.0
+        return sum(self._latencies) / len(self._latencies)
+
+    def _health_score(self) -> float:
+        state = self._current_state()
+        if state == self.OPEN:
+            return 0.0
+        latency_factor = 1 / (1 + self._avg_latency() / self._slow_call_threshold)
+        score = (1 - self._error_rate()) * latency_factor
+        if state == self.HALF_OPEN:
+            score /= 2
+        return round(score, 4)
+
+    def _sync(self, force: bool = False) -> None:
+        if not self._persist:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_sync < self._SYNC_INTERVAL:
+            return
+        self._last_sync = now
+
+        with self._lock:
+            defaults = {
+                'state': self._current_state(),
+                'error_rate': self._error_rate(),
+                'avg_latency': self._avg_latency(),
+                'score': self._health_score(),
+            }
+        try:
+            ServiceHealth.objects.update_or_create(name=self.name, defaults=defaults)
+        except DatabaseError:
+            pass
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+_persist = True
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name, persist=_persist)
+        return _breakers[name]
+
+
+@contextmanager
+def isolated_breakers():
+    global _breakers, _persist
+    with _breakers_lock:
+        previous = _breakers, _persist
+        _breakers, _persist = {}, False
+    try:
+        yield
+    finally:
+        with _breakers_lock:
+            _breakers, _persist = previous
@@ -0,0 +1,27 @@
+import time
+from typing import Optional, Tuple
+
+from weather.exceptions import DeadlineExceededError
+
+
+class Deadline:
+    def __init__(self, budget: float):
+        self._expires = time.monotonic() + budget
+
+    def remaining(self) -> float:
+        return max(0.0, self._expires - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def check(self) -> None:
+        if self.expired():
+            raise DeadlineExceededError('Request deadline exceeded')
+
+
+def request_timeout(deadline: Optional[Deadline], connect: float, read: float) -> Tuple[float, float]:
+    if deadline is None:
+        return connect, read
+    deadline.check()
+    remaining = deadline.remaining()
+    return min(connect, remaining), min(read, remaining)
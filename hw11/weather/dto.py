@@ -1,10 +1,17 @@
-from typing import NamedTuple
+from typing import List, NamedTuple, Optional
 
 
 class WeatherTimeInfoDTO(NamedTuple):
     current: str
     sunrise: str
     sunset: str
+    day_length: Optional[str] = None
+
+
+class SolarTimesDTO(NamedTuple):
+    sunrise: Optional[int]
+    sunset: Optional[int]
+    day_length: int
 
 
 class GeoCoordinatesDTO(NamedTuple):
@@ -22,13 +29,63 @@ class WeatherTodayDTO(NamedTuple):
     humidity: int
     time_info: WeatherTimeInfoDTO
     icon: str
+    city_id: Optional[int] = None
+    timestamp: Optional[int] = None
+    utc_offset: Optional[int] = None
+
+
+class GazetteerEntryDTO(NamedTuple):
+    id: int
+    name: str
+    country_code: str
+    lat: float
+    lon: float
+    population: int
+
+
+class CityImportRowDTO(NamedTuple):
+    line: int
+    city: Optional[str]
+    country_code: Optional[str]
+    lat: Optional[float]
+    lon: Optional[float]
+
+
+class CityImportResultDTO(NamedTuple):
+    line: int
+    city: Optional[str]
+    status: str
+    message: str = ''
+
+
+class ForecastItemDTO(NamedTuple):
+    timestamp: int
+    condition: str
+    icon: str
+    temperature: float
+    wind_speed: float
+    humidity: int
+
+
+class ForecastDTO(NamedTuple):
+    city_id: Optional[int]
+    timezone: int
+    items: List[ForecastItemDTO]
 
 
 class CountryServiceDTO(NamedTuple):
     name: str
     code: str
-    capital: str
+    capital: Optional[str]
+    population: int
+
+
+class CountryCatalogueDTO(NamedTuple):
+    name: str
+    code: str
+    capital: Optional[str]
     population: int
+    flag: str
 
 
 class WikiServiceDTO(NamedTuple):
@@ -12,3 +12,15 @@ class ServerReturnInvalidResponse(Exception):
 
 class NoAvailableServiceError(Exception):
     pass
+
+
+class EnrichmentError(Exception):
+    pass
+
+
+class QuotaExceededError(ResponseException):
+    pass
+
+
+class DeadlineExceededError(ResponseException):
+    pass
@@ -0,0 +1,110 @@
+from datetime import datetime, timezone as dt_timezone
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from weather.deadline import Deadline
+from weather.dto import ForecastDTO, ForecastItemDTO
+from weather.models import City, WeatherForecast
+from weather.services import ForecastService, forecast_service
+
+
+FORECAST_DTYPE = np.dtype([
+    ('timestamp', '<i8'),
+    ('temperature', '<f4'),
+    ('wind_speed', '<f4'),
+    ('humidity', 'u1'),
+    ('icon', 'S3'),
+    ('condition', 'S12'),
+])
+
+
+def pack_forecast(items: List[ForecastItemDTO]) -> bytes:
+    data = np.array([(item.timestamp, item.temperature, item.wind_speed, item.humidity, item.icon, item.condition)
+                     for item in items], dtype=FORECAST_DTYPE)
+    return data.tobytes()
+
+
+def unpack_forecast(data: bytes) -> List[ForecastItemDTO]:
+    data = np.frombuffer(data, dtype=FORECAST_DTYPE)
+    return [ForecastItemDTO(timestamp=int(timestamp),
+                            condition=condition.decode(),
+                            icon=icon.decode(),
+                            temperature=round(float(temperature), 1),
+                            wind_speed=round(float(wind_speed), 1),
+                            humidity=int(humidity))
+            for timestamp, temperature, wind_speed, humidity, icon, condition in data]
+
+
+def next_model_update(now: int, interval: int, delay: int) -> int:
+    return ((now - delay) // interval + 1) * interval + delay
+
+
+class ForecastProvider:
+    def __init__(self, forecast_service: ForecastService, api_key: str, timeout: float,
+                 update_interval: int, update_delay: int):
+        self._forecast_service = forecast_service
+        self._api_key = api_key
+        self._timeout = timeout
+        self._update_interval = update_interval
+        self._update_delay = update_delay
+
+    def get_forecasts(self, cities: Iterable[City], fetch: bool = True,
+                      deadline: Optional[Deadline] = None) -> Dict[int, ForecastDTO]:
+        cities = list(cities)
+        stored = {forecast.city_id: forecast
+                  for forecast in WeatherForecast.objects.filter(city__in=cities)}
+        forecasts = {city_id: self._to_dto(forecast)
+                     for city_id, forecast in stored.items() if forecast.is_fresh()}
+
+        missing = [city for city in cities if city.id not in forecasts]
+        if missing and fetch:
+            forecasts.update(self.fetch(missing, deadline=deadline))
+
+        for city_id, forecast in stored.items():
+            forecasts.setdefault(city_id, self._to_dto(forecast))
+        return forecasts
+
+    def get_forecast(self, city: City, deadline: Optional[Deadline] = None) -> Optional[ForecastDTO]:
+        return self.get_forecasts([city], deadline=deadline).get(city.id)
+
+    def fetch(self, cities: List[City], deadline: Optional[Deadline] = None) -> Dict[int, ForecastDTO]:
+        fetched = self._forecast_service.get_forecasts(cities, self._api_key, timeout=self._timeout,
+                                                       deadline=deadline)
+        self._save(fetched)
+        return fetched
+
+    def get_expired_cities(self, cities: Iterable[City]) -> List[City]:
+        cities = list(cities)
+        fresh_ids = set(WeatherForecast.objects
+                        .filter(city__in=cities, expires__gt=timezone.now())
+                        .values_list('city_id', flat=True))
+        return [city for city in cities if city.id not in fresh_ids]
+
+    def _save(self, forecasts: Dict[int, ForecastDTO]) -> None:
+        now = timezone.now()
+        expires = datetime.fromtimestamp(
+            next_model_update(int(now.timestamp()), self._update_interval, self._update_delay), tz=dt_timezone.utc)
+        WeatherForecast.objects.bulk_create(
+            [WeatherForecast(city_id=city_id,
+                             timezone=forecast.timezone,
+                             data=pack_forecast(forecast.items),
+                             issued=now,
+                             expires=expires)
+             for city_id, forecast in forecasts.items()],
+            update_conflicts=True,
+            unique_fields=['city'],
+            update_fields=['timezone', 'data', 'issued', 'expires'])
+
+    @staticmethod
+    def _to_dto(forecast: WeatherForecast) -> ForecastDTO:
+        return ForecastDTO(city_id=None, timezone=forecast.timezone, items=unpack_forecast(forecast.data))
+
+
+forecast_provider = ForecastProvider(forecast_service=forecast_service,
+                                     api_key=settings.WEATHER_API_KEY,
+                                     timeout=settings.WEATHER_FORECAST_TIMEOUT,
+                                     update_interval=settings.WEATHER_FORECAST_UPDATE_INTERVAL,
+                                     update_delay=settings.WEATHER_FORECAST_UPDATE_DELAY)
@@ -1,5 +1,9 @@
 from django import forms
 
+from weather.gazetteer import gazetteer
+from weather.models import AlertSubscription
+from weather.registry import country_registry
+
 
 class CityWeatherForm(forms.Form):
     city = forms.CharField(label='City weather',
@@ -7,10 +11,80 @@ class CityWeatherForm(forms.Form):
                            required=True,
                            widget=forms.TextInput(attrs={
                              'class': 'form-control',
-                             'placeholder': 'Enter a city name...'
+                             'placeholder': 'Enter a city name...',
+                             'list': 'city-suggestions',
+                             'autocomplete': 'off'
                            }))
 
     def clean_city(self):
         city = self.cleaned_data.get('city')
         city = city.title()
         return city
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get('city'):
+            cleaned_data['place'] = gazetteer.resolve(cleaned_data['city'])
+        return cleaned_data
+
+
+class UserCityForm(forms.Form):
+    city = forms.CharField(max_length=100)
+    country_code = forms.CharField(max_length=3)
+    lat = forms.FloatField(min_value=-90, max_value=90)
+    lon = forms.FloatField(min_value=-180, max_value=180)
+
+    def clean_country_code(self):
+        country_code = self.cleaned_data['country_code'].strip().upper()
+        if country_registry.get(country_code) is None:
+            raise forms.ValidationError(f'Unknown country code {country_code}')
+        return country_code
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get('country_code'):
+            cleaned_data['country'] = country_registry.get(cleaned_data['country_code'])
+        return cleaned_data
+
+
+class AlertSubscriptionForm(forms.ModelForm):
+    class Meta:
+        model = AlertSubscription
+        fields = ['metric', 'lower', 'upper']
+        widgets = {
+            'metric': forms.Select(attrs={'class': 'form-select'}),
+            'lower': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Alert below'}),
+            'upper': forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Alert above'}),
+        }
+
+    def clean(self):
+        cleaned_data = super().clean()
+        lower, upper = cleaned_data.get('lower'), cleaned_data.get('upper')
+        if lower is None and upper is None:
+            raise forms.ValidationError('Set at least one threshold')
+        if lower is not None and upper is not None and lower > upper:
+            raise forms.ValidationError('Lower threshold must not be greater than upper threshold')
+        return cleaned_data
+
+
+class CityImportForm(forms.Form):
+    file = forms.FileField(required=False, widget=forms.ClearableFileInput(attrs={'class': 'form-control',
+                                                                                  'accept': '.csv,.json'}))
+    data = forms.CharField(required=False,
+                           widget=forms.Textarea(attrs={'class': 'form-control', 'rows': 8,
+                                                        'placeholder': 'city,country_code,lat,lon'}))
+
+    def clean(self):
+        cleaned_data = super().clean()
+        file = cleaned_data.get('file')
+        if file:
+            try:
+                cleaned_data['data'] = file.read().decode('utf-8-sig')
+            except UnicodeDecodeError:
+                raise forms.ValidationError('File must be UTF-8 encoded')
+            cleaned_data['format'] = 'json' if file.name.endswith('.json') else 'csv'
+        else:
+            cleaned_data['format'] = None
+        if not cleaned_data.get('data', '').strip():
+            raise forms.ValidationError('Upload a file or paste a list of cities')
+        return cleaned_data
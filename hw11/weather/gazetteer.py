@@ -0,0 +1,172 @@
+import bisect
+import io
+import re
+import threading
+import unicodedata
+import zipfile
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+
+from weather.dto import GazetteerEntryDTO
+from weather.geo import haversine, to_unit_vectors
+
+
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+
+
+def normalize(name: str) -> str:
+    name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode().lower()
+    return _NON_ALNUM.sub(' ', name).strip()
+
+
+def trigrams(key: str) -> set:
+    padded = f'  {key} '
+    return {padded[index:index + 3] for index in range(len(padded) - 2)}
+
+
+class Gazetteer:
+    def __init__(self, path: Path, min_similarity: float = 0.4):
+        self._path = Path(path)
+        self._min_similarity = min_similarity
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def __len__(self):
+        self._ensure_loaded()
+        return len(self._ids)
+
+    def resolve(self, query: str) -> Optional[GazetteerEntryDTO]:
+        self._ensure_loaded()
+        name, _, country_code = query.partition(',')
+        key = normalize(name)
+        if not key:
+            return None
+
+        country_code = country_code.strip().upper()
+        entries = self._prefix_range(key, exact=True)
+        if country_code:
+            entries = entries[self._countries[entries] == country_code.encode()]
+        if not entries.size:
+            return None
+        return self._entry(entries[np.argmax(self._population[entries])])
+
+    def complete(self, prefix: str, limit: int = 10) -> List[GazetteerEntryDTO]:
+        self._ensure_loaded()
+        key = normalize(prefix)
+        if not key:
+            return []
+
+        entries = np.unique(self._prefix_range(key))
+        if not entries.size:
+            entries = self._fuzzy(key, '')
+        if entries.size > limit:
+            entries = entries[np.argpartition(-self._population[entries], limit)[:limit]]
+        entries = entries[np.argsort(-self._population[entries], kind='stable')]
+        return [self._entry(index) for index in entries]
+
+    def nearest(self, lat: float, lon: float, max_distance: float) -> Optional[GazetteerEntryDTO]:
+        self._ensure_loaded()
+        if not self._ids.size:
+            return None
+        index = int(np.argmax(self._points @ to_unit_vectors([lat], [lon])[0]))
+        if haversine(lat, lon, float(self._lat[index]), float(self._lon[index])) > max_distance:
+            return None
+        return self._entry(index)
+
+    def get(self, geoname_id: int) -> Optional[GazetteerEntryDTO]:
+        self._ensure_loaded()
+        index = np.searchsorted(self._ids, geoname_id)
+        if index < self._ids.size and self._ids[index] == geoname_id:
+            return self._entry(index)
+        return None
+
+    def _prefix_range(self, key: str, exact: bool = False) -> np.ndarray:
+        start = bisect.bisect_left(self._keys, key)
+        end = bisect.bisect_right(self._keys, key) if exact else bisect.bisect_left(self._keys, key + '\x7f')
+        return self._key_entries[start:end]
+
+    def _fuzzy(self, key: str, country_code: str) -> np.ndarray:
+        query = trigrams(key)
+        postings = [self._trigrams[trigram] for trigram in query if trigram in self._trigrams]
+        if not postings:
+            return np.empty(0, dtype=np.int32)
+
+        entries, shared = np.unique(np.concatenate(postings), return_counts=True)
+        similarity = shared / (len(query) + self._trigram_counts[entries] - shared)
+        if country_code:
+            similarity[self._countries[entries] != country_code.encode()] = 0
+        best = similarity.max()
+        if best < self._min_similarity:
+            return np.empty(0, dtype=np.int32)
+        return entries[similarity == best]
+
+    def _entry(self, index: int) -> GazetteerEntryDTO:
+        return GazetteerEntryDTO(id=int(self._ids[index]),
+                                 name=self._names[index],
+                                 country_code=self._countries[index].decode(),
+                                 lat=round(float(self._lat[index]), 4),
+                                 lon=round(float(self._lon[index]), 4),
+                                 population=int(self._population[index]))
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        with self._lock:
+            if not self._loaded:
+                self._build(sorted(self._read_rows(), key=lambda row: row[0]))
+                self._loaded = True
+
+    def _read_rows(self) -> Iterable[Tuple]:
+        if not self._path.exists():
+            return []
+        if self._path.suffix == '.zip':
+            with zipfile.ZipFile(self._path) as archive:
+                member = next(name for name in archive.namelist() if name.endswith('.txt'))
+                with archive.open(member) as file:
+                    return list(self._parse(io.TextIOWrapper(file, encoding='utf-8')))
+        with open(self._path, encoding='utf-8') as file:
+            return list(self._parse(file))
+
+    @staticmethod
+    def _parse(lines: Iterable[str]) -> Iterable[Tuple]:
+        for line in lines:
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) < 15:
+                continue
+            yield (int(fields[0]), fields[1], fields[2], fields[3], float(fields[4]), float(fields[5]),
+                   fields[8], int(fields[14] or 0))
+
+    def _build(self, rows: List[Tuple]) -> None:
+        self._ids = np.array([row[0] for row in rows], dtype=np.int64)
+        self._names = [row[1] for row in rows]
+        self._lat = np.array([row[4] for row in rows], dtype=np.float32)
+        self._lon = np.array([row[5] for row in rows], dtype=np.float32)
+        self._countries = np.array([row[6] for row in rows], dtype='S2')
+        self._points = to_unit_vectors(self._lat.astype(np.float64), self._lon.astype(np.float64))
+        self._population = np.array([row[7] for row in rows], dtype=np.int64)
+
+        keys = []
+        postings: Dict[str, List[int]] = defaultdict(list)
+        trigram_counts = np.zeros(len(rows), dtype=np.int32)
+        for index, (_, name, ascii_name, alternate_names, *_) in enumerate(rows):
+            primary = normalize(ascii_name or name)
+            names = {primary, normalize(name)} | {normalize(alternate) for alternate in alternate_names.split(',')}
+            keys.extend((key, index) for key in names if key)
+
+            primary_trigrams = trigrams(primary)
+            trigram_counts[index] = len(primary_trigrams)
+            for trigram in primary_trigrams:
+                postings[trigram].append(index)
+
+        keys.sort()
+        self._keys = [key for key, _ in keys]
+        self._key_entries = np.array([index for _, index in keys], dtype=np.int32)
+        self._trigrams = {trigram: np.array(indices, dtype=np.int32) for trigram, indices in postings.items()}
+        self._trigram_counts = trigram_counts
+
+
+gazetteer = Gazetteer(settings.WEATHER_GAZETTEER_PATH)
@@ -0,0 +1,183 @@
+import heapq
+import math
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+EARTH_RADIUS_KM = 6371.0088
+
+_GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def encode_geohash(lat: float, lon: float, precision: int = 9) -> str:
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    geohash, bits, bit_count, even = [], 0, 0, True
+    while len(geohash) < precision:
+        value, value_range = (lon, lon_range) if even else (lat, lat_range)
+        middle = (value_range[0] + value_range[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            value_range[0] = middle
+        else:
+            value_range[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(_GEOHASH_ALPHABET[bits])
+            bits, bit_count = 0, 0
+    return ''.join(geohash)
+
+
+def haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(1.0, a)))
+
+
+def to_unit_vectors(lat, lon) -> np.ndarray:
+    lat, lon = np.radians(lat), np.radians(lon)
+    return np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+
+
+def _chord_to_km(chord: float) -> float:
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2))
+
+
+def _km_to_chord(distance: float) -> float:
+    return 2 * math.sin(min(math.pi / 2, distance / (2 * EARTH_RADIUS_KM)))
+
+
+class KDTree:
+    def __init__(self, points: np.ndarray, ids: List[int], leaf_size: int = 16):
+        self._points = points
+        self._ids = ids
+        self._leaf_size = leaf_size
+        self._nodes = []
+        self._root = self._build(np.arange(len(ids)), depth=0) if len(ids) else None
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _build(self, indices: np.ndarray, depth: int) -> int:
+        if len(indices) <= self._leaf_size:
+            self._nodes.append((None, None, None, None, indices))
+            return len(self._nodes) - 1
+
+        axis = depth % 3
+        indices = indices[np.argsort(self._points[indices, axis])]
+        median = len(indices) // 2
+        split = self._points[indices[median], axis]
+        left = self._build(indices[:median], depth + 1)
+        right = self._build(indices[median:], depth + 1)
+        self._nodes.append((axis, split, left, right, None))
+        return len(self._nodes) - 1
+
+    def query(self, point: np.ndarray, k: int, max_distance: float) -> List[Tuple[float, int]]:
+        best = []
+        if self._root is None:
+            return best
+
+        def bound():
+            return -best[0][0] if len(best) == k else max_distance
+
+        def visit(node_index):
+            axis, split, left, right, indices = self._nodes[node_index]
+            if indices is not None:
+                distances = np.linalg.norm(self._points[indices] - point, axis=1)
+                for distance, index in zip(distances, indices):
+                    if distance > bound():
+                        continue
+                    if len(best) < k:
+                        heapq.heappush(best, (-distance, index))
+                    else:
+                        heapq.heappushpop(best, (-distance, index))
+                return
+
+            delta = point[axis] - split
+            near, far = (left, right) if delta < 0 else (right, left)
+            visit(near)
+            if abs(delta) <= bound():
+                visit(far)
+
+        visit(self._root)
+        return sorted((-distance, self._ids[index]) for distance, index in best)
+
+
+class CityIndex:
+    def __init__(self, max_age: int = 300, max_pending: int = 256):
+        self._max_age = max_age
+        self._max_pending = max_pending
+        self._lock = threading.Lock()
+        self._tree = None
+        self._built_at = 0
+        # Cities saved or deleted since the tree was built: tree hits for these ids are dropped
+        # and the moved points are scanned linearly until the next rebuild.
+        self._removed = set()
+        self._moved: Dict[int, np.ndarray] = {}
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._tree = None
+
+    def update(self, city_id: int, lat: float, lon: float) -> None:
+        with self._lock:
+            self._removed.add(city_id)
+            self._moved[city_id] = to_unit_vectors([lat], [lon])[0]
+            self._trim()
+
+    def remove(self, city_id: int) -> None:
+        with self._lock:
+            self._removed.add(city_id)
+            self._moved.pop(city_id, None)
+            self._trim()
+
+    def nearest(self, lat: float, lon: float, k: int = 5, max_distance: Optional[float] = None,
+                exclude: Optional[int] = None) -> List[Tuple[int, float]]:
+        chord = _km_to_chord(max_distance) if max_distance is not None else 2.0
+        found = self._query(to_unit_vectors([lat], [lon])[0], k + (exclude is not None), chord)
+        return [(city_id, round(_chord_to_km(distance), 1)) for distance, city_id in found if city_id != exclude][:k]
+
+    def within_radius(self, lat: float, lon: float, radius: float, exclude: Optional[int] = None):
+        found = self._query(to_unit_vectors([lat], [lon])[0], None, _km_to_chord(radius))
+        return [(city_id, round(_chord_to_km(distance), 1)) for distance, city_id in found if city_id != exclude]
+
+    def _query(self, point: np.ndarray, k: Optional[int], max_distance: float) -> List[Tuple[float, int]]:
+        with self._lock:
+            if self._tree is None or time.monotonic() - self._built_at > self._max_age:
+                self._tree = self._build_tree()
+                self._built_at = time.monotonic()
+                self._removed.clear()
+                self._moved.clear()
+            tree, removed, moved = self._tree, set(self._removed), dict(self._moved)
+
+        limit = len(tree) if k is None else k + len(removed)
+        found = [(distance, city_id) for distance, city_id in tree.query(point, limit, max_distance)
+                 if city_id not in removed]
+        if moved:
+            ids = list(moved)
+            distances = np.linalg.norm(np.array([moved[city_id] for city_id in ids]) - point, axis=1)
+            found.extend((float(distance), city_id) for distance, city_id in zip(distances, ids)
+                         if distance <= max_distance)
+            found.sort()
+        return found if k is None else found[:k]
+
+    def _trim(self) -> None:
+        if len(self._removed) > self._max_pending:
+            self._tree = None
+
+    @staticmethod
+    def _build_tree() -> KDTree:
+        from weather.models import City
+
+        rows = list(City.objects.values_list('id', 'lat', 'lon'))
+        if not rows:
+            return KDTree(np.empty((0, 3)), [])
+        ids, lat, lon = zip(*rows)
+        return KDTree(to_unit_vectors(lat, lon), list(ids))
+
+
+city_index = CityIndex()
@@ -0,0 +1,191 @@
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+from django.conf import settings
+
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+
+METRICS = ('temperature', 'humidity', 'wind_speed')
+
+RAW_DTYPE = np.dtype([
+    ('timestamp', '<i8'),
+    ('temperature', '<f4'),
+    ('humidity', '<f4'),
+    ('wind_speed', '<f4'),
+])
+
+ROLLUP_DTYPE = np.dtype([('timestamp', '<i8'), ('count', '<u4')] + [
+    (f'{metric}_{stat}', '<f4') for metric in METRICS for stat in ('min', 'max', 'mean')
+])
+
+
+class WeatherHistoryStore:
+    _TIERS = {'raw': RAW_DTYPE, 'hour': ROLLUP_DTYPE, 'day': ROLLUP_DTYPE}
+
+    def __init__(self, root: Path, raw_retention: int = 2 * DAY, hourly_retention: int = 90 * DAY):
+        self._root = Path(root)
+        self._raw_retention = raw_retention
+        self._hourly_retention = hourly_retention
+        self._lock = threading.Lock()
+
+    def append(self, city_id: int, timestamp: int, temperature: float, humidity: float, wind_speed: float) -> bool:
+        with self._lock:
+            path = self._path(city_id, 'raw')
+            last_timestamp = self._last_timestamp(path)
+            if last_timestamp is not None and last_timestamp >= timestamp:
+                return False
+
+            record = np.array([(timestamp, temperature, humidity, wind_speed)], dtype=RAW_DTYPE)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, 'ab') as file:
+                record.tofile(file)
+            return True
+
+    def downsample(self, city_id: int, now: int) -> None:
+        with self._lock:
+            raw_cutoff = (now - self._raw_retention) // HOUR * HOUR
+            self._roll(city_id, source='raw', target='hour', cutoff=raw_cutoff, step=HOUR)
+            hourly_cutoff = (now - self._hourly_retention) // DAY * DAY
+            self._roll(city_id, source='hour', target='day', cutoff=hourly_cutoff, step=DAY)
+
+    def aggregate(self, city_id: int, start: int, end: int) -> Optional[Dict[str, Dict[str, float]]]:
+        timestamps, counts, minimums, maximums, sums = self._window(city_id, start, end)
+        total = counts.sum()
+        if not total:
+            return None
+        return {
+            metric: {
+                'min': float(minimums[metric].min()),
+                'max': float(maximums[metric].max()),
+                'mean': float(sums[metric].sum() / total),
+            }
+            for metric in METRICS
+        }
+
+    def series(self, city_id: int, start: int, end: int, step: int) -> Dict[str, list]:
+        timestamps, counts, minimums, maximums, sums = self._window(city_id, start, end)
+        buckets = (timestamps - start) // step
+        size = int((end - start) // step) + 1
+        bucket_counts = np.bincount(buckets, weights=counts, minlength=size)
+        filled = bucket_counts > 0
+
+        series = {'timestamp': (start + np.nonzero(filled)[0] * step).tolist()}
+        for metric in METRICS:
+            bucket_sums = np.bincount(buckets, weights=sums[metric], minlength=size)
+            series[metric] = np.round(bucket_sums[filled] / bucket_counts[filled], 1).tolist()
+        return series
+
+    def city_ids(self) -> Iterable[int]:
+        if not self._root.exists():
+            return []
+        return [int(path.name) for path in self._root.iterdir() if path.name.isdigit()]
+
+    def _window(self, city_id: int, start: int, end: int):
+        timestamps, counts = [], []
+        minimums = {metric: [] for metric in METRICS}
+        maximums = {metric: [] for metric in METRICS}
+        sums = {metric: [] for metric in METRICS}
+
+        for tier in ('day', 'hour', 'raw'):
+            data = self._read(city_id, tier)
+            left, right = np.searchsorted(data['timestamp'], [start, end])
+            data = data[left:right]
+            timestamps.append(data['timestamp'])
+            if tier == 'raw':
+                counts.append(np.ones(data.size, dtype=np.float64))
+                for metric in METRICS:
+                    minimums[metric].append(data[metric])
+                    maximums[metric].append(data[metric])
+                    sums[metric].append(data[metric].astype(np.float64))
+            else:
+                counts.append(data['count'].astype(np.float64))
+                for metric in METRICS:
+                    minimums[metric].append(data[f'{metric}_min'])
+                    maximums[metric].append(data[f'{metric}_max'])
+                    sums[metric].append(data[f'{metric}_mean'] * data['count'].astype(np.float64))
+
+        return (
+            np.concatenate(timestamps),
+            np.concatenate(counts),
+            {metric: np.concatenate(values) for metric, values in minimums.items()},
+            {metric: np.concatenate(values) for metric, values in maximums.items()},
+            {metric: np.concatenate(values) for metric, values in sums.items()},
+        )
+
+    def _roll(self, city_id: int, source: str, target: str, cutoff: int, step: int) -> None:
+        data = self._read(city_id, source)
+        split = np.searchsorted(data['timestamp'], cutoff)
+        if not split:
+            return
+
+        old, recent = data[:split], data[split:]
+        buckets = old['timestamp'] // step * step
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+
+        rollup = np.zeros(starts.size, dtype=ROLLUP_DTYPE)
+        rollup['timestamp'] = buckets[starts]
+        if source == 'raw':
+            counts = np.add.reduceat(np.ones(old.size, dtype=np.uint32), starts)
+            for metric in METRICS:
+                rollup[f'{metric}_min'] = np.minimum.reduceat(old[metric], starts)
+                rollup[f'{metric}_max'] = np.maximum.reduceat(old[metric], starts)
+                rollup[f'{metric}_mean'] = np.add.reduceat(old[metric].astype(np.float64), starts) / counts
+        else:
+            counts = np.add.reduceat(old['count'], starts)
+            for metric in METRICS:
+                rollup[f'{metric}_min'] = np.minimum.reduceat(old[f'{metric}_min'], starts)
+                rollup[f'{metric}_max'] = np.maximum.reduceat(old[f'{metric}_max'], starts)
+                weighted = old[f'{metric}_mean'].astype(np.float64) * old['count']
+                rollup[f'{metric}_mean'] = np.add.reduceat(weighted, starts) / counts
+        rollup['count'] = counts
+
+        existing = self._read(city_id, target)
+        if existing.size and existing['timestamp'][-1] == rollup['timestamp'][0]:
+            rollup = self._merge_boundary(existing[-1], rollup)
+            existing = existing[:-1]
+
+        self._write(city_id, target, np.concatenate([existing, rollup]))
+        self._write(city_id, source, recent)
+
+    @staticmethod
+    def _merge_boundary(previous, rollup):
+        first = rollup[0]
+        count = previous['count'] + first['count']
+        for metric in METRICS:
+            first[f'{metric}_min'] = min(previous[f'{metric}_min'], first[f'{metric}_min'])
+            first[f'{metric}_max'] = max(previous[f'{metric}_max'], first[f'{metric}_max'])
+            first[f'{metric}_mean'] = (previous[f'{metric}_mean'] * previous['count']
+                                       + first[f'{metric}_mean'] * first['count']) / count
+        first['count'] = count
+        return rollup
+
+    @staticmethod
+    def _last_timestamp(path: Path) -> Optional[int]:
+        if not path.exists() or path.stat().st_size < RAW_DTYPE.itemsize:
+            return None
+        with open(path, 'rb') as file:
+            file.seek(-RAW_DTYPE.itemsize, os.SEEK_END)
+            return int(np.frombuffer(file.read(RAW_DTYPE.itemsize), dtype=RAW_DTYPE)['timestamp'][0])
+
+    def _read(self, city_id: int, tier: str) -> np.ndarray:
+        path = self._path(city_id, tier)
+        if not path.exists():
+            return np.empty(0, dtype=self._TIERS[tier])
+        return np.fromfile(path, dtype=self._TIERS[tier])
+
+    def _write(self, city_id: int, tier: str, data: np.ndarray) -> None:
+        path = self._path(city_id, tier)
+        tmp_path = path.with_suffix('.tmp')
+        data.tofile(tmp_path)
+        os.replace(tmp_path, path)
+
+    def _path(self, city_id: int, tier: str) -> Path:
+        return self._root / str(city_id) / f'{tier}.bin'
+
+
+history_store = WeatherHistoryStore(settings.WEATHER_HISTORY_DIR)
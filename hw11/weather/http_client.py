@@ -0,0 +1,45 @@
+import contextvars
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from core.metrics import record_upstream
+
+
+POOL_SIZE = 20
+
+UPSTREAMS = {
+    'api.openweathermap.org': 'openweather',
+    'restcountries.com': 'restcountries',
+    'api.geonames.org': 'geonames',
+    'en.wikipedia.org': 'wikipedia',
+}
+
+
+class TimedSession(requests.Session):
+    def request(self, method, url, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().request(method, url, *args, **kwargs)
+        finally:
+            host = urlsplit(url).hostname
+            record_upstream(UPSTREAMS.get(host, host), time.perf_counter() - started)
+
+
+def _build_session() -> requests.Session:
+    http_session = TimedSession()
+    adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+    http_session.mount('http://', adapter)
+    http_session.mount('https://', adapter)
+    return http_session
+
+
+session = _build_session()
+executor = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix='weather-http')
+
+
+def submit(func, *args, **kwargs) -> Future:
+    return executor.submit(contextvars.copy_context().run, func, *args, **kwargs)
@@ -0,0 +1,229 @@
+import csv
+import io
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.db import transaction, close_old_connections, IntegrityError
+from django.utils.text import slugify
+
+from weather.dto import CityImportRowDTO, CityImportResultDTO
+from weather.exceptions import EnrichmentError
+from weather.gazetteer import gazetteer
+from weather.geo import city_index, encode_geohash
+from weather.models import City, Country, UserCity
+from weather.quota import quota_priority, BACKGROUND
+from weather.registry import country_registry
+from weather.solar import solar_calendar
+from weather.tasks import enrich_city, enrich_country, enqueue_city_enrichment
+
+
+logger = logging.getLogger('weather.importer')
+
+
+class CityImportError(ValueError):
+    pass
+
+
+def parse_rows(data: str, format: Optional[str] = None) -> List[CityImportRowDTO]:
+    data = data.strip()
+    if format is None:
+        format = 'json' if data[:1] in '[{' else 'csv'
+
+    if format == 'json':
+        try:
+            items = json.loads(data)
+        except ValueError as error:
+            raise CityImportError(f'Invalid JSON: {error}')
+        if isinstance(items, dict):
+            items = items.get('cities', [])
+        if not isinstance(items, list):
+            raise CityImportError('Expected a list of cities')
+        items = [{'city': item} if isinstance(item, str) else item for item in items]
+    elif format == 'csv':
+        items = list(csv.DictReader(io.StringIO(data)))
+    else:
+        raise CityImportError(f'Unknown format {format}')
+
+    if len(items) > settings.WEATHER_IMPORT_MAX_ROWS:
+        raise CityImportError(f'At most {settings.WEATHER_IMPORT_MAX_ROWS} rows can be imported at once')
+    return [_parse_row(line, item) for line, item in enumerate(items, start=1)]
+
+
+def _parse_row(line: int, item) -> CityImportRowDTO:
+    if not isinstance(item, dict):
+        return CityImportRowDTO(line, None, None, None, None)
+    city = str(item.get('city') or '').strip() or None
+    country_code = str(item.get('country_code') or '').strip().upper() or None
+    try:
+        lat = float(item['lat']) if item.get('lat') not in (None, '') else None
+        lon = float(item['lon']) if item.get('lon') not in (None, '') else None
+    except (TypeError, ValueError):
+        lat = lon = None
+    return CityImportRowDTO(line, city, country_code, lat, lon)
+
+
+class CityImporter:
+    CREATED = 'created'
+    ADDED = 'added'
+    DUPLICATE = 'duplicate'
+    INVALID = 'invalid'
+    NOT_FOUND = 'not_found'
+
+    def __init__(self, concurrency: int = 4):
+        self._concurrency = concurrency
+
+    def run(self, user, rows: Iterable[CityImportRowDTO], enrich: bool = False) -> List[CityImportResultDTO]:
+        results, resolved = {}, {}
+        for row in rows:
+            row, error = self._resolve(row)
+            if error is not None:
+                results[row.line] = CityImportResultDTO(row.line, row.city, *error)
+            else:
+                resolved[row.line] = row
+
+        with transaction.atomic():
+            countries = self._get_countries({row.country_code for row in resolved.values()})
+            cities, created = self._get_cities(resolved.values(), countries)
+            linked = self._link(user, cities, resolved, results, created)
+
+        lines = {cities[line].id: line for line in resolved
+                 if line in cities and results[line].status in (self.CREATED, self.ADDED)}
+        pending = [cities[line] for line in lines.values()
+                   if not (cities[line].is_enriched and cities[line].country.is_enriched)]
+        if enrich:
+            for city_id, error in self.enrich(pending).items():
+                results[lines[city_id]] = results[lines[city_id]]._replace(message=f'Enrichment failed: {error}')
+        else:
+            for city in pending:
+                enqueue_city_enrichment(city.id)
+        return [results[line] for line in sorted(results)]
+
+    def enrich(self, cities: List[City]) -> Dict[int, str]:
+        countries = {city.country_id: city.country for city in cities}
+        with ThreadPoolExecutor(max_workers=self._concurrency, thread_name_prefix='weather-import') as executor:
+            country_futures = {country_id: executor.submit(self._enrich_job, enrich_country, country)
+                               for country_id, country in countries.items()}
+            country_errors = {country_id: future.result() for country_id, future in country_futures.items()}
+            city_futures = {city.id: executor.submit(self._enrich_job, enrich_city, city) for city in cities}
+            city_errors = {city_id: future.result() for city_id, future in city_futures.items()}
+
+        errors = {}
+        for city in cities:
+            error = country_errors[city.country_id] or city_errors[city.id]
+            if error:
+                errors[city.id] = error
+        return errors
+
+    @staticmethod
+    @quota_priority(BACKGROUND)
+    def _enrich_job(enrich, instance) -> Optional[str]:
+        close_old_connections()
+        try:
+            enrich(instance)
+        except (EnrichmentError, TimeoutError, IntegrityError) as error:
+            return str(error) or type(error).__name__
+        except Exception as error:
+            logger.exception('Enrichment of %r crashed during import', instance)
+            return str(error) or type(error).__name__
+        finally:
+            close_old_connections()
+        return None
+
+    def _resolve(self, row: CityImportRowDTO):
+        if (row.lat is None) != (row.lon is None):
+            return row, (self.INVALID, 'Both latitude and longitude are required')
+        if row.city is None and row.lat is None:
+            return row, (self.INVALID, 'Either a city name or coordinates are required')
+        if row.lat is not None and not (-90 <= row.lat <= 90 and -180 <= row.lon <= 180):
+            return row, (self.INVALID, 'Coordinates are out of range')
+
+        if (row.lat is None or row.city is None or row.country_code is None) and not len(gazetteer):
+            return row, (self.NOT_FOUND, 'The city gazetteer is not available, give a country code and coordinates')
+        if row.lat is None:
+            place = gazetteer.resolve(f'{row.city},{row.country_code or ""}')
+        elif row.city is None or row.country_code is None:
+            place = gazetteer.nearest(row.lat, row.lon, max_distance=settings.WEATHER_CITY_DEDUP_RADIUS)
+        else:
+            return row, None
+
+        if place is None:
+            return row, (self.NOT_FOUND, 'City is not in the gazetteer')
+        return row._replace(city=row.city or place.name,
+                            country_code=row.country_code or place.country_code,
+                            lat=place.lat if row.lat is None else row.lat,
+                            lon=place.lon if row.lon is None else row.lon), None
+
+    def _get_countries(self, codes) -> Dict[str, Country]:
+        countries = {code: country_registry.get(code) for code in codes}
+        missing = [code for code, country in countries.items() if country is None]
+        if missing:
+            Country.objects.bulk_create([Country(code=code, name=code, slug=slugify(code)) for code in missing],
+                                        ignore_conflicts=True)
+            country_registry.invalidate()
+            countries.update((code, country_registry.get(code)) for code in missing)
+        return countries
+
+    def _get_cities(self, rows, countries):
+        names = {row.city for row in rows}
+        existing = {city.name: city for city in self._cities().filter(name__in=names)}
+
+        cities, new, nearby = {}, {}, {}
+        for row in rows:
+            city = existing.get(row.city) or new.get(row.city)
+            if city is None:
+                nearest = city_index.nearest(row.lat, row.lon, k=1, max_distance=settings.WEATHER_CITY_DEDUP_RADIUS)
+                if nearest:
+                    nearby[row.line] = nearest[0][0]
+                    continue
+                city = new[row.city] = City(name=row.city, slug=slugify(row.city), lat=row.lat, lon=row.lon,
+                                            geohash=encode_geohash(row.lat, row.lon),
+                                            country=countries[row.country_code])
+            cities[row.line] = city
+
+        if nearby:
+            nearby_cities = self._cities().in_bulk(set(nearby.values()))
+            cities.update((line, nearby_cities[city_id]) for line, city_id in nearby.items())
+        if new:
+            City.objects.bulk_create(new.values(), ignore_conflicts=True)
+            stored = {city.name: city for city in self._cities().filter(name__in=new)}
+            cities = {line: stored.get(city.name, city) for line, city in cities.items()}
+            self._invalidate({city.country_id for city in stored.values()})
+        created = {city.id for city in cities.values() if city.name in new}
+        return {line: city for line, city in cities.items() if city.id is not None}, created
+
+    @staticmethod
+    def _cities():
+        return City.objects.lean().select_related('country').defer('country__description_zlib')
+
+    def _link(self, user, cities, rows, results, created):
+        tracked = set(UserCity.objects.filter(user=user, city__in=[city.id for city in cities.values()])
+                      .values_list('city_id', flat=True))
+        linked = set()
+        for line, row in rows.items():
+            city = cities.get(line)
+            if city is None:
+                results[line] = CityImportResultDTO(line, row.city, self.INVALID, 'City could not be saved')
+            elif city.id in tracked or city.id in linked:
+                results[line] = CityImportResultDTO(line, city.name, self.DUPLICATE,
+                                                    f'City {city.name} is already in your list')
+            else:
+                linked.add(city.id)
+                status = self.CREATED if city.id in created else self.ADDED
+                results[line] = CityImportResultDTO(line, city.name, status)
+
+        UserCity.objects.bulk_create([UserCity(user=user, city_id=city_id) for city_id in linked])
+        return linked
+
+    @staticmethod
+    def _invalidate(country_ids) -> None:
+        city_index.invalidate()
+        solar_calendar.invalidate()
+        cache.delete_many([make_template_fragment_key('country_cities', [country_id]) for country_id in country_ids])
+
+
+city_importer = CityImporter(concurrency=settings.WEATHER_IMPORT_CONCURRENCY)
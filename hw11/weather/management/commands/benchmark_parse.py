@@ -0,0 +1,46 @@
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from weather import json_backend
+from weather.services import weather_today_service, restcountries_service, geonames_service, wiki_service
+
+
+PAYLOADS_DIR = Path(__file__).resolve().parents[2] / 'payloads'
+
+
+class Command(BaseCommand):
+    help = 'Measure decode and parse throughput of the weather services on recorded payloads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20000)
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        cases = (
+            ('WeatherTodayService', weather_today_service, 'openweather_weather.json'),
+            ('RestcountriesService', restcountries_service, 'restcountries_alpha.json'),
+            ('GeonamesService', geonames_service, 'geonames_country_info.json'),
+            ('WikiService', wiki_service, 'wikipedia_query.json'),
+        )
+
+        backend = 'orjson' if json_backend.orjson is not None else 'json'
+        self.stdout.write(f'JSON backend: {backend}, iterations: {iterations}')
+        self.stdout.write(f'{"service":<22}{"bytes":>8}{"decode/s":>12}{"parse/s":>12}{"total/s":>12}')
+
+        for name, service, payload_name in cases:
+            content = (PAYLOADS_DIR / payload_name).read_bytes()
+            response_json = json_backend.loads(content)
+
+            decode = self._measure(iterations, lambda: json_backend.loads(content))
+            parse = self._measure(iterations, lambda: service._parse_response_json(response_json))
+            total = self._measure(iterations, lambda: service._parse_response_json(json_backend.loads(content)))
+            self.stdout.write(f'{name:<22}{len(content):>8}{decode:>12,.0f}{parse:>12,.0f}{total:>12,.0f}')
+
+    @staticmethod
+    def _measure(iterations, func):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        return iterations / (time.perf_counter() - started)
@@ -0,0 +1,46 @@
+import math
+import random
+import time
+from datetime import date
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from weather.solar import solar_times
+
+
+class Command(BaseCommand):
+    help = 'Benchmark vectorized sunrise/sunset computation against a per-coordinate loop'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--points', type=int, default=100000)
+        parser.add_argument('--iterations', type=int, default=5)
+        parser.add_argument('--loop-points', type=int, default=2000,
+                            help='Coordinates computed one by one for comparison')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        lat = np.degrees(np.arcsin(rng.uniform(-1, 1, options['points'])))
+        lon = rng.uniform(-180, 180, options['points'])
+        day = date.today()
+
+        timings = []
+        for _ in range(options['iterations']):
+            started = time.perf_counter()
+            sunrise, sunset, day_length = solar_times(lat, lon, day)
+            timings.append(time.perf_counter() - started)
+        vectorized = min(timings)
+
+        indices = random.Random(options['seed']).sample(range(options['points']), options['loop_points'])
+        started = time.perf_counter()
+        for index in indices:
+            solar_times([lat[index]], [lon[index]], day)
+        loop = (time.perf_counter() - started) / len(indices) * options['points']
+
+        polar = int(np.isnan(sunrise).sum())
+        self.stdout.write(f'{options["points"]} coordinates, {polar} in polar day or night')
+        self.stdout.write(f'vectorized {vectorized * 1000:>10.2f} ms  '
+                          f'({options["points"] / vectorized / 1e6:.1f}M coordinates/s)')
+        self.stdout.write(f'loop       {loop * 1000:>10.2f} ms  (extrapolated from {len(indices)} coordinates)')
+        self.stdout.write(self.style.SUCCESS(f'Speedup x{math.floor(loop / vectorized)}'))
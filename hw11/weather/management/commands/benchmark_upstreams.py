@@ -0,0 +1,176 @@
+import json
+import random
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date
+from unittest import mock
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from accounts.models import CustomUser, Profile
+from weather.circuit_breaker import get_breaker, isolated_breakers
+from weather.http_client import session
+from weather.models import Country
+from weather.quota import quota_manager
+from weather.registry import country_registry
+from weather.services import FallbackCountryFacade, CountryFacade, weather_today_service, restcountries_service, \
+    geonames_service, wiki_service
+from weather.simulator import UpstreamSimulator, FaultProfile, LatencyModel
+
+
+COUNTRY_CODES = ('UA', 'PL', 'DE', 'FR', 'GB', 'IT', 'ES', 'US', 'CA', 'JP')
+
+
+class Command(BaseCommand):
+    help = 'Benchmark weather services against the offline upstream simulator'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Calls per target')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--latency', default='lognormal:80:0.5',
+                            help='fixed:MS, uniform:LOW_MS:HIGH_MS or lognormal:MEDIAN_MS:SIGMA')
+        parser.add_argument('--error-rate', type=float, default=0.0)
+        parser.add_argument('--timeout-rate', type=float, default=0.0)
+        parser.add_argument('--malformed-rate', type=float, default=0.0)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--targets', nargs='*',
+                            default=['weather_today', 'fallback_country', 'country_facade', 'user_city_create'])
+        parser.add_argument('--output', help='Write results as JSON to this path')
+        parser.add_argument('--respect-quotas', action='store_true',
+                            help='Keep UPSTREAM_QUOTAS enabled instead of benchmarking without rate limits')
+
+    def handle(self, *args, **options):
+        profile = FaultProfile(latency=LatencyModel.parse(options['latency']),
+                               error_rate=options['error_rate'],
+                               timeout_rate=options['timeout_rate'],
+                               malformed_rate=options['malformed_rate'])
+        targets = {
+            'weather_today': lambda index: weather_today_service.get_weather('Kyiv', 'key'),
+            'fallback_country': lambda index: FallbackCountryFacade(
+                [restcountries_service, geonames_service]).get_country_by_code('UA', 'key'),
+            'country_facade': self._country_facade,
+            'user_city_create': self._user_city_create,
+        }
+
+        results = {}
+        quotas = settings.UPSTREAM_QUOTAS if options['respect_quotas'] else {}
+        with UpstreamSimulator(default=profile, seed=options['seed']) as simulator, quota_manager.override(quotas), \
+                isolated_breakers():
+            simulator.install(session)
+            try:
+                for name in options['targets']:
+                    self._reset_breakers()
+                    if name == 'user_city_create':
+                        with self._test_database():
+                            results[name] = self._run(targets[name], options['requests'], options['concurrency'])
+                    else:
+                        results[name] = self._run(targets[name], options['requests'], options['concurrency'])
+                    self._report(name, results[name])
+            finally:
+                simulator.uninstall(session)
+
+        if options['output']:
+            report = {'options': {key: options[key] for key in ('requests', 'concurrency', 'latency', 'error_rate',
+                                                                'timeout_rate', 'malformed_rate', 'seed')},
+                      'results': results}
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Results written to {options["output"]}'))
+
+    def _run(self, target, requests, concurrency):
+        latencies, errors = [], 0
+        lock = threading.Lock()
+
+        def call(index):
+            nonlocal errors
+            started = time.perf_counter()
+            try:
+                target(index)
+                failed = False
+            except Exception:
+                failed = True
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                errors += failed
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(call, range(requests)))
+        duration = time.perf_counter() - started
+
+        quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+        return {
+            'requests': requests,
+            'errors': errors,
+            'throughput': round(requests / duration, 2),
+            'p50_ms': round(quantiles[49] * 1000, 2),
+            'p95_ms': round(quantiles[94] * 1000, 2),
+            'p99_ms': round(quantiles[98] * 1000, 2),
+        }
+
+    def _report(self, name, result):
+        self.stdout.write(f'{name:<18} p50 {result["p50_ms"]:>8} ms  p95 {result["p95_ms"]:>8} ms  '
+                          f'p99 {result["p99_ms"]:>8} ms  {result["throughput"]:>8} req/s  '
+                          f'errors {result["errors"]}/{result["requests"]}')
+
+    @staticmethod
+    def _country_facade(index):
+        country_facade = CountryFacade(country_services=[restcountries_service, geonames_service],
+                                       wiki_service=wiki_service)
+        country_facade.get_country_data(code='UA', api_key='key')
+        if not country_facade.is_valid():
+            raise RuntimeError(country_facade.get_errors())
+
+    def _user_city_create(self, index):
+        client = self._local.client if hasattr(self._local, 'client') else self._login()
+        rng = random.Random(index)
+        response = client.post('/weather/user/city/create/', {
+            'city': f'Benchmark City {index}',
+            'country_code': rng.choice(COUNTRY_CODES),
+            'lat': rng.uniform(-80, 80),
+            'lon': rng.uniform(-180, 180),
+        })
+        if response.status_code != 302:
+            raise RuntimeError(f'Unexpected status {response.status_code}')
+
+    def _login(self):
+        client = Client()
+        client.force_login(self._user)
+        self._local.client = client
+        return client
+
+    @staticmethod
+    def _reset_breakers():
+        for service in (restcountries_service, geonames_service, wiki_service):
+            get_breaker(type(service).__name__).reset()
+
+    @contextmanager
+    def _test_database(self):
+        setup_test_environment()
+        settings.ALLOWED_HOSTS = ['*']
+        settings.DATABASES['default'].setdefault('TEST', {})['NAME'] = \
+            tempfile.NamedTemporaryFile(suffix='.sqlite3').name
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self._local = threading.local()
+            self._user = CustomUser.objects.create_user('bench@example.com', 'bench', 'Bench', 'User',
+                                                        'benchmark-password')
+            Profile(user=self._user, gender='male', date_of_birth=date(1990, 1, 1), bio='-', info='-').save()
+            Country.objects.bulk_create(Country(name=code, slug=code.lower(), code=code, enrichment_status=Country.DONE)
+                                        for code in COUNTRY_CODES)
+            country_registry.invalidate()
+            # Background enrichment would outlive the temporary database, so only the request itself is measured
+            with mock.patch('weather.views.enqueue_city_enrichment'):
+                yield
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from weather.models import City, EnrichableModel
+from weather.quota import quota_priority, BACKGROUND
+from weather.tasks import enrich_city, enrich_country, record_enrichment_failure
+
+
+class Command(BaseCommand):
+    help = 'Enrich cities and countries that are still waiting for descriptions, images and country details'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--include-failed', action='store_true', help='Also retry enrichment that gave up')
+
+    @quota_priority(BACKGROUND)
+    def handle(self, *args, **options):
+        statuses = [EnrichableModel.PENDING]
+        if options['include_failed']:
+            statuses.append(EnrichableModel.FAILED)
+
+        cities = (City.objects
+                  .select_related('country')
+                  .filter(Q(enrichment_status__in=statuses) | Q(country__enrichment_status__in=statuses)))
+
+        enriched = failed = 0
+        for city in cities:
+            try:
+                enrich_country(city.country)
+                enrich_city(city)
+                enriched += 1
+            except Exception as error:
+                failed += 1
+                record_enrichment_failure(city.id, city.enrichment_attempts + 1)
+                self.stderr.write(f'{city.name}: {error!r}')
+        self.stdout.write(self.style.SUCCESS(f'Enriched {enriched} cities, {failed} failed'))
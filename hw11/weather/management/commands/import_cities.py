@@ -0,0 +1,42 @@
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import CustomUser
+from weather.importer import CityImporter, parse_rows, CityImportError
+
+
+class Command(BaseCommand):
+    help = 'Add cities from a CSV or JSON file to a user list, enriching new cities and countries concurrently'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file with a city,country_code,lat,lon header or a JSON list')
+        parser.add_argument('--user', required=True, help='Email of the user the cities are added to')
+        parser.add_argument('--format', choices=('csv', 'json'), help='Detected from the content by default')
+        parser.add_argument('--concurrency', type=int, default=settings.WEATHER_IMPORT_CONCURRENCY,
+                            help='Upper bound of parallel enrichment calls')
+        parser.add_argument('--no-enrich', action='store_true',
+                            help='Queue enrichment in the background instead of waiting for it')
+
+    def handle(self, *args, **options):
+        try:
+            user = CustomUser.objects.get(email=options['user'])
+        except CustomUser.DoesNotExist:
+            raise CommandError(f'User {options["user"]} not found')
+
+        try:
+            with open(options['path'], encoding='utf-8-sig') as file:
+                rows = parse_rows(file.read(), options['format'])
+        except (OSError, CityImportError) as error:
+            raise CommandError(str(error))
+
+        importer = CityImporter(concurrency=options['concurrency'])
+        results = importer.run(user, rows, enrich=not options['no_enrich'])
+        for result in results:
+            line = f'{result.line:>5}  {result.city or "-":<30} {result.status:<10} {result.message}'
+            self.stdout.write(line if result.status in (importer.CREATED, importer.ADDED) else self.style.WARNING(line))
+
+        counts = Counter(result.status for result in results)
+        summary = ', '.join(f'{status} {count}' for status, count in sorted(counts.items()))
+        self.stdout.write(self.style.SUCCESS(summary))
@@ -0,0 +1,60 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.text import slugify
+
+from weather.models import Country
+from weather.registry import country_registry
+from weather.services import RestcountriesService, ResponseException, ServerReturnInvalidResponse, \
+    restcountries_service
+
+
+class Command(BaseCommand):
+    help = 'Load every country into the database in a single bulk upsert'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--snapshot', default=settings.WEATHER_COUNTRIES_SNAPSHOT,
+                            help='restcountries /v3.1/all response stored as JSON')
+        parser.add_argument('--online', action='store_true', help='Fetch the list from restcountries instead')
+        parser.add_argument('--save-snapshot', action='store_true', help='Store the fetched list as the snapshot')
+
+    def handle(self, *args, **options):
+        if options['online']:
+            response_json = self._fetch(options['save_snapshot'] and options['snapshot'])
+        else:
+            try:
+                with open(options['snapshot'], 'rb') as file:
+                    response_json = json.load(file)
+            except FileNotFoundError:
+                raise CommandError(f'Snapshot {options["snapshot"]} not found, run with --online --save-snapshot')
+
+        countries = [Country(name=country.name,
+                             slug=slugify(country.name),
+                             code=country.code,
+                             capital=country.capital,
+                             population=country.population,
+                             flag=country.flag)
+                     for country in RestcountriesService.parse_catalogue_json(response_json)]
+
+        Country.objects.bulk_create(countries,
+                                    batch_size=500,
+                                    update_conflicts=True,
+                                    unique_fields=['code'],
+                                    update_fields=['name', 'slug', 'capital', 'population', 'flag'])
+        country_registry.invalidate()
+        self.stdout.write(self.style.SUCCESS(f'Loaded {len(countries)} countries'))
+
+    @staticmethod
+    def _fetch(snapshot):
+        try:
+            response_json = restcountries_service.get_all_countries_json()
+        except (ResponseException, ServerReturnInvalidResponse) as error:
+            raise CommandError(f'Could not fetch countries: {error}')
+
+        if snapshot:
+            Path(snapshot).parent.mkdir(parents=True, exist_ok=True)
+            with open(snapshot, 'w', encoding='utf-8') as file:
+                json.dump(response_json, file, ensure_ascii=False)
+        return response_json
@@ -0,0 +1,41 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from weather.alerts import alert_evaluator
+from weather.forecast import forecast_provider
+from weather.prefetch import WeatherPrefetcher
+from weather.quota import quota_priority, BACKGROUND
+from weather.services import batch_weather_service
+
+
+class Command(BaseCommand):
+    help = 'Refresh weather snapshots for every city tracked by at least one user'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run a single refresh and exit')
+        parser.add_argument('--interval', type=int, default=settings.WEATHER_REFRESH_INTERVAL,
+                            help='Seconds between refreshes')
+        parser.add_argument('--calls-per-minute', type=int, default=settings.WEATHER_REFRESH_CALLS_PER_MINUTE,
+                            help='Upper bound of upstream calls per minute')
+
+    @quota_priority(BACKGROUND)
+    def handle(self, *args, **options):
+        prefetcher = WeatherPrefetcher(batch_service=batch_weather_service,
+                                       api_key=settings.WEATHER_API_KEY,
+                                       calls_per_minute=options['calls_per_minute'],
+                                       timeout=settings.WEATHER_BATCH_TIMEOUT)
+        while True:
+            started = time.monotonic()
+            refreshed = prefetcher.refresh()
+            alerts = alert_evaluator.evaluate()
+            forecasts = prefetcher.refresh_forecasts(forecast_provider)
+            pruned = prefetcher.prune(max_age=settings.WEATHER_SNAPSHOT_MAX_AGE * 24)
+            prefetcher.downsample_history()
+            self.stdout.write(self.style.SUCCESS(f'Refreshed {refreshed} cities and {forecasts} forecasts, '
+                                                 f'triggered {alerts} alerts, pruned {pruned} snapshots'))
+
+            if options['once']:
+                break
+            time.sleep(max(0, options['interval'] - (time.monotonic() - started)))
@@ -0,0 +1,29 @@
+from django.db import models
+from django.db.models import Max
+
+
+class DescribedQuerySet(models.QuerySet):
+    def lean(self):
+        return self.defer('description_zlib')
+
+
+class WeatherSnapshotManager(models.Manager):
+    def latest_for_cities(self, city_ids):
+        snapshots = (self.get_queryset()
+                     .filter(id__in=self._latest_ids(city_ids))
+                     .select_related('city__country')
+                     .defer('city__description_zlib', 'city__country__description_zlib'))
+        return {snapshot.city_id: snapshot for snapshot in snapshots}
+
+    def latest_readings(self, city_ids, since):
+        return (self.get_queryset()
+                .filter(id__in=self._latest_ids(city_ids), created__gte=since)
+                .order_by('city_id')
+                .values_list('city_id', 'temperature', 'wind_speed', 'humidity'))
+
+    def _latest_ids(self, city_ids):
+        return (self.get_queryset()
+                .filter(city_id__in=city_ids)
+                .values('city_id')
+                .annotate(latest_id=Max('id'))
+                .values('latest_id'))
@@ -0,0 +1,29 @@
+# Generated by Django 4.2 on 2026-10-19 15:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ServiceHealth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64, unique=True)),
+                ('state', models.CharField(choices=[('closed', 'Closed'), ('open', 'Open'), ('half_open', 'Half-open')], default='closed', max_length=9)),
+                ('error_rate', models.FloatField(default=0)),
+                ('avg_latency', models.FloatField(default=0, verbose_name='average latency (s)')),
+                ('score', models.FloatField(default=1)),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Service health',
+                'ordering': ('-score',),
+            },
+        ),
+    ]
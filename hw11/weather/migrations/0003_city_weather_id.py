@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-19 15:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather', '0002_servicehealth'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='city',
+            name='weather_id',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='OpenWeather city id'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2 on 2026-10-19 15:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather', '0003_city_weather_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WeatherSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('condition', models.CharField(max_length=64)),
+                ('icon', models.CharField(max_length=8)),
+                ('temperature', models.IntegerField()),
+                ('wind_speed', models.FloatField()),
+                ('humidity', models.IntegerField()),
+                ('sunrise', models.CharField(max_length=5)),
+                ('sunset', models.CharField(max_length=5)),
+                ('observed', models.DateTimeField()),
+                ('created', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('city', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='weather.city')),
+            ],
+            options={
+                'ordering': ('-created',),
+                'get_latest_by': 'created',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='weathersnapshot',
+            index=models.Index(fields=['city', '-created'], name='weather_wea_city_id_9a03ed_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations, models
+
+from weather.geo import encode_geohash
+
+
+def fill_geohash(apps, schema_editor):
+    City = apps.get_model('weather', 'City')
+    cities = list(City.objects.all())
+    for city in cities:
+        city.geohash = encode_geohash(city.lat, city.lon)
+    City.objects.bulk_update(cities, ['geohash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather', '0004_weathersnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='city',
+            name='geohash',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=12),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_geohash, migrations.RunPython.noop),
+    ]
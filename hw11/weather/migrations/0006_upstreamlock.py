@@ -0,0 +1,22 @@
+# Generated by Django 4.2 on 2026-10-19 15:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather', '0005_city_geohash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UpstreamLock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255, unique=True)),
+                ('owner', models.CharField(max_length=64)),
+                ('expires', models.DateTimeField()),
+            ],
+        ),
+    ]
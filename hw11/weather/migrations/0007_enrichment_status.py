@@ -0,0 +1,69 @@
+# Generated by Django 4.2 on 2026-10-19 15:19
+
+from django.db import migrations, models
+
+
+def mark_existing_enriched(apps, schema_editor):
+    for model_name in ('Country', 'City'):
+        apps.get_model('weather', model_name).objects.update(enrichment_status='done')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather', '0006_upstreamlock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='city',
+            name='enrichment_attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='city',
+            name='enrichment_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='pending', max_length=7),
+        ),
+        migrations.AddField(
+            model_name='country',
+            name='enrichment_attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='country',
+            name='enrichment_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='pending', max_length=7),
+        ),
+        migrations.AlterField(
+            model_name='city',
+            name='description',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AlterField(
+            model_name='city',
+            name='image',
+            field=models.URLField(blank=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='country',
+            name='capital',
+            field=models.CharField(blank=True, max_length=200, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='country',
+            name='description',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AlterField(
+            model_name='country',
+            name='flag',
+            field=models.URLField(blank=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='country',
+            name='population',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(mark_existing_enriched, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2 on 2026-10-19 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather', '0007_enrichment_status'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='country',
+            name='capital',
+            field=models.CharField(blank=True, max_length=200, null=True),
+        ),
+        migrations.AlterField(
+            model_name='country',
+            name='code',
+            field=models.CharField(max_length=3, unique=True),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 4.2 on 2026-10-19 18:02
+
+import zlib
+
+from django.db import migrations, models
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
+
+
+def compress_descriptions(apps, schema_editor):
+    for model_name in ('Country', 'City'):
+        model = apps.get_model('weather', model_name)
+        objects = list(model.objects.exclude(description='').only('id', 'description'))
+        for obj in objects:
+            obj.description_zlib = zlib.compress(obj.description.encode(), 9)
+            obj.summary = Truncator(' '.join(strip_tags(obj.description).split())).chars(300)
+        model.objects.bulk_update(objects, ['description_zlib', 'summary'], batch_size=100)
+
+
+def decompress_descriptions(apps, schema_editor):
+    for model_name in ('Country', 'City'):
+        model = apps.get_model('weather', model_name)
+        objects = list(model.objects.exclude(description_zlib=b'').only('id', 'description_zlib'))
+        for obj in objects:
+            obj.description = zlib.decompress(obj.description_zlib).decode()
+        model.objects.bulk_update(objects, ['description'], batch_size=100)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather', '0008_country_code_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='city',
+            name='description_zlib',
+            field=models.BinaryField(blank=True, default=b''),
+        ),
+        migrations.AddField(
+            model_name='city',
+            name='summary',
+            field=models.CharField(blank=True, default='', max_length=300),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='country',
+            name='description_zlib',
+            field=models.BinaryField(blank=True, default=b''),
+        ),
+        migrations.AddField(
+            model_name='country',
+            name='summary',
+            field=models.CharField(blank=True, default='', max_length=300),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='city',
+            name='description',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AlterField(
+            model_name='country',
+            name='description',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.RunPython(compress_descriptions, decompress_descriptions),
+        migrations.RemoveField(
+            model_name='city',
+            name='description',
+        ),
+        migrations.RemoveField(
+            model_name='country',
+            name='description',
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2 on 2026-10-19 15:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather', '0009_compressed_description'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WeatherForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timezone', models.IntegerField(default=0, verbose_name='UTC offset (s)')),
+                ('data', models.BinaryField()),
+                ('issued', models.DateTimeField()),
+                ('expires', models.DateTimeField(db_index=True)),
+                ('city', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='forecast', to='weather.city')),
+            ],
+        ),
+    ]
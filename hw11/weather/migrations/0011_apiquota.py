@@ -0,0 +1,30 @@
+# Generated by Django 4.2 on 2026-10-19 15:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather', '0010_weatherforecast'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApiQuota',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64, unique=True)),
+                ('per_minute', models.PositiveIntegerField()),
+                ('per_day', models.PositiveIntegerField()),
+                ('tokens', models.FloatField()),
+                ('refilled', models.FloatField(verbose_name='last refill (unix time)')),
+                ('day', models.DateField()),
+                ('used_today', models.PositiveIntegerField(default=0)),
+                ('shed_today', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ('name',),
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2 on 2026-10-19 15:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather', '0011_apiquota'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertSubscription',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(choices=[('temperature', 'Temperature, °C'), ('wind_speed', 'Wind, km/h'), ('humidity', 'Humidity, %')], max_length=16)),
+                ('lower', models.FloatField(blank=True, null=True, verbose_name='alert below')),
+                ('upper', models.FloatField(blank=True, null=True, verbose_name='alert above')),
+                ('is_active', models.BooleanField(default=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('user_city', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alerts', to='weather.usercity')),
+            ],
+            options={
+                'ordering': ('-created',),
+            },
+        ),
+        migrations.CreateModel(
+            name='AlertNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.FloatField()),
+                ('window', models.PositiveBigIntegerField(verbose_name='dedupe window start (unix time)')),
+                ('is_read', models.BooleanField(default=False)),
+                ('created', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('subscription', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='weather.alertsubscription')),
+            ],
+            options={
+                'ordering': ('-created',),
+                'unique_together': {('subscription', 'window')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-19 15:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather', '0012_alerts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='city',
+            name='utc_offset',
+            field=models.IntegerField(blank=True, null=True, verbose_name='UTC offset (s)'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2 on 2026-10-19 16:00
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather', '0013_city_utc_offset'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='weathersnapshot',
+            name='sunrise',
+        ),
+        migrations.RemoveField(
+            model_name='weathersnapshot',
+            name='sunset',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-19 16:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weather', '0014_weathersnapshot_remove_sun_times'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='alertsubscription',
+            name='metric',
+            field=models.CharField(choices=[('temperature', 'Temperature, °C'), ('wind_speed', 'Wind, m/s'), ('humidity', 'Humidity, %')], max_length=16),
+        ),
+    ]
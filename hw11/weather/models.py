@@ -1,20 +1,78 @@
+import zlib
+
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.utils import timezone
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
+
+from .dto import WeatherTodayDTO, WeatherTimeInfoDTO, GeoCoordinatesDTO
+from .geo import encode_geohash
+from .solar import solar_calendar, format_local_time, format_duration, estimate_utc_offset
+from .managers import WeatherSnapshotManager, DescribedQuerySet
 
 
 User = get_user_model()
 
 
-class Country(models.Model):
+class EnrichableModel(models.Model):
+    PENDING = 'pending'
+    DONE = 'done'
+    FAILED = 'failed'
+    ENRICHMENT_STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+
+    enrichment_status = models.CharField(max_length=7, choices=ENRICHMENT_STATUS_CHOICES, default=PENDING,
+                                         db_index=True)
+    enrichment_attempts = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+    @property
+    def is_enriched(self):
+        return self.enrichment_status == self.DONE
+
+
+class DescribedModel(models.Model):
+    SUMMARY_LENGTH = 300
+
+    summary = models.CharField(max_length=SUMMARY_LENGTH, blank=True)
+    description_zlib = models.BinaryField(blank=True, default=b'')
+
+    class Meta:
+        abstract = True
+
+    @property
+    def description(self) -> str:
+        if not hasattr(self, '_description'):
+            self._description = zlib.decompress(self.description_zlib).decode() if self.description_zlib else ''
+        return self._description
+
+    @description.setter
+    def description(self, value: str) -> None:
+        self._description = value or ''
+        self.description_zlib = zlib.compress(self._description.encode(), 9) if value else b''
+        self.summary = self.summarize(self._description)
+
+    @classmethod
+    def summarize(cls, description: str) -> str:
+        text = ' '.join(strip_tags(description).split())
+        return Truncator(text).chars(cls.SUMMARY_LENGTH)
+
+
+class Country(EnrichableModel, DescribedModel):
     name = models.CharField(max_length=128, unique=True, db_index=True)
     slug = models.SlugField(max_length=128, unique=True)
-    code = models.CharField(max_length=3)
-    population = models.IntegerField()
-    description = models.TextField()
-    flag = models.URLField(max_length=255)
-    capital = models.CharField(max_length=200, unique=True)
+    code = models.CharField(max_length=3, unique=True)
+    population = models.IntegerField(null=True, blank=True)
+    flag = models.URLField(max_length=255, blank=True)
+    capital = models.CharField(max_length=200, null=True, blank=True)
 
-    objects = models.Manager()
+    objects = DescribedQuerySet.as_manager()
 
     def __str__(self):
         return self.name
@@ -24,20 +82,29 @@ class Country(models.Model):
         verbose_name_plural = 'Countries'
 
 
-class City(models.Model):
+class City(EnrichableModel, DescribedModel):
     name = models.CharField(max_length=128, unique=True, db_index=True)
     slug = models.SlugField(max_length=128, unique=True)
-    description = models.TextField()
-    image = models.URLField(max_length=255)
+    image = models.URLField(max_length=255, blank=True)
     lat = models.FloatField(verbose_name='latitude')
     lon = models.FloatField(verbose_name='longitude')
+    geohash = models.CharField(max_length=12, db_index=True, editable=False)
+    weather_id = models.PositiveIntegerField(null=True, blank=True, verbose_name='OpenWeather city id')
+    utc_offset = models.IntegerField(null=True, blank=True, verbose_name='UTC offset (s)')
     country = models.ForeignKey(Country, on_delete=models.PROTECT, related_name='cities')
 
-    objects = models.Manager()
+    objects = DescribedQuerySet.as_manager()
 
     def __str__(self):
         return self.name
 
+    def get_utc_offset(self) -> int:
+        return self.utc_offset if self.utc_offset is not None else estimate_utc_offset(self.lon)
+
+    def save(self, *args, **kwargs):
+        self.geohash = encode_geohash(self.lat, self.lon)
+        super().save(*args, **kwargs)
+
     class Meta:
         ordering = ('name',)
         verbose_name_plural = 'Cities'
@@ -58,3 +125,160 @@ class UserCity(models.Model):
         unique_together = ('user', 'city')
         verbose_name_plural = 'User cities'
 
+
+class ServiceHealth(models.Model):
+    STATE_CHOICES = (
+        ('closed', 'Closed'),
+        ('open', 'Open'),
+        ('half_open', 'Half-open'),
+    )
+
+    name = models.CharField(max_length=64, unique=True)
+    state = models.CharField(max_length=9, choices=STATE_CHOICES, default='closed')
+    error_rate = models.FloatField(default=0)
+    avg_latency = models.FloatField(default=0, verbose_name='average latency (s)')
+    score = models.FloatField(default=1)
+    updated = models.DateTimeField(auto_now=True)
+
+    objects = models.Manager()
+
+    def __str__(self):
+        return f'{self.name} ({self.state})'
+
+    class Meta:
+        ordering = ('-score',)
+        verbose_name_plural = 'Service health'
+
+
+class WeatherSnapshot(models.Model):
+    city = models.ForeignKey(City, on_delete=models.CASCADE, related_name='snapshots')
+    condition = models.CharField(max_length=64)
+    icon = models.CharField(max_length=8)
+    temperature = models.IntegerField()
+    wind_speed = models.FloatField()
+    humidity = models.IntegerField()
+    observed = models.DateTimeField()
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    objects = WeatherSnapshotManager()
+
+    def __str__(self):
+        return f'{self.city} - {self.created}'
+
+    def is_fresh(self, max_age):
+        return self.created >= timezone.now() - timezone.timedelta(seconds=max_age)
+
+    def to_dto(self) -> WeatherTodayDTO:
+        utc_offset = self.city.get_utc_offset()
+        solar_times = solar_calendar.get(self.city)
+        return WeatherTodayDTO(
+            city=self.city.name,
+            country_code=self.city.country.code,
+            coordinates=GeoCoordinatesDTO(lon=self.city.lon, lat=self.city.lat),
+            condition=self.condition,
+            temperature=self.temperature,
+            wind_speed=self.wind_speed,
+            humidity=self.humidity,
+            time_info=WeatherTimeInfoDTO(
+                current=format_local_time(int(self.observed.timestamp()), utc_offset),
+                sunrise=format_local_time(solar_times.sunrise, utc_offset),
+                sunset=format_local_time(solar_times.sunset, utc_offset),
+                day_length=format_duration(solar_times.day_length)),
+            icon=self.icon,
+            city_id=self.city.weather_id,
+            timestamp=int(self.observed.timestamp()),
+            utc_offset=utc_offset)
+
+    class Meta:
+        ordering = ('-created',)
+        get_latest_by = 'created'
+        indexes = [models.Index(fields=['city', '-created'])]
+
+
+class UpstreamLock(models.Model):
+    key = models.CharField(max_length=255, unique=True)
+    owner = models.CharField(max_length=64)
+    expires = models.DateTimeField()
+
+    objects = models.Manager()
+
+    def __str__(self):
+        return f'{self.key} ({self.owner})'
+
+
+class WeatherForecast(models.Model):
+    city = models.OneToOneField(City, on_delete=models.CASCADE, related_name='forecast')
+    timezone = models.IntegerField(default=0, verbose_name='UTC offset (s)')
+    data = models.BinaryField()
+    issued = models.DateTimeField()
+    expires = models.DateTimeField(db_index=True)
+
+    objects = models.Manager()
+
+    def __str__(self):
+        return f'{self.city} - {self.issued}'
+
+    def is_fresh(self):
+        return self.expires > timezone.now()
+
+
+class ApiQuota(models.Model):
+    name = models.CharField(max_length=64, unique=True)
+    per_minute = models.PositiveIntegerField()
+    per_day = models.PositiveIntegerField()
+    tokens = models.FloatField()
+    refilled = models.FloatField(verbose_name='last refill (unix time)')
+    day = models.DateField()
+    used_today = models.PositiveIntegerField(default=0)
+    shed_today = models.PositiveIntegerField(default=0)
+
+    objects = models.Manager()
+
+    def __str__(self):
+        return f'{self.name} ({self.used_today}/{self.per_day} today)'
+
+    class Meta:
+        ordering = ('name',)
+
+
+class AlertSubscription(models.Model):
+    TEMPERATURE = 'temperature'
+    WIND_SPEED = 'wind_speed'
+    HUMIDITY = 'humidity'
+    METRIC_CHOICES = (
+        (TEMPERATURE, 'Temperature, °C'),
+        (WIND_SPEED, 'Wind, m/s'),
+        (HUMIDITY, 'Humidity, %'),
+    )
+
+    user_city = models.ForeignKey(UserCity, on_delete=models.CASCADE, related_name='alerts')
+    metric = models.CharField(max_length=16, choices=METRIC_CHOICES)
+    lower = models.FloatField(null=True, blank=True, verbose_name='alert below')
+    upper = models.FloatField(null=True, blank=True, verbose_name='alert above')
+    is_active = models.BooleanField(default=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    objects = models.Manager()
+
+    def __str__(self):
+        return f'{self.user_city} - {self.get_metric_display()}'
+
+    class Meta:
+        ordering = ('-created',)
+
+
+class AlertNotification(models.Model):
+    subscription = models.ForeignKey(AlertSubscription, on_delete=models.CASCADE, related_name='notifications')
+    value = models.FloatField()
+    window = models.PositiveBigIntegerField(verbose_name='dedupe window start (unix time)')
+    is_read = models.BooleanField(default=False)
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    objects = models.Manager()
+
+    def __str__(self):
+        return f'{self.subscription} = {self.value}'
+
+    class Meta:
+        ordering = ('-created',)
+        unique_together = ('subscription', 'window')
@@ -0,0 +1,117 @@
+import math
+import time
+from datetime import datetime, timezone as dt_timezone
+from typing import List
+
+from django.db.models import Count
+from django.utils import timezone
+
+from weather.forecast import ForecastProvider
+from weather.history import history_store
+from weather.models import City, WeatherSnapshot
+from weather.services import BatchWeatherService
+
+
+class WeatherPrefetcher:
+    _GROUP_LIMIT = 20
+
+    def __init__(self, batch_service: BatchWeatherService, api_key: str, calls_per_minute: int,
+                 timeout: float, batch_size: int = 100):
+        self._batch_service = batch_service
+        self._api_key = api_key
+        self._call_interval = 60 / calls_per_minute
+        self._timeout = timeout
+        self._batch_size = batch_size
+        self._next_call_at = 0
+
+    def get_tracked_cities(self) -> List[City]:
+        cities = (City.objects
+                  .select_related('country')
+                  .defer('description_zlib', 'country__description_zlib')
+                  .annotate(trackers=Count('users'))
+                  .filter(trackers__gt=0)
+                  .order_by('-trackers', 'id'))
+        return list(cities)
+
+    def refresh(self) -> int:
+        cities = self.get_tracked_cities()
+        refreshed = 0
+        for start in range(0, len(cities), self._batch_size):
+            batch = cities[start:start + self._batch_size]
+            self._throttle(self._count_calls(batch))
+            weather = self._batch_service.get_weather(batch, self._api_key, timeout=self._timeout)
+            self._save_city_info(batch, weather)
+            refreshed += self._save_snapshots(batch, weather)
+            self._save_history(weather)
+        return refreshed
+
+    def refresh_forecasts(self, forecast_provider: ForecastProvider) -> int:
+        cities = forecast_provider.get_expired_cities(self.get_tracked_cities())
+        refreshed = 0
+        for start in range(0, len(cities), self._GROUP_LIMIT):
+            batch = cities[start:start + self._GROUP_LIMIT]
+            self._throttle(len(batch))
+            refreshed += len(forecast_provider.fetch(batch))
+        return refreshed
+
+    def downsample_history(self) -> None:
+        now = int(time.time())
+        for city_id in history_store.city_ids():
+            history_store.downsample(city_id, now)
+
+    def prune(self, max_age: int) -> int:
+        deleted, _ = WeatherSnapshot.objects.filter(
+            created__lt=timezone.now() - timezone.timedelta(seconds=max_age)).delete()
+        return deleted
+
+    def _count_calls(self, cities: List[City]) -> int:
+        with_weather_id = sum(1 for city in cities if city.weather_id)
+        return math.ceil(with_weather_id / self._GROUP_LIMIT) + len(cities) - with_weather_id
+
+    def _throttle(self, calls: int) -> None:
+        now = time.monotonic()
+        if self._next_call_at > now:
+            time.sleep(self._next_call_at - now)
+        self._next_call_at = max(now, self._next_call_at) + calls * self._call_interval
+
+    @staticmethod
+    def _save_city_info(cities, weather) -> None:
+        updated = []
+        for city in cities:
+            weather_dto = weather.get(city.id)
+            if weather_dto is None:
+                continue
+            if (weather_dto.city_id and city.weather_id != weather_dto.city_id
+                    or weather_dto.utc_offset is not None and city.utc_offset != weather_dto.utc_offset):
+                city.weather_id = weather_dto.city_id or city.weather_id
+                city.utc_offset = weather_dto.utc_offset if weather_dto.utc_offset is not None else city.utc_offset
+                updated.append(city)
+        if updated:
+            City.objects.bulk_update(updated, ['weather_id', 'utc_offset'])
+
+    @staticmethod
+    def _save_history(weather) -> None:
+        for city_id, weather_dto in weather.items():
+            history_store.append(city_id,
+                                 timestamp=weather_dto.timestamp,
+                                 temperature=weather_dto.temperature,
+                                 humidity=weather_dto.humidity,
+                                 wind_speed=weather_dto.wind_speed)
+
+    @staticmethod
+    def _save_snapshots(cities, weather) -> int:
+        snapshots = []
+        for city in cities:
+            weather_dto = weather.get(city.id)
+            if weather_dto is None:
+                continue
+            snapshots.append(WeatherSnapshot(
+                city=city,
+                condition=weather_dto.condition,
+                icon=weather_dto.icon,
+                temperature=weather_dto.temperature,
+                wind_speed=weather_dto.wind_speed,
+                humidity=weather_dto.humidity,
+                observed=datetime.fromtimestamp(weather_dto.timestamp, tz=dt_timezone.utc)))
+        WeatherSnapshot.objects.bulk_create(snapshots)
+        return len(snapshots)
@@ -0,0 +1,120 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import F, Value, Case, When, FloatField, IntegerField
+from django.db.models.functions import Least
+from django.utils import timezone
+
+from weather.exceptions import QuotaExceededError
+from weather.models import ApiQuota
+
+
+INTERACTIVE = 'interactive'
+BACKGROUND = 'background'
+
+_priority: ContextVar[str] = ContextVar('quota_priority', default=INTERACTIVE)
+
+
+@contextmanager
+def quota_priority(priority: str):
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class QuotaManager:
+    def __init__(self, quotas: Dict[str, Dict[str, int]], background_reserve: float = 0.2,
+                 max_wait: float = 2, poll_interval: float = 0.05):
+        self._quotas = quotas
+        self._background_reserve = background_reserve
+        self._max_wait = max_wait
+        self._poll_interval = poll_interval
+        self._initialized = set()
+
+    def acquire(self, name: str, priority: Optional[str] = None) -> None:
+        limits = self._quotas.get(name)
+        if limits is None:
+            return
+
+        priority = priority or _priority.get()
+        reserve = limits['per_minute'] * self._background_reserve if priority == BACKGROUND else 0
+        deadline = time.monotonic() + (self._max_wait if priority == INTERACTIVE else 0)
+        try:
+            self._ensure(name, limits)
+            while not self._take(name, reserve):
+                if time.monotonic() >= deadline or self._day_exhausted(name):
+                    ApiQuota.objects.filter(name=name).update(shed_today=F('shed_today') + 1)
+                    raise QuotaExceededError(f'Request quota for {name} is exhausted, try again later')
+                time.sleep(self._poll_interval)
+        except DatabaseError:
+            return
+
+    @contextmanager
+    def override(self, quotas: Dict[str, Dict[str, int]]):
+        previous, self._quotas = self._quotas, quotas
+        self._initialized.clear()
+        try:
+            yield self
+        finally:
+            self._quotas = previous
+            self._initialized.clear()
+
+    def usage(self) -> List[dict]:
+        now = time.time()
+        today = timezone.now().date()
+        usage = []
+        for quota in ApiQuota.objects.filter(name__in=self._quotas):
+            tokens = min(quota.per_minute, quota.tokens + (now - quota.refilled) * quota.per_minute / 60)
+            current_day = quota.day == today
+            usage.append({
+                'name': quota.name,
+                'per_minute': quota.per_minute,
+                'per_day': quota.per_day,
+                'available': int(tokens),
+                'used_today': quota.used_today if current_day else 0,
+                'shed_today': quota.shed_today if current_day else 0,
+            })
+        return usage
+
+    def _ensure(self, name: str, limits: Dict[str, int]) -> None:
+        if name in self._initialized:
+            return
+        quota, created = ApiQuota.objects.get_or_create(name=name, defaults={
+            'per_minute': limits['per_minute'],
+            'per_day': limits['per_day'],
+            'tokens': limits['per_minute'],
+            'refilled': time.time(),
+            'day': timezone.now().date(),
+        })
+        if not created and (quota.per_minute, quota.per_day) != (limits['per_minute'], limits['per_day']):
+            ApiQuota.objects.filter(name=name).update(per_minute=limits['per_minute'], per_day=limits['per_day'])
+        self._initialized.add(name)
+
+    @staticmethod
+    def _take(name: str, reserve: float) -> bool:
+        now = time.time()
+        today = timezone.now().date()
+        tokens = Least(F('per_minute') * Value(1.0),
+                       F('tokens') + (Value(now) - F('refilled')) * F('per_minute') / Value(60.0),
+                       output_field=FloatField())
+        used_today = Case(When(day=today, then=F('used_today')), default=Value(0), output_field=IntegerField())
+        shed_today = Case(When(day=today, then=F('shed_today')), default=Value(0), output_field=IntegerField())
+        taken = (ApiQuota.objects
+                 .alias(available=tokens, used=used_today)
+                 .filter(name=name, available__gte=1 + reserve, used__lt=F('per_day'))
+                 .update(tokens=tokens - 1, refilled=now, day=today, used_today=used_today + 1,
+                         shed_today=shed_today))
+        return bool(taken)
+
+    @staticmethod
+    def _day_exhausted(name: str) -> bool:
+        return ApiQuota.objects.filter(name=name, day=timezone.now().date(), used_today__gte=F('per_day')).exists()
+
+
+quota_manager = QuotaManager(settings.UPSTREAM_QUOTAS)
@@ -0,0 +1,31 @@
+import threading
+import time
+from typing import Dict, Optional
+
+from weather.models import Country
+
+
+class CountryRegistry:
+    def __init__(self, max_age: int = 300):
+        self._max_age = max_age
+        self._lock = threading.Lock()
+        self._countries: Optional[Dict[str, Country]] = None
+        self._loaded_at = 0
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._countries = None
+
+    def get(self, code: str) -> Optional[Country]:
+        return self._get_countries().get(code.upper())
+
+    def _get_countries(self) -> Dict[str, Country]:
+        with self._lock:
+            if self._countries is None or time.monotonic() - self._loaded_at > self._max_age:
+                countries = Country.objects.lean()
+                self._countries = {country.code: country for country in countries}
+                self._loaded_at = time.monotonic()
+            return self._countries
+
+
+country_registry = CountryRegistry()
@@ -1,174 +1,318 @@
-import json
+import time
+from concurrent.futures import wait
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Optional, Dict, Iterable, Tuple
 from abc import abstractmethod, ABCMeta
 
 import requests
 
+from weather.circuit_breaker import get_breaker
 from weather.dto import WeatherTodayDTO, WeatherTimeInfoDTO, CountryServiceDTO, WikiServiceDTO, CountryDTO, \
-    GeoCoordinatesDTO
+    GeoCoordinatesDTO, CountryCatalogueDTO, ForecastDTO, ForecastItemDTO
 from weather.exceptions import ResponseException, ServerReturnInvalidResponse, ResponseEmptyException, \
-    NoAvailableServiceError
+    NoAvailableServiceError, QuotaExceededError, DeadlineExceededError
+from weather.deadline import Deadline, request_timeout
+from weather.http_client import session, submit
+from weather.json_backend import loads, JSONDecodeError
+from weather.quota import quota_manager
+from weather.solar import format_duration
 
 
 class WeatherTodayService:
     _WEATHER_API_ROOT_URL = 'https://api.openweathermap.org/data/2.5/weather?q={city}&' \
                             'appid={api_key}&units=metric'
-
-    def __init__(self):
-        self._city = None
-        self._api_key = None
-        self._response_json = None
-        self._status_code = None
-
-    def get_weather(self, city: str, api_key: str) -> WeatherTodayDTO:
-        self._city = city
-        self._api_key = api_key
-        self._get_response()
-        self._validate_response_or_raise()
-        weather_dto = self._parse_response_json()
+    _WEATHER_API_ID_URL = 'https://api.openweathermap.org/data/2.5/weather?id={city_id}&' \
+                          'appid={api_key}&units=metric'
+    _TIMEOUT = (2, 5)
+
+    def get_weather(self, city: str, api_key: str, deadline: Optional[Deadline] = None) -> WeatherTodayDTO:
+        status_code, response_json = self._get_response(self._WEATHER_API_ROOT_URL.format(city=city, api_key=api_key),
+                                                        deadline)
+        self._validate_response_or_raise(status_code, response_json)
+        weather_dto = self._parse_response_json(response_json)
         return weather_dto
 
-    def _get_response(self) -> None:
-        url = self._WEATHER_API_ROOT_URL.format(city=self._city, api_key=self._api_key)
-        response = requests.get(url)
-        self._response_json = response.json()
-        self._status_code = response.status_code
-
-    def _validate_response_or_raise(self):
-        if self._status_code != 200:
-            raise ResponseException(self._response_json['message'])
-
-    def _parse_response_json(self) -> WeatherTodayDTO:
-        city = self._response_json['name']
-        country_code = self._response_json['sys']['country']
-        coordinates = GeoCoordinatesDTO(
-            lon=float(self._response_json['coord']['lon']),
-            lat=float(self._response_json['coord']['lat'])
-        )
-        condition = self._response_json['weather'][0]['main']
-        temperature = int(self._response_json['main']['temp'])
-        wind_speed = round(self._response_json['wind']['speed'], 1)
-        humidity = self._response_json['main']['humidity']
-        icon = self._response_json['weather'][0]['icon']
-        time_info = WeatherTimeInfoDTO(
-            current=datetime.fromtimestamp(self._response_json['dt']).strftime('%H:%M'),
-            sunrise=datetime.utcfromtimestamp(
-                self._response_json['sys']['sunrise'] + self._response_json['timezone']).strftime('%H:%M'),
-            sunset=datetime.utcfromtimestamp(
-                self._response_json['sys']['sunset'] + self._response_json['timezone']).strftime('%H:%M')
-        )
-
-        weather_dto = WeatherTodayDTO(
-            city=city,
-            country_code=country_code,
-            condition=condition,
-            coordinates=coordinates,
-            temperature=temperature,
-            wind_speed=wind_speed,
-            humidity=humidity,
-            icon=icon,
-            time_info=time_info)
-        return weather_dto
+    def get_weather_by_id(self, city_id: int, api_key: str, deadline: Optional[Deadline] = None) -> WeatherTodayDTO:
+        url = self._WEATHER_API_ID_URL.format(city_id=city_id, api_key=api_key)
+        status_code, response_json = self._get_response(url, deadline)
+        self._validate_response_or_raise(status_code, response_json)
+        return self._parse_response_json(response_json)
+
+    def _get_response(self, url: str, deadline: Optional[Deadline]) -> Tuple[int, Optional[dict]]:
+        quota_manager.acquire('openweather')
+        timeout = request_timeout(deadline, *self._TIMEOUT)
+
+        try:
+            response = session.get(url, timeout=timeout)
+            return response.status_code, loads(response.content)
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+            return 504, None
+        except JSONDecodeError:
+            return response.status_code, None
+
+    def _validate_response_or_raise(self, status_code: int, response_json: Optional[dict]) -> None:
+        if response_json is None:
+            raise ResponseException(f'Weather service is not available (status code {status_code})')
+        if status_code != 200:
+            raise ResponseException(response_json['message'])
+
+    def _parse_response_json(self, response_json: dict) -> WeatherTodayDTO:
+        return parse_weather_json(response_json)
+
+
+def parse_weather_json(response_json: dict) -> WeatherTodayDTO:
+    city = response_json['name']
+    country_code = response_json['sys']['country']
+    timezone = response_json.get('timezone', response_json['sys'].get('timezone', 0))
+    coordinates = GeoCoordinatesDTO(
+        lon=float(response_json['coord']['lon']),
+        lat=float(response_json['coord']['lat'])
+    )
+    condition = response_json['weather'][0]['main']
+    temperature = int(response_json['main']['temp'])
+    wind_speed = round(response_json['wind']['speed'], 1)
+    humidity = response_json['main']['humidity']
+    icon = response_json['weather'][0]['icon']
+    time_info = WeatherTimeInfoDTO(
+        current=datetime.fromtimestamp(response_json['dt']).strftime('%H:%M'),
+        sunrise=datetime.utcfromtimestamp(response_json['sys']['sunrise'] + timezone).strftime('%H:%M'),
+        sunset=datetime.utcfromtimestamp(response_json['sys']['sunset'] + timezone).strftime('%H:%M'),
+        day_length=format_duration(response_json['sys']['sunset'] - response_json['sys']['sunrise'])
+    )
+
+    weather_dto = WeatherTodayDTO(
+        city=city,
+        country_code=country_code,
+        condition=condition,
+        coordinates=coordinates,
+        temperature=temperature,
+        wind_speed=wind_speed,
+        humidity=humidity,
+        icon=icon,
+        time_info=time_info,
+        city_id=response_json.get('id'),
+        timestamp=response_json['dt'],
+        utc_offset=timezone)
+    return weather_dto
+
+
+class BatchWeatherService:
+    _WEATHER_API_GROUP_URL = 'https://api.openweathermap.org/data/2.5/group?id={ids}&' \
+                             'appid={api_key}&units=metric'
+    _WEATHER_API_COORDINATES_URL = 'https://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&' \
+                                   'appid={api_key}&units=metric'
+    _GROUP_LIMIT = 20
+
+    def get_weather(self, cities: Iterable, api_key: str, timeout: float) -> Dict[int, WeatherTodayDTO]:
+        cities = list(cities)
+        cities_by_weather_id = {}
+        for city in cities:
+            if city.weather_id:
+                cities_by_weather_id.setdefault(city.weather_id, []).append(city)
+        weather_ids = list(cities_by_weather_id)
+
+        futures = {}
+        for start in range(0, len(weather_ids), self._GROUP_LIMIT):
+            chunk = weather_ids[start:start + self._GROUP_LIMIT]
+            url = self._WEATHER_API_GROUP_URL.format(ids=','.join(map(str, chunk)), api_key=api_key)
+            futures[submit(self._get_response_json, url, timeout)] = None
+        for city in cities:
+            if not city.weather_id:
+                url = self._WEATHER_API_COORDINATES_URL.format(lat=city.lat, lon=city.lon, api_key=api_key)
+                futures[submit(self._get_response_json, url, timeout)] = city
+
+        done, _ = wait(futures, timeout=timeout)
+
+        weather = {}
+        for future in done:
+            response_json = future.result()
+            if response_json is None:
+                continue
+            city = futures[future]
+            if city is not None:
+                weather[city.id] = parse_weather_json(response_json)
+                continue
+            for item in response_json.get('list', []):
+                weather_dto = parse_weather_json(item)
+                for group_city in cities_by_weather_id.get(item['id'], []):
+                    weather[group_city.id] = weather_dto
+        return weather
+
+    @staticmethod
+    def _get_response_json(url: str, timeout: float) -> Optional[dict]:
+        try:
+            quota_manager.acquire('openweather')
+            response = session.get(url, timeout=(timeout, timeout))
+            if response.status_code != 200:
+                return None
+            return loads(response.content)
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError, JSONDecodeError,
+                QuotaExceededError):
+            return None
+
+
+class ForecastService:
+    _FORECAST_API_URL = 'https://api.openweathermap.org/data/2.5/forecast?lat={lat}&lon={lon}&' \
+                        'appid={api_key}&units=metric'
+
+    def get_forecast(self, lat: float, lon: float, api_key: str, timeout: float,
+                     deadline: Optional[Deadline] = None) -> ForecastDTO:
+        status_code, response_json = self._get_response(lat, lon, api_key, request_timeout(deadline, timeout, timeout))
+        self._validate_response_or_raise(status_code, response_json)
+        return self._parse_response_json(response_json)
+
+    def get_forecasts(self, cities: Iterable, api_key: str, timeout: float,
+                      deadline: Optional[Deadline] = None) -> Dict[int, ForecastDTO]:
+        futures = {submit(self.get_forecast, city.lat, city.lon, api_key, timeout, deadline): city for city in cities}
+        done, _ = wait(futures, timeout=min(timeout, deadline.remaining()) if deadline else timeout)
+
+        forecasts = {}
+        for future in done:
+            if future.exception() is None:
+                forecasts[futures[future].id] = future.result()
+        return forecasts
+
+    def _get_response(self, lat: float, lon: float, api_key: str,
+                      timeout: Tuple[float, float]) -> Tuple[int, Optional[dict]]:
+        url = self._FORECAST_API_URL.format(lat=lat, lon=lon, api_key=api_key)
+        quota_manager.acquire('openweather')
+
+        try:
+            response = session.get(url, timeout=timeout)
+            return response.status_code, loads(response.content)
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+            return 500, None
+        except JSONDecodeError:
+            return response.status_code, None
+
+    def _validate_response_or_raise(self, status_code: int, response_json: Optional[dict]) -> None:
+        if status_code != 200:
+            if response_json is None:
+                raise ServerReturnInvalidResponse(f'Server return status code {status_code}')
+            raise ResponseException(response_json['message'])
+        if response_json is None:
+            raise ServerReturnInvalidResponse('Server return invalid response')
+
+    def _parse_response_json(self, response_json: dict) -> ForecastDTO:
+        items = [ForecastItemDTO(timestamp=item['dt'],
+                                 condition=item['weather'][0]['main'],
+                                 icon=item['weather'][0]['icon'],
+                                 temperature=round(item['main']['temp'], 1),
+                                 wind_speed=round(item['wind']['speed'], 1),
+                                 humidity=item['main']['humidity'])
+                 for item in response_json['list']]
+        return ForecastDTO(city_id=response_json['city'].get('id'),
+                           timezone=response_json['city'].get('timezone', 0),
+                           items=items)
 
 
 class CountryServiceInterface(metaclass=ABCMeta):
+    quota: Optional[str] = None
+
     @abstractmethod
-    def get_country_by_code(self, code: str, api_key: Optional[str]) -> CountryServiceDTO:
+    def get_country_by_code(self, code: str, api_key: Optional[str],
+                            deadline: Optional[Deadline] = None) -> CountryServiceDTO:
         pass
 
 
 class WikiServiceInterface(metaclass=ABCMeta):
     @abstractmethod
-    def get_wiki_page(self, query: str) -> WikiServiceDTO:
+    def get_wiki_page(self, query: str, deadline: Optional[Deadline] = None) -> WikiServiceDTO:
         pass
 
 
 class RestcountriesService(CountryServiceInterface):
+    quota = 'restcountries'
     _COUNTRY_API_CODE_URL = 'https://restcountries.com/v3.1/alpha/{code}'
+    _COUNTRY_API_ALL_URL = 'https://restcountries.com/v3.1/all?fields=name,cca2,capital,population,flags'
 
-    def __init__(self):
-        self._code = None
-        self._response_json = None
-        self._status_code = None
+    def get_country_by_code(self, code: str, api_key=None, deadline: Optional[Deadline] = None) -> CountryServiceDTO:
+        status_code, response_json = self._get_response(self._COUNTRY_API_CODE_URL.format(code=code),
+                                                        timeout=request_timeout(deadline, 2, 2))
+        self._validate_response_or_raise(status_code, response_json)
+        return self._parse_response_json(response_json)
 
-    def get_country_by_code(self, code: str, api_key=None) -> CountryServiceDTO:
-        self._code = code
-        self._get_response()
-        self._validate_response_or_raise()
-        return self._parse_response_json()
+    def get_all_countries(self) -> List[CountryCatalogueDTO]:
+        return self.parse_catalogue_json(self.get_all_countries_json())
 
-    def _get_response(self) -> None:
-        url = self._COUNTRY_API_CODE_URL.format(code=self._code)
+    def get_all_countries_json(self) -> list:
+        quota_manager.acquire(self.quota)
+        status_code, response_json = self._get_response(self._COUNTRY_API_ALL_URL, timeout=(2, 30))
+        self._validate_response_or_raise(status_code, response_json)
+        return response_json
 
+    def _get_response(self, url: str, timeout: Tuple[float, float]) -> Tuple[int, Optional[list]]:
         try:
-            response = requests.get(url, timeout=(2, 2))
-            self._status_code = response.status_code
-            self._response_json = response.json()
+            response = session.get(url, timeout=timeout)
+            return response.status_code, loads(response.content)
         except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
-            self._status_code = 500
-            self._response_json = None
-        except json.JSONDecodeError:
-            self._response_json = None
-
-    def _validate_response_or_raise(self) -> None:
-        if self._status_code != 200:
-            if self._response_json is None:
-                raise ServerReturnInvalidResponse(f'Server return status code {self._status_code}')
-            raise ResponseException(self._response_json['message'])
-
-    def _parse_response_json(self) -> CountryServiceDTO:
-        name = self._response_json[0]['name']['common']
-        code = self._response_json[0]['cca2']
-        capital = self._response_json[0]['capital'][0]
-        population = self._response_json[0]['population']
+            return 500, None
+        except JSONDecodeError:
+            return response.status_code, None
+
+    def _validate_response_or_raise(self, status_code: int, response_json: Optional[list]) -> None:
+        if status_code != 200:
+            if response_json is None:
+                raise ServerReturnInvalidResponse(f'Server return status code {status_code}')
+            raise ResponseException(response_json['message'])
+
+    def _parse_response_json(self, response_json: list) -> CountryServiceDTO:
+        try:
+            name = response_json[0]['name']['common']
+            code = response_json[0]['cca2']
+            capital = response_json[0]['capital'][0] if response_json[0].get('capital') else None
+            population = response_json[0]['population']
+        except (KeyError, IndexError, TypeError) as error:
+            raise ServerReturnInvalidResponse(f'Server return malformed response: {error!r}')
         country_dto = CountryServiceDTO(name=name,
                                         code=code,
                                         capital=capital,
                                         population=population)
         return country_dto
 
+    @staticmethod
+    def parse_catalogue_json(response_json: list) -> List[CountryCatalogueDTO]:
+        return [CountryCatalogueDTO(name=item['name']['common'],
+                                    code=item['cca2'],
+                                    capital=item['capital'][0] if item.get('capital') else None,
+                                    population=item['population'],
+                                    flag=item['flags']['png'])
+                for item in response_json]
+
 
 class GeonamesService(CountryServiceInterface):
+    quota = 'geonames'
     _COUNTRY_API_CODE_URL = 'http://api.geonames.org/countryInfoJSON?country={code}&username={api_key}'
 
-    def __init__(self):
-        self._code = None
-        self._response_json = None
-        self._status_code = None
-        self._api_key = None
-
-    def get_country_by_code(self, code: str, api_key: str) -> CountryServiceDTO:
-        self._code = code
-        self._api_key = api_key
-        self._get_response()
-        self._validate_response_or_raise()
-        return self._parse_response_json()
-
-    def _get_response(self) -> None:
-        url = self._COUNTRY_API_CODE_URL.format(code=self._code, api_key=self._api_key)
+    def get_country_by_code(self, code: str, api_key: str, deadline: Optional[Deadline] = None) -> CountryServiceDTO:
+        status_code, response_json = self._get_response(code, api_key, request_timeout(deadline, 2, 2))
+        self._validate_response_or_raise(status_code, response_json)
+        return self._parse_response_json(response_json)
 
+    def _get_response(self, code: str, api_key: str, timeout: Tuple[float, float]) -> Tuple[int, Optional[dict]]:
+        url = self._COUNTRY_API_CODE_URL.format(code=code, api_key=api_key)
         try:
-            response = requests.get(url, timeout=(2, 2))
-            self._status_code = response.status_code
-            self._response_json = response.json()
+            response = session.get(url, timeout=timeout)
+            return response.status_code, loads(response.content)
         except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
-            self._status_code = 500
-            self._response_json = None
-        except json.JSONDecodeError:
-            self._response_json = None
+            return 500, None
+        except JSONDecodeError:
+            return response.status_code, None
 
-    def _validate_response_or_raise(self) -> None:
-        if self._response_json is None:
+    def _validate_response_or_raise(self, status_code: int, response_json: Optional[dict]) -> None:
+        if not isinstance(response_json, dict) or response_json.get('geonames') is None:
             raise ServerReturnInvalidResponse(f'Server return invalid response')
-        if not self._response_json['geonames']:
+        if not response_json['geonames']:
             raise ResponseEmptyException('Server return empty response')
 
-    def _parse_response_json(self) -> CountryServiceDTO:
-        name = self._response_json['geonames'][0]['countryName']
-        code = self._response_json['geonames'][0]['countryCode']
-        capital = self._response_json['geonames'][0]['capital']
-        population = int(self._response_json['geonames'][0]['population'])
+    def _parse_response_json(self, response_json: dict) -> CountryServiceDTO:
+        try:
+            name = response_json['geonames'][0]['countryName']
+            code = response_json['geonames'][0]['countryCode']
+            capital = response_json['geonames'][0]['capital'] or None
+            population = int(response_json['geonames'][0]['population'])
+        except (KeyError, IndexError, TypeError, ValueError) as error:
+            raise ServerReturnInvalidResponse(f'Server return malformed response: {error!r}')
         country_dto = CountryServiceDTO(name=name,
                                         code=code,
                                         capital=capital,
@@ -180,54 +324,107 @@ class FallbackCountryFacade:
     def __init__(self, services: List[CountryServiceInterface]):
         self._services = services
 
-    def get_country_by_code(self, code: str, api_key: str) -> CountryServiceDTO:
-        for service in self._services:
+    def get_country_by_code(self, code: str, api_key: str, deadline: Optional[Deadline] = None) -> CountryServiceDTO:
+        for service in self._get_services_by_health():
+            if deadline is not None and deadline.expired():
+                break
+            breaker = get_breaker(type(service).__name__)
+            if breaker.state == breaker.OPEN:
+                continue
+            try:
+                quota_manager.acquire(service.quota)
+            except QuotaExceededError:
+                continue
+            if not breaker.allow_request():
+                continue
+
+            started = time.monotonic()
+            succeeded = None
             try:
-                return service.get_country_by_code(code, api_key)
-            except (ServerReturnInvalidResponse, ResponseEmptyException, ResponseException):
+                country_dto = service.get_country_by_code(code, api_key, deadline=deadline)
+                succeeded = True
+            except DeadlineExceededError:
+                break
+            except ResponseEmptyException:
+                succeeded = True
+                continue
+            except (ServerReturnInvalidResponse, ResponseException):
+                succeeded = False
                 continue
+            finally:
+                if succeeded is None:
+                    breaker.release_probe()
+                elif succeeded:
+                    breaker.record_success(time.monotonic() - started)
+                else:
+                    breaker.record_failure(time.monotonic() - started)
+            return country_dto
         raise NoAvailableServiceError('No service are currently available to handle the request.')
 
+    def _get_services_by_health(self) -> List[CountryServiceInterface]:
+        return sorted(self._services, key=lambda service: get_breaker(type(service).__name__).health_score,
+                      reverse=True)
+
 
 class WikiService(WikiServiceInterface):
     _WIKI_API_URL = 'http://en.wikipedia.org/w/api.php?action=query&titles={query}' \
                     '&prop=extracts|pageimages&format=json&pithumbsize=1000'
 
-    def __init__(self):
-        self._query = None
-        self._response_json = None
-        self._status_code = None
-
-    def get_wiki_page(self, query: str) -> WikiServiceDTO:
-        self._query = query
-        self._get_response()
-        self._validate_response_or_raise()
-        return self._parse_response_json()
-
-    def _get_response(self) -> None:
-        url = self._WIKI_API_URL.format(query=self._query)
+    def get_wiki_page(self, query: str, deadline: Optional[Deadline] = None) -> WikiServiceDTO:
+        quota_manager.acquire('wikipedia')
+        breaker = get_breaker(type(self).__name__)
+        if not breaker.allow_request():
+            raise ServerReturnInvalidResponse('Wikipedia is temporarily unavailable')
 
+        started = time.monotonic()
+        succeeded = None
+        try:
+            status_code, response_json = self._get_response(query, request_timeout(deadline, 2, 2))
+            self._validate_response_or_raise(status_code, response_json)
+            wiki_dto = self._parse_response_json(response_json)
+            succeeded = True
+        except ResponseEmptyException:
+            succeeded = True
+            raise
+        except ServerReturnInvalidResponse:
+            succeeded = False
+            raise
+        finally:
+            if succeeded is None:
+                breaker.release_probe()
+            elif succeeded:
+                breaker.record_success(time.monotonic() - started)
+            else:
+                breaker.record_failure(time.monotonic() - started)
+        return wiki_dto
+
+    def _get_response(self, query: str, timeout: Tuple[float, float]) -> Tuple[int, Optional[dict]]:
+        url = self._WIKI_API_URL.format(query=query)
         try:
-            response = requests.get(url, timeout=(2, 2))
-            self._status_code = response.status_code
-            self._response_json = response.json()
+            response = session.get(url, timeout=timeout)
+            return response.status_code, loads(response.content)
         except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
-            self._status_code = 500
-            self._response_json = None
-        except json.JSONDecodeError:
-            self._response_json = None
-
-    def _parse_response_json(self) -> WikiServiceDTO:
-        pages = self._response_json['query']['pages']
-        _, page_info = next(iter(pages.items()))
-        description = page_info['extract']
-        image = page_info['thumbnail']['source'] if 'thumbnail' in page_info else ''
+            return 500, None
+        except JSONDecodeError:
+            return response.status_code, None
+
+    def _parse_response_json(self, response_json: dict) -> WikiServiceDTO:
+        pages = response_json['query']['pages']
+        try:
+            _, page_info = next(iter(pages.items()))
+            description = page_info['extract']
+            image = page_info['thumbnail']['source'] if 'thumbnail' in page_info else ''
+        except (StopIteration, KeyError, TypeError) as error:
+            raise ServerReturnInvalidResponse(f'Server return malformed response: {error!r}')
         return WikiServiceDTO(description=description, image=image)
 
-    def _validate_response_or_raise(self) -> None:
-        if self._response_json is None:
+    def _validate_response_or_raise(self, status_code: int, response_json: Optional[dict]) -> None:
+        if not isinstance(response_json, dict) or status_code != 200:
+            raise ServerReturnInvalidResponse(f'Server return invalid response')
+        pages = response_json['query'].get('pages') if isinstance(response_json.get('query'), dict) else None
+        if not isinstance(pages, dict):
             raise ServerReturnInvalidResponse(f'Server return invalid response')
-        if '-1' in self._response_json['query']['pages']:
+        if '-1' in response_json['query']['pages']:
             raise ResponseEmptyException('Server return empty response')
 
 
@@ -236,11 +433,11 @@ class WikiFacade:
         self._wiki_service = wiki_service
         self._errors = None
 
-    def get_page_data(self, query) -> Optional[WikiServiceDTO]:
+    def get_page_data(self, query, deadline: Optional[Deadline] = None) -> Optional[WikiServiceDTO]:
         try:
-            wiki_data = self._wiki_service.get_wiki_page(query)
+            wiki_data = self._wiki_service.get_wiki_page(query, deadline=deadline)
             return wiki_data
-        except (ServerReturnInvalidResponse, ResponseEmptyException) as error:
+        except (ServerReturnInvalidResponse, ResponseEmptyException, DeadlineExceededError) as error:
             self._errors = str(error)
             return None
 
@@ -257,17 +454,17 @@ class CountryFacade:
         self._wiki_service = wiki_service
         self._errors = None
 
-    def get_country_data(self, code: str, api_key: str) -> Optional[CountryDTO]:
+    def get_country_data(self, code: str, api_key: str, deadline: Optional[Deadline] = None) -> Optional[CountryDTO]:
         fallback_country_service = FallbackCountryFacade(self._country_services)
         try:
-            country_data = fallback_country_service.get_country_by_code(code=code, api_key=api_key)
+            country_data = fallback_country_service.get_country_by_code(code=code, api_key=api_key, deadline=deadline)
         except NoAvailableServiceError as error:
             self._errors = str(error)
             return None
 
         try:
-            wiki_data = self._wiki_service.get_wiki_page(country_data.name)
-        except (ServerReturnInvalidResponse, ResponseEmptyException) as error:
+            wiki_data = self._wiki_service.get_wiki_page(country_data.name, deadline=deadline)
+        except (ServerReturnInvalidResponse, ResponseEmptyException, DeadlineExceededError) as error:
             self._errors = str(error)
             return None
 
@@ -287,10 +484,9 @@ class CountryFacade:
         return self._errors
 
 
-# country_facade = CountryFacade(country_services=[GeonamesService()], wiki_service=WikiService())
-# country_dto = country_facade.get_country_data()
-#
-# if not country_facade.is_valid():
-#     print(country_facade.get_errors())
-# else:
-#     print(country_dto)
+weather_today_service = WeatherTodayService()
+batch_weather_service = BatchWeatherService()
+forecast_service = ForecastService()
+restcountries_service = RestcountriesService()
+geonames_service = GeonamesService()
+wiki_service = WikiService()
@@ -0,0 +1,41 @@
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .geo import city_index
+from .models import City, Country
+from .registry import country_registry
+from .solar import solar_calendar
+
+
+@receiver(post_save, sender=City)
+def update_city_index(sender, instance, **kwargs):
+    city_index.update(instance.pk, instance.lat, instance.lon)
+    solar_calendar.forget(instance.pk)
+
+
+@receiver(post_delete, sender=City)
+def remove_from_city_index(sender, instance, **kwargs):
+    city_index.remove(instance.pk)
+    solar_calendar.forget(instance.pk)
+
+
+@receiver(post_save, sender=City)
+@receiver(post_delete, sender=City)
+def invalidate_city_page(sender, instance, **kwargs):
+    cache.delete_many([make_template_fragment_key('city_description', [instance.pk]),
+                       make_template_fragment_key('country_cities', [instance.country_id])])
+
+
+@receiver(post_save, sender=Country)
+@receiver(post_delete, sender=Country)
+def invalidate_country_registry(sender, **kwargs):
+    country_registry.invalidate()
+
+
+@receiver(post_save, sender=Country)
+@receiver(post_delete, sender=Country)
+def invalidate_country_page(sender, instance, **kwargs):
+    cache.delete_many([make_template_fragment_key('country_description', [instance.pk]),
+                       make_template_fragment_key('country_cities', [instance.pk])])
@@ -0,0 +1,161 @@
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+PAYLOADS_DIR = Path(__file__).resolve().parent / 'payloads'
+
+
+class LatencyModel:
+    def __init__(self, kind: str = 'fixed', *params: float):
+        self.kind = kind
+        self.params = params
+
+    @classmethod
+    def parse(cls, spec: str) -> 'LatencyModel':
+        kind, *params = spec.split(':')
+        if kind not in ('fixed', 'uniform', 'lognormal'):
+            raise ValueError(f'Unknown latency distribution {kind}')
+        return cls(kind, *map(float, params))
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == 'uniform':
+            low, high = self.params
+            return rng.uniform(low, high) / 1000
+        if self.kind == 'lognormal':
+            median, sigma = self.params
+            return rng.lognormvariate(0, sigma) * median / 1000
+        return (self.params[0] if self.params else 0) / 1000
+
+
+class FaultProfile(NamedTuple):
+    latency: LatencyModel = LatencyModel('fixed', 0)
+    error_rate: float = 0
+    timeout_rate: float = 0
+    malformed_rate: float = 0
+    timeout: float = 5
+
+
+class Route(NamedTuple):
+    service: str
+    host: str
+    path: str
+    payload: str
+
+
+ROUTES = (
+    Route('openweather', 'api.openweathermap.org', '/data/2.5/group', 'openweather_group.json'),
+    Route('openweather', 'api.openweathermap.org', '/data/2.5/weather', 'openweather_weather.json'),
+    Route('openweather', 'api.openweathermap.org', '/data/2.5/forecast', 'openweather_forecast.json'),
+    Route('restcountries', 'restcountries.com', '/v3.1/alpha/', 'restcountries_alpha.json'),
+    Route('geonames', 'api.geonames.org', '/countryInfoJSON', 'geonames_country_info.json'),
+    Route('wikipedia', 'en.wikipedia.org', '/w/api.php', 'wikipedia_query.json'),
+)
+
+
+class UpstreamSimulator:
+    def __init__(self, faults: Optional[Dict[str, FaultProfile]] = None, default: FaultProfile = FaultProfile(),
+                 seed: int = 0, host: str = '127.0.0.1', port: int = 0):
+        self._faults = faults or {}
+        self._default = default
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._payloads = {route.payload: (PAYLOADS_DIR / route.payload).read_bytes() for route in ROUTES}
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> 'UpstreamSimulator':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def install(self, http_session: requests.Session) -> None:
+        adapter = _RedirectAdapter(self.url)
+        for host in {route.host for route in ROUTES}:
+            http_session.mount(f'http://{host}', adapter)
+            http_session.mount(f'https://{host}', adapter)
+
+    def uninstall(self, http_session: requests.Session) -> None:
+        for host in {route.host for route in ROUTES}:
+            http_session.adapters.pop(f'http://{host}', None)
+            http_session.adapters.pop(f'https://{host}', None)
+
+    def respond(self, host: str, path: str):
+        route = next((route for route in ROUTES if route.host == host and path.startswith(route.path)), None)
+        if route is None:
+            return 404, b'{"message": "Not found"}', 0
+
+        profile = self._faults.get(route.service, self._default)
+        with self._rng_lock:
+            delay = profile.latency.sample(self._rng)
+            roll = self._rng.random()
+
+        if roll < profile.timeout_rate:
+            return 504, b'', profile.timeout
+        roll -= profile.timeout_rate
+        if roll < profile.error_rate:
+            return 500, b'{"cod": 500, "message": "Internal error"}', delay
+        roll -= profile.error_rate
+        payload = self._payloads[route.payload]
+        if roll < profile.malformed_rate:
+            return 200, payload[:len(payload) // 2], delay
+        return 200, payload, delay
+
+    def _make_handler(self):
+        simulator = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                host = self.headers.get('X-Upstream-Host', '')
+                status, body, delay = simulator.respond(host, urlsplit(self.path).path)
+                time.sleep(delay)
+                try:
+                    self.send_response(status)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+class _RedirectAdapter(HTTPAdapter):
+    def __init__(self, target: str, **kwargs):
+        super().__init__(**kwargs)
+        self._target = target
+
+    def send(self, request, **kwargs):
+        parts = urlsplit(request.url)
+        request.headers['X-Upstream-Host'] = parts.hostname
+        request.url = f'{self._target}{parts.path}?{parts.query}' if parts.query else f'{self._target}{parts.path}'
+        return super().send(request, **kwargs)
@@ -0,0 +1,81 @@
+import os
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict
+
+from django.db import IntegrityError
+from django.utils import timezone
+
+from weather.models import UpstreamLock
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self, lock_timeout: float = 30, poll_interval: float = 0.05):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self._lock_timeout = lock_timeout
+        self._poll_interval = poll_interval
+
+    def do(self, key: str, func: Callable, *args, cross_process: bool = False, **kwargs) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            if cross_process:
+                with DatabaseLock(key, timeout=self._lock_timeout, poll_interval=self._poll_interval):
+                    call.result = func(*args, **kwargs)
+            else:
+                call.result = func(*args, **kwargs)
+        except Exception as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result
+
+
+class DatabaseLock:
+    def __init__(self, key: str, timeout: float, poll_interval: float):
+        self._key = key
+        self._timeout = timeout
+        self._poll_interval = poll_interval
+        self._owner = f'{os.getpid()}:{uuid.uuid4().hex}'
+
+    def __enter__(self):
+        deadline = time.monotonic() + self._timeout
+        while True:
+            UpstreamLock.objects.filter(key=self._key, expires__lt=timezone.now()).delete()
+            try:
+                UpstreamLock.objects.create(key=self._key, owner=self._owner,
+                                            expires=timezone.now() + timezone.timedelta(seconds=self._timeout))
+                return self
+            except IntegrityError:
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(f'Could not acquire lock {self._key}')
+                time.sleep(self._poll_interval)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        UpstreamLock.objects.filter(key=self._key, owner=self._owner).delete()
+
+
+upstream_flight = SingleFlight()
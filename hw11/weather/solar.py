@@ -0,0 +1,104 @@
+import threading
+from datetime import date, datetime, timezone as dt_timezone
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from weather.dto import SolarTimesDTO
+
+
+_UNIX_EPOCH_JULIAN_DAY = 2440587.5
+_J2000 = 2451545.0
+_OBLIQUITY = np.radians(23.4397)
+_SUN_ALTITUDE = np.radians(-0.833)
+
+
+def solar_times(lat, lon, day: date) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lon = np.asarray(lon, dtype=np.float64)
+
+    julian_day = datetime(day.year, day.month, day.day, 12, tzinfo=dt_timezone.utc).timestamp() / 86400 \
+        + _UNIX_EPOCH_JULIAN_DAY
+    mean_solar_time = np.ceil(julian_day - _J2000 - 0.0009) - lon / 360
+    anomaly = np.radians((357.5291 + 0.98560028 * mean_solar_time) % 360)
+    center = 1.9148 * np.sin(anomaly) + 0.02 * np.sin(2 * anomaly) + 0.0003 * np.sin(3 * anomaly)
+    ecliptic_longitude = np.radians((np.degrees(anomaly) + center + 180 + 102.9372) % 360)
+    transit = _J2000 + mean_solar_time + 0.0053 * np.sin(anomaly) - 0.0069 * np.sin(2 * ecliptic_longitude)
+
+    declination = np.arcsin(np.sin(ecliptic_longitude) * np.sin(_OBLIQUITY))
+    cos_hour_angle = (np.sin(_SUN_ALTITUDE) - np.sin(lat) * np.sin(declination)) / (np.cos(lat) * np.cos(declination))
+    hour_angle = np.degrees(np.arccos(np.clip(cos_hour_angle, -1, 1)))
+    polar = np.abs(cos_hour_angle) > 1
+
+    sunrise = (transit - hour_angle / 360 - _UNIX_EPOCH_JULIAN_DAY) * 86400
+    sunset = (transit + hour_angle / 360 - _UNIX_EPOCH_JULIAN_DAY) * 86400
+    sunrise[polar] = np.nan
+    sunset[polar] = np.nan
+    day_length = hour_angle / 180 * 86400
+    return sunrise, sunset, day_length
+
+
+def format_local_time(timestamp: Optional[int], utc_offset: int) -> str:
+    if timestamp is None:
+        return '--:--'
+    return datetime.fromtimestamp(timestamp + utc_offset, tz=dt_timezone.utc).strftime('%H:%M')
+
+
+def format_duration(seconds: int) -> str:
+    hours, minutes = divmod(int(seconds) // 60, 60)
+    return f'{hours}h {minutes:02d}m'
+
+
+def estimate_utc_offset(lon: float) -> int:
+    return int(round(lon / 15)) * 3600
+
+
+class SolarCalendar:
+    def __init__(self, max_days: int = 2):
+        self._max_days = max_days
+        self._lock = threading.Lock()
+        self._tables: Dict[date, Tuple[np.ndarray, np.ndarray]] = {}
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._tables.clear()
+
+    def forget(self, city_id: int) -> None:
+        with self._lock:
+            for day, (ids, table) in self._tables.items():
+                index = np.searchsorted(ids, city_id)
+                if index < ids.size and ids[index] == city_id:
+                    self._tables[day] = np.delete(ids, index), np.delete(table, index, axis=0)
+
+    def get(self, city, day: Optional[date] = None) -> SolarTimesDTO:
+        day = day or datetime.now(dt_timezone.utc).date()
+        ids, table = self._get_table(day)
+        index = np.searchsorted(ids, city.id)
+        if index < ids.size and ids[index] == city.id:
+            sunrise, sunset, day_length = table[index]
+        else:
+            sunrise, sunset, day_length = (values[0] for values in solar_times([city.lat], [city.lon], day))
+        return SolarTimesDTO(sunrise=None if np.isnan(sunrise) else int(sunrise),
+                             sunset=None if np.isnan(sunset) else int(sunset),
+                             day_length=int(day_length))
+
+    def _get_table(self, day: date) -> Tuple[np.ndarray, np.ndarray]:
+        with self._lock:
+            if day not in self._tables:
+                if len(self._tables) >= self._max_days:
+                    self._tables.pop(min(self._tables))
+                self._tables[day] = self._build_table(day)
+            return self._tables[day]
+
+    @staticmethod
+    def _build_table(day: date) -> Tuple[np.ndarray, np.ndarray]:
+        from weather.models import City
+
+        rows = list(City.objects.order_by('id').values_list('id', 'lat', 'lon'))
+        if not rows:
+            return np.empty(0, dtype=np.int64), np.empty((0, 3))
+        ids, lat, lon = zip(*rows)
+        return np.array(ids, dtype=np.int64), np.column_stack(solar_times(lat, lon, day))
+
+
+solar_calendar = SolarCalendar()
@@ -0,0 +1,142 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List
+
+from django.conf import settings
+from django.db import transaction, close_old_connections, IntegrityError
+from django.utils.text import slugify
+
+from weather.deadline import Deadline
+from weather.exceptions import EnrichmentError
+from weather.forecast import forecast_provider
+from weather.models import City, Country, EnrichableModel
+from weather.quota import quota_priority, BACKGROUND
+from weather.services import CountryFacade, WikiFacade, restcountries_service, geonames_service, wiki_service
+from weather.singleflight import upstream_flight
+
+
+logger = logging.getLogger('weather.tasks')
+
+enrichment_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='weather-enrichment')
+
+_queued_forecasts = set()
+_queued_forecasts_lock = threading.Lock()
+
+
+def enqueue_city_enrichment(city_id: int) -> None:
+    transaction.on_commit(lambda: enrichment_executor.submit(enrich_city_job, city_id))
+
+
+def enqueue_forecast_refresh(cities: Iterable[City]) -> None:
+    expired = forecast_provider.get_expired_cities(cities)
+    if expired:
+        enqueue_forecast_prefetch([city.id for city in expired])
+
+
+def enqueue_forecast_prefetch(city_ids: List[int]) -> None:
+    with _queued_forecasts_lock:
+        city_ids = [city_id for city_id in city_ids if city_id not in _queued_forecasts]
+        _queued_forecasts.update(city_ids)
+    if city_ids:
+        enrichment_executor.submit(prefetch_forecasts_job, city_ids)
+
+
+@quota_priority(BACKGROUND)
+def prefetch_forecasts_job(city_ids: List[int]) -> int:
+    close_old_connections()
+    try:
+        cities = forecast_provider.get_expired_cities(City.objects.lean().filter(id__in=city_ids))
+        return len(forecast_provider.fetch(cities)) if cities else 0
+    finally:
+        with _queued_forecasts_lock:
+            _queued_forecasts.difference_update(city_ids)
+        close_old_connections()
+
+
+@quota_priority(BACKGROUND)
+def enrich_city_job(city_id: int, attempt: int = 1) -> bool:
+    close_old_connections()
+    try:
+        city = City.objects.select_related('country').get(id=city_id)
+        enrich_country(city.country)
+        enrich_city(city)
+        return True
+    except City.DoesNotExist:
+        return False
+    except (EnrichmentError, TimeoutError, IntegrityError) as error:
+        logger.warning('Enrichment of city %s failed on attempt %d: %s', city_id, attempt, error)
+        _retry_or_fail(city_id, attempt)
+        return False
+    except Exception:
+        logger.exception('Enrichment of city %s crashed on attempt %d', city_id, attempt)
+        _retry_or_fail(city_id, attempt)
+        return False
+    finally:
+        close_old_connections()
+
+
+def enrich_country(country: Country) -> None:
+    if country.enrichment_status == EnrichableModel.DONE:
+        return
+    upstream_flight.do(f'country:{country.code}', _enrich_country, country.id, cross_process=True)
+
+
+def _enrich_country(country_id: int) -> None:
+    country = Country.objects.get(id=country_id)
+    if country.enrichment_status == EnrichableModel.DONE:
+        return
+
+    country_facade = CountryFacade(country_services=[restcountries_service, geonames_service],
+                                   wiki_service=wiki_service)
+    country_dto = country_facade.get_country_data(code=country.code, api_key=settings.COUNTRY_API_KEY,
+                                                  deadline=Deadline(settings.WEATHER_ENRICHMENT_BUDGET))
+    if not country_facade.is_valid():
+        raise EnrichmentError(country_facade.get_errors())
+
+    country.name = country_dto.name
+    country.slug = slugify(country_dto.name)
+    country.population = country_dto.population
+    country.capital = country_dto.capital
+    country.description = country_dto.description
+    country.flag = country_dto.image
+    country.enrichment_status = EnrichableModel.DONE
+    country.save()
+
+
+def enrich_city(city: City) -> None:
+    if city.enrichment_status == EnrichableModel.DONE:
+        return
+
+    wiki_facade = WikiFacade(wiki_service=wiki_service)
+    wiki_dto = wiki_facade.get_page_data(city.name, deadline=Deadline(settings.WEATHER_ENRICHMENT_BUDGET))
+    if not wiki_facade.is_valid():
+        raise EnrichmentError(wiki_facade.get_errors())
+
+    city.description = wiki_dto.description
+    city.image = wiki_dto.image
+    city.enrichment_status = EnrichableModel.DONE
+    city.save()
+
+
+def record_enrichment_failure(city_id: int, attempt: int) -> bool:
+    City.objects.filter(id=city_id).update(enrichment_attempts=attempt)
+    if attempt < settings.WEATHER_ENRICHMENT_MAX_ATTEMPTS:
+        return True
+    City.objects.filter(id=city_id).exclude(enrichment_status=EnrichableModel.DONE) \
+        .update(enrichment_status=EnrichableModel.FAILED)
+    Country.objects.filter(cities__id=city_id).exclude(enrichment_status=EnrichableModel.DONE) \
+        .update(enrichment_status=EnrichableModel.FAILED)
+    return False
+
+
+def _retry_or_fail(city_id: int, attempt: int) -> None:
+    if not record_enrichment_failure(city_id, attempt):
+        return
+
+    # Retry timers live in this process only; cities left pending by a restart are picked up by
+    # enrich_pending, which continues from the stored enrichment_attempts.
+    delay = settings.WEATHER_ENRICHMENT_RETRY_DELAY * 2 ** (attempt - 1)
+    timer = threading.Timer(delay, enrichment_executor.submit, args=(enrich_city_job, city_id, attempt + 1))
+    timer.daemon = True
+    timer.start()
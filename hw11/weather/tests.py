@@ -1,3 +1,919 @@
-from django.test import TestCase
+import json
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timezone as dt_timezone
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import Profile
+from weather.alerts import AlertEvaluator
+from weather.circuit_breaker import CircuitBreaker, get_breaker, isolated_breakers
+from weather.deadline import Deadline, request_timeout
+from weather.dto import CountryServiceDTO, ForecastItemDTO
+from weather.exceptions import NoAvailableServiceError, ServerReturnInvalidResponse, QuotaExceededError, \
+    DeadlineExceededError
+from weather.forms import CityWeatherForm
+from weather.forecast import pack_forecast
+from weather.gazetteer import Gazetteer, normalize
+from weather.geo import CityIndex, KDTree, city_index, haversine, to_unit_vectors
+from weather.history import DAY, HOUR, WeatherHistoryStore
+from weather.importer import CityImporter, CityImportError, parse_rows
+from weather.models import AlertNotification, AlertSubscription, ApiQuota, City, Country, EnrichableModel, \
+    ServiceHealth, UpstreamLock, UserCity, WeatherForecast, WeatherSnapshot
+from weather.prefetch import WeatherPrefetcher
+from weather.quota import BACKGROUND, QuotaManager, quota_manager
+from weather.registry import country_registry
+from weather.solar import SolarCalendar, solar_times, format_duration, format_local_time
+from weather.singleflight import DatabaseLock, SingleFlight
+from weather.services import BatchWeatherService, CountryServiceInterface, FallbackCountryFacade, GeonamesService, \
+    RestcountriesService, WikiService, parse_weather_json
+from weather.tasks import enrich_city_job, enqueue_forecast_prefetch, enqueue_forecast_refresh
+
+
+class StubCountryService(CountryServiceInterface):
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def get_country_by_code(self, code, api_key=None, deadline=None):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+UKRAINE = CountryServiceDTO(name='Ukraine', code='UA', capital='Kyiv', population=41000000)
+
+
+def half_open_breaker(name):
+    breaker = CircuitBreaker(name, min_calls=1, recovery_timeout=60)
+    breaker.record_failure(0.1)
+    breaker._opened_at -= 60
+    return breaker
+
+
+class CircuitBreakerTestCase(TestCase):
+    def test_opens_when_error_rate_exceeds_threshold(self):
+        breaker = CircuitBreaker('test', min_calls=2, recovery_timeout=60)
+        breaker.record_success(0.1)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        breaker.record_failure(0.1)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow_request())
+
+    def test_half_open_allows_a_single_probe(self):
+        breaker = half_open_breaker('test')
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(breaker.allow_request())
+        self.assertFalse(breaker.allow_request())
+
+    def test_release_probe_allows_next_probe(self):
+        breaker = half_open_breaker('test')
+        self.assertTrue(breaker.allow_request())
+        breaker.release_probe()
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(breaker.allow_request())
+
+    def test_probe_outcome_closes_or_reopens(self):
+        breaker = half_open_breaker('test')
+        breaker.allow_request()
+        breaker.record_success(0.1)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+        breaker = half_open_breaker('test')
+        breaker.allow_request()
+        breaker.record_failure(0.1)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+    @mock.patch.dict('weather.circuit_breaker._breakers', {})
+    def test_health_is_persisted_outside_isolation(self):
+        get_breaker('IsolatedService').record_failure(0.1)
+        self.assertTrue(ServiceHealth.objects.filter(name='IsolatedService').exists())
+        breaker = get_breaker('IsolatedService')
+        with isolated_breakers():
+            self.assertIsNot(get_breaker('IsolatedService'), breaker)
+            get_breaker('BenchmarkService').record_failure(0.1)
+        self.assertIs(get_breaker('IsolatedService'), breaker)
+        self.assertFalse(ServiceHealth.objects.filter(name='BenchmarkService').exists())
+
+
+class FallbackCountryFacadeTestCase(TestCase):
+    def setUp(self):
+        self.breaker = half_open_breaker('StubCountryService')
+        patcher = mock.patch.dict('weather.circuit_breaker._breakers', {'StubCountryService': self.breaker})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_unexpected_error_releases_probe(self):
+        service = StubCountryService(RuntimeError('boom'), UKRAINE)
+        facade = FallbackCountryFacade([service])
+        with self.assertRaises(RuntimeError):
+            facade.get_country_by_code('UA', 'key')
+        self.assertEqual(facade.get_country_by_code('UA', 'key'), UKRAINE)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_exhausted_quota_does_not_take_the_probe(self):
+        service = StubCountryService(UKRAINE)
+        facade = FallbackCountryFacade([service])
+        with mock.patch('weather.services.quota_manager.acquire', side_effect=[QuotaExceededError('quota'), None]):
+            with self.assertRaises(NoAvailableServiceError):
+                facade.get_country_by_code('UA', 'key')
+            self.assertEqual(service.calls, 0)
+            self.assertEqual(facade.get_country_by_code('UA', 'key'), UKRAINE)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_deadline_during_probe_releases_it(self):
+        service = StubCountryService(DeadlineExceededError('late'), UKRAINE)
+        facade = FallbackCountryFacade([service])
+        with self.assertRaises(NoAvailableServiceError):
+            facade.get_country_by_code('UA', 'key')
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertEqual(facade.get_country_by_code('UA', 'key'), UKRAINE)
+
+    def test_invalid_response_is_counted_as_failure(self):
+        service = StubCountryService(ServerReturnInvalidResponse('bad'))
+        with self.assertRaises(NoAvailableServiceError):
+            FallbackCountryFacade([service]).get_country_by_code('UA', 'key')
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+
+def http_response(status_code, body):
+    return mock.Mock(status_code=status_code, content=json.dumps(body).encode())
+
+
+class UpstreamErrorBodyTestCase(TestCase):
+    def setUp(self):
+        self.breakers = {name: CircuitBreaker(name, min_calls=1, recovery_timeout=60)
+                         for name in ('GeonamesService', 'StubCountryService', 'WikiService')}
+        patcher = mock.patch.dict('weather.circuit_breaker._breakers', self.breakers)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_geonames_error_body_falls_back(self):
+        error = http_response(200, {'status': {'message': 'user does not exist.', 'value': 10}})
+        facade = FallbackCountryFacade([GeonamesService(), StubCountryService(UKRAINE)])
+        with mock.patch('weather.services.session.get', return_value=error):
+            self.assertEqual(facade.get_country_by_code('UA', 'key'), UKRAINE)
+        self.assertEqual(self.breakers['GeonamesService'].state, CircuitBreaker.OPEN)
+
+    def test_wiki_error_body_opens_the_breaker(self):
+        error = http_response(200, {'error': {'code': 'maxlag', 'info': 'Waiting for a database server'}})
+        with mock.patch('weather.services.session.get', return_value=error) as get:
+            with self.assertRaises(ServerReturnInvalidResponse):
+                WikiService().get_wiki_page('Kyiv')
+            with self.assertRaises(ServerReturnInvalidResponse):
+                WikiService().get_wiki_page('Kyiv')
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(self.breakers['WikiService'].state, CircuitBreaker.OPEN)
+
+
+class RestcountriesParseTestCase(TestCase):
+    def test_missing_capital_is_allowed(self):
+        country = RestcountriesService()._parse_response_json(
+            [{'name': {'common': 'Antarctica'}, 'cca2': 'AQ', 'population': 1000}])
+        self.assertIsNone(country.capital)
+
+    def test_malformed_response_raises_invalid_response(self):
+        with self.assertRaises(ServerReturnInvalidResponse):
+            RestcountriesService()._parse_response_json([{'cca2': 'UA'}])
+
+
+class DeadlineTestCase(TestCase):
+    def test_request_timeout_is_capped_by_remaining_budget(self):
+        self.assertEqual(request_timeout(None, 2, 5), (2, 5))
+        connect, read = request_timeout(Deadline(1), 2, 5)
+        self.assertLessEqual(connect, 1)
+        self.assertLessEqual(read, 1)
+
+    def test_expired_deadline_raises(self):
+        deadline = Deadline(0)
+        self.assertTrue(deadline.expired())
+        with self.assertRaises(DeadlineExceededError):
+            request_timeout(deadline, 2, 5)
+
+
+class CityImporterTestCase(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create(username='importer', email='importer@example.com')
+        self.importer = CityImporter(concurrency=1)
+        country_registry.invalidate()
+        city_index.invalidate()
+
+    def test_parse_rows_detects_format(self):
+        csv_rows = parse_rows('city,country_code,lat,lon\nKyiv,ua,50.45,30.52\n')
+        json_rows = parse_rows('["Lviv", {"city": "Odesa", "lat": "46.48", "lon": "x"}]')
+        self.assertEqual((csv_rows[0].city, csv_rows[0].country_code, csv_rows[0].lat), ('Kyiv', 'UA', 50.45))
+        self.assertEqual([row.city for row in json_rows], ['Lviv', 'Odesa'])
+        self.assertIsNone(json_rows[1].lat)
+        with self.assertRaises(CityImportError):
+            parse_rows('{"cities": 1}')
+
+    def test_row_with_one_coordinate_is_invalid(self):
+        with mock.patch('weather.importer.enqueue_city_enrichment'):
+            results = self.importer.run(self.user, parse_rows('city,country_code,lat,lon\nKyiv,UA,50.45,\n'))
+        self.assertEqual(results[0].status, CityImporter.INVALID)
+
+    def test_rows_with_coordinates_are_created_once(self):
+        data = 'city,country_code,lat,lon\nKyiv,UA,50.45,30.52\nKyiv,UA,50.45,30.52\nNowhere,UA,95,0\n'
+        with mock.patch('weather.importer.enqueue_city_enrichment') as enqueue:
+            results = self.importer.run(self.user, parse_rows(data))
+        self.assertEqual([result.status for result in results],
+                         [CityImporter.CREATED, CityImporter.DUPLICATE, CityImporter.INVALID])
+        self.assertEqual(self.user.cities.count(), 1)
+        enqueue.assert_called_once()
+
+    def test_names_are_resolved_through_the_gazetteer(self):
+        with mock.patch('weather.importer.enqueue_city_enrichment'):
+            results = self.importer.run(self.user, parse_rows('["Lviv", "Atlantis"]'))
+        self.assertEqual([result.status for result in results], [CityImporter.CREATED, CityImporter.NOT_FOUND])
+        city = self.user.cities.get().city
+        self.assertEqual((city.name, city.country.code), ('Lviv', 'UA'))
+
+    def test_enrichment_crash_is_reported_per_row(self):
+        data = 'city,country_code,lat,lon\nKyiv,UA,50.45,30.52\nOslo,NO,59.91,10.75\n'
+
+        def enrich_country(country):
+            if country.code == 'NO':
+                raise QuotaExceededError('quota')
+
+        with mock.patch('weather.importer.enrich_country', side_effect=enrich_country), \
+                mock.patch('weather.importer.enrich_city', side_effect=KeyError('query')):
+            results = self.importer.run(self.user, parse_rows(data), enrich=True)
+        self.assertEqual([result.status for result in results], [CityImporter.CREATED, CityImporter.CREATED])
+        self.assertEqual([result.message for result in results],
+                         ["Enrichment failed: 'query'", 'Enrichment failed: quota'])
+        self.assertEqual(self.user.cities.count(), 2)
+
+    def test_missing_gazetteer_is_reported(self):
+        with mock.patch('weather.importer.gazetteer', Gazetteer(settings.BASE_DIR / 'missing.txt')):
+            results = self.importer.run(self.user, parse_rows('["Lviv"]'))
+        self.assertEqual(results[0].status, CityImporter.NOT_FOUND)
+        self.assertIn('gazetteer is not available', results[0].message)
+
+
+class GazetteerTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.gazetteer = Gazetteer(settings.WEATHER_GAZETTEER_PATH)
+
+    def test_bundled_data_is_loaded(self):
+        self.assertGreater(len(self.gazetteer), 100)
+
+    def test_resolve_by_alternate_name_and_country(self):
+        self.assertEqual(self.gazetteer.resolve('Kiev').name, 'Kyiv')
+        self.assertEqual(self.gazetteer.resolve('London').country_code, 'GB')
+        self.assertEqual(self.gazetteer.resolve('London, ca').country_code, 'CA')
+
+    def test_resolve_matches_only_known_names(self):
+        for name in ('Dniprorudne', 'Sydney Mines', 'Chernihivka', 'Berlingen', 'Parisville', 'Zaporizzhia'):
+            self.assertIsNone(self.gazetteer.resolve(name), name)
+
+    def test_form_falls_back_to_free_text_for_unknown_names(self):
+        form = CityWeatherForm({'city': 'parisville'})
+        self.assertTrue(form.is_valid())
+        self.assertEqual((form.cleaned_data['city'], form.cleaned_data['place']), ('Parisville', None))
+        form = CityWeatherForm({'city': 'kiev'})
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data['place'].name, 'Kyiv')
+
+    def test_complete_tolerates_typos(self):
+        self.assertEqual([entry.name for entry in self.gazetteer.complete('Zaporizzhia')], ['Zaporizhzhia'])
+        self.assertEqual(self.gazetteer.complete('Qwxzy'), [])
+
+    def test_complete_orders_by_population(self):
+        self.assertEqual([entry.name for entry in self.gazetteer.complete('od')], ['Odesa', 'Odessa'])
+
+    def test_nearest(self):
+        self.assertEqual(self.gazetteer.nearest(50.4, 30.5, max_distance=20).name, 'Kyiv')
+        self.assertIsNone(self.gazetteer.nearest(0, -150, max_distance=20))
+
+    def test_missing_file_gives_empty_index(self):
+        gazetteer = Gazetteer(settings.BASE_DIR / 'missing.txt')
+        self.assertEqual(len(gazetteer), 0)
+        self.assertIsNone(gazetteer.resolve('Kyiv'))
+
+    def test_normalize_strips_accents_and_punctuation(self):
+        self.assertEqual(normalize('Kyïv!'), 'kyiv')
+        self.assertEqual(normalize('Ivano-Frankivsk'), 'ivano frankivsk')
+
+
+class PreloadCountriesTestCase(TestCase):
+    def setUp(self):
+        country_registry.invalidate()
+
+    def test_loads_bundled_snapshot(self):
+        call_command('preload_countries', stdout=mock.Mock())
+        ukraine = Country.objects.get(code='UA')
+        self.assertEqual((ukraine.name, ukraine.capital), ('Ukraine', 'Kyiv'))
+        self.assertIsNone(Country.objects.get(code='AQ').capital)
+
+    def test_online_snapshot_creates_missing_directory(self):
+        with open(settings.WEATHER_COUNTRIES_SNAPSHOT, encoding='utf-8') as file:
+            countries = json.load(file)[:3]
+        with tempfile.TemporaryDirectory() as directory:
+            snapshot = Path(directory) / 'data' / 'countries.json'
+            with mock.patch('weather.management.commands.preload_countries.restcountries_service.'
+                            'get_all_countries_json', return_value=countries):
+                call_command('preload_countries', online=True, save_snapshot=True, snapshot=snapshot,
+                             stdout=mock.Mock())
+            self.assertEqual(len(json.loads(snapshot.read_text(encoding='utf-8'))), 3)
+        self.assertEqual(Country.objects.count(), 3)
+
+
+@mock.patch('weather.tasks.enrich_country')
+@mock.patch('weather.tasks.threading.Timer')
+class EnrichCityJobTestCase(TestCase):
+    def setUp(self):
+        country = Country.objects.create(name='Ukraine', slug='ukraine', code='UA')
+        self.city = City.objects.create(name='Kyiv', slug='kyiv', lat=50.45, lon=30.52, country=country)
+
+    def test_unexpected_error_schedules_a_retry(self, timer, enrich_country):
+        with mock.patch('weather.tasks.enrich_city', side_effect=RuntimeError('boom')), \
+                self.assertLogs('weather.tasks', 'ERROR'):
+            self.assertFalse(enrich_city_job(self.city.id))
+        self.city.refresh_from_db()
+        self.assertEqual(self.city.enrichment_attempts, 1)
+        self.assertEqual(self.city.enrichment_status, EnrichableModel.PENDING)
+        timer.return_value.start.assert_called_once()
+
+    def test_last_attempt_marks_city_failed(self, timer, enrich_country):
+        with mock.patch('weather.tasks.enrich_city', side_effect=KeyError('extract')), \
+                self.assertLogs('weather.tasks', 'ERROR'):
+            enrich_city_job(self.city.id, attempt=settings.WEATHER_ENRICHMENT_MAX_ATTEMPTS)
+        self.city.refresh_from_db()
+        self.assertEqual(self.city.enrichment_status, EnrichableModel.FAILED)
+        self.assertEqual(self.city.country.enrichment_status, EnrichableModel.FAILED)
+        timer.assert_not_called()
+
+
+@mock.patch('weather.tasks.enrichment_executor.submit')
+class ForecastRefreshTestCase(TestCase):
+    def setUp(self):
+        patcher = mock.patch('weather.tasks._queued_forecasts', set())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        country = Country.objects.create(name='Ukraine', slug='ukraine', code='UA')
+        self.kyiv = City.objects.create(name='Kyiv', slug='kyiv', lat=50.45, lon=30.52, country=country)
+        self.lviv = City.objects.create(name='Lviv', slug='lviv', lat=49.84, lon=24.03, country=country)
+        WeatherForecast.objects.create(
+            city=self.kyiv, data=pack_forecast([ForecastItemDTO(1700000000, 'Clear', '01d', 5.5, 3.2, 60)]),
+            issued=timezone.now(), expires=timezone.now() + timezone.timedelta(hours=1))
+        self.user = get_user_model().objects.create(username='forecast', email='forecast@example.com')
+        Profile(user=self.user, gender='female', date_of_birth=date(1990, 1, 1), bio='', info='').save()
+        UserCity.objects.bulk_create([UserCity(user=self.user, city=self.kyiv),
+                                      UserCity(user=self.user, city=self.lviv)])
+
+    def test_only_expired_cities_are_queued_once(self, submit):
+        enqueue_forecast_refresh([self.kyiv, self.lviv])
+        enqueue_forecast_prefetch([self.lviv.id])
+        submit.assert_called_once()
+        self.assertEqual(submit.call_args.args[1], [self.lviv.id])
+
+    def test_json_view_serves_stored_forecasts(self, submit):
+        self.client.force_login(self.user)
+        with mock.patch('weather.forecast.ForecastProvider.fetch') as fetch:
+            response = self.client.get(reverse('weather:user_forecast_json'))
+        fetch.assert_not_called()
+        data = response.json()
+        self.assertEqual([forecast['city'] for forecast in data['forecasts']], ['Kyiv'])
+        self.assertEqual(data['forecasts'][0]['items'][0]['condition'], 'Clear')
+        self.assertEqual(data['pending'], ['Lviv'])
+
+
+class UserCityCreateViewTestCase(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create(username='creator', email='creator@example.com')
+        Profile(user=self.user, gender='female', date_of_birth=date(1990, 1, 1), bio='', info='').save()
+        Country.objects.create(name='Ukraine', slug='ukraine', code='UA')
+        country_registry.invalidate()
+        city_index.invalidate()
+        self.client.force_login(self.user)
+
+    def post(self, **data):
+        with mock.patch('weather.views.enqueue_city_enrichment'):
+            return self.client.post(reverse('weather:user_city_create'), data, follow=True)
+
+    def test_missing_or_unknown_country_is_rejected(self):
+        for country_code in (None, 'XX'):
+            data = {'city': 'Kyiv', 'lat': 50.45, 'lon': 30.52}
+            if country_code:
+                data['country_code'] = country_code
+            response = self.post(**data)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(any(message.level_tag == 'error' for message in response.context['messages']))
+        self.assertEqual(list(Country.objects.values_list('code', flat=True)), ['UA'])
+        self.assertFalse(City.objects.exists())
+
+    def test_known_country_creates_the_city(self):
+        response = self.post(city='Kyiv', country_code='ua', lat=50.45, lon=30.52)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.user.cities.get().city.country.code, 'UA')
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                       'LOCATION': 'weather-tests'}})
+class SlugDetailViewTestCase(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create(username='reader', email='reader@example.com')
+        Profile(user=user, gender='female', date_of_birth=date(1990, 1, 1), bio='', info='').save()
+        self.client.force_login(user)
+        self.country = Country(name='Ukraine', slug='ukraine', code='UA', enrichment_status=Country.DONE)
+        self.country.description = 'Old country description'
+        self.country.save()
+        self.city = City(name='Kyiv', slug='kyiv', lat=50.45, lon=30.52, country=self.country,
+                         enrichment_status=City.DONE)
+        self.city.description = 'Old city description'
+        self.city.save()
+
+    def test_unknown_slug_is_not_found(self):
+        for name in ('weather:city_detail', 'weather:city_forecast', 'weather:country_detail'):
+            self.assertEqual(self.client.get(reverse(name, kwargs={'slug': 'atlantis'})).status_code, 404, name)
+
+    def test_saving_a_country_refreshes_its_fragments(self):
+        url = reverse('weather:country_detail', kwargs={'slug': 'ukraine'})
+        self.assertContains(self.client.get(url), 'Old country description')
+        self.country.description = 'New country description'
+        self.country.save()
+        self.assertContains(self.client.get(url), 'New country description')
+
+        City.objects.create(name='Lviv', slug='lviv', lat=49.84, lon=24.03, country=self.country)
+        self.assertContains(self.client.get(url), reverse('weather:city_detail', kwargs={'slug': 'lviv'}))
+
+    def test_saving_a_city_refreshes_its_fragment(self):
+        url = reverse('weather:city_detail', kwargs={'slug': 'kyiv'})
+        self.assertContains(self.client.get(url), 'Old city description')
+        self.city.description = 'New city description'
+        self.city.save()
+        self.assertContains(self.client.get(url), 'New city description')
+
+
+class SolarTestCase(TestCase):
+    def test_solar_times_for_kyiv_at_the_equinox(self):
+        sunrise, sunset, day_length = solar_times([50.45], [30.52], date(2024, 3, 20))
+        noon = datetime(2024, 3, 20, 12, tzinfo=dt_timezone.utc).timestamp()
+        self.assertAlmostEqual((sunrise[0] - noon) / 3600, -8.0, delta=0.1)
+        self.assertAlmostEqual((sunset[0] - noon) / 3600, 4.2, delta=0.1)
+        self.assertAlmostEqual(day_length[0], sunset[0] - sunrise[0], delta=1)
+        self.assertEqual(format_duration(12 * 3600 + 9 * 60 + 30), '12h 09m')
+
+    def test_polar_night_has_no_sunrise(self):
+        sunrise, sunset, day_length = solar_times([78.22, 0], [15.65, 0], date(2024, 12, 21))
+        self.assertTrue(np.isnan(sunrise[0]) and np.isnan(sunset[0]))
+        self.assertEqual(day_length[0], 0)
+        self.assertFalse(np.isnan(sunrise[1]))
+        self.assertEqual(format_local_time(None, 0), '--:--')
+
+    def test_calendar_matches_direct_computation(self):
+        country = Country.objects.create(name='Ukraine', slug='ukraine', code='UA')
+        city = City.objects.create(name='Kyiv', slug='kyiv', lat=50.45, lon=30.52, country=country)
+        day = date(2024, 6, 21)
+        times = SolarCalendar().get(city, day)
+        sunrise, sunset, _ = solar_times([city.lat], [city.lon], day)
+        self.assertEqual((times.sunrise, times.sunset), (int(sunrise[0]), int(sunset[0])))
+
+    def test_snapshot_dto_takes_sun_times_from_the_calendar(self):
+        country = Country.objects.create(name='Ukraine', slug='ukraine', code='UA')
+        city = City.objects.create(name='Kyiv', slug='kyiv', lat=50.45, lon=30.52, country=country, utc_offset=7200)
+        snapshot = WeatherSnapshot.objects.create(city=city, condition='Clear', icon='01d', temperature=20,
+                                                  wind_speed=2, humidity=40, observed=timezone.now())
+        times = SolarCalendar().get(city)
+        self.assertEqual(snapshot.to_dto().time_info.sunrise, format_local_time(times.sunrise, 7200))
+
+
+class CityIndexTestCase(TestCase):
+    def setUp(self):
+        self.country = Country.objects.create(name='Ukraine', slug='ukraine', code='UA')
+        self.kyiv = City.objects.create(name='Kyiv', slug='kyiv', lat=50.45, lon=30.52, country=self.country)
+        self.lviv = City.objects.create(name='Lviv', slug='lviv', lat=49.84, lon=24.03, country=self.country)
+
+    def test_tree_matches_brute_force(self):
+        rng = np.random.default_rng(7)
+        lat, lon = rng.uniform(-90, 90, 500), rng.uniform(-180, 180, 500)
+        points = to_unit_vectors(lat, lon)
+        tree = KDTree(points, list(range(500)), leaf_size=8)
+        point = to_unit_vectors([10], [20])[0]
+        expected = np.argsort(np.linalg.norm(points - point, axis=1))[:10]
+        self.assertEqual([city_id for _, city_id in tree.query(point, 10, 2.0)], list(expected))
+
+    def test_nearest_respects_distance_and_exclude(self):
+        index = CityIndex()
+        self.assertEqual([city_id for city_id, _ in index.nearest(50.4, 30.5, k=2)], [self.kyiv.id, self.lviv.id])
+        self.assertEqual([city_id for city_id, _ in index.nearest(50.4, 30.5, k=2, max_distance=100)], [self.kyiv.id])
+        self.assertEqual(index.nearest(50.4, 30.5, k=1, exclude=self.kyiv.id)[0][0], self.lviv.id)
+        distance = index.nearest(49.84, 24.03, k=1)[0][1]
+        self.assertAlmostEqual(distance, haversine(49.84, 24.03, self.lviv.lat, self.lviv.lon), delta=0.1)
+
+    def test_saved_city_is_updated_without_rebuild(self):
+        index = CityIndex()
+        index.nearest(50.4, 30.5)
+        with mock.patch('weather.geo.city_index', index), \
+                mock.patch('weather.signals.city_index', index), \
+                mock.patch.object(CityIndex, '_build_tree', side_effect=AssertionError('rebuilt')):
+            self.lviv.lat, self.lviv.lon = 50.5, 30.6
+            self.lviv.save()
+            odesa = City.objects.create(name='Odesa', slug='odesa', lat=46.48, lon=30.72, country=self.country)
+            self.kyiv.delete()
+            self.assertEqual([city_id for city_id, _ in index.nearest(50.4, 30.5, k=2)], [self.lviv.id, odesa.id])
+            self.assertEqual([city_id for city_id, _ in index.within_radius(50.4, 30.5, 50)], [self.lviv.id])
+
+    def test_forgotten_city_is_recomputed(self):
+        calendar = SolarCalendar()
+        day = date(2024, 6, 21)
+        before = calendar.get(self.kyiv, day)
+        lviv = SolarCalendar().get(self.lviv, day)
+        with mock.patch('weather.signals.solar_calendar', calendar), \
+                mock.patch.object(SolarCalendar, '_build_table', side_effect=AssertionError('rebuilt')):
+            self.kyiv.lat = 60.0
+            self.kyiv.save()
+            after = calendar.get(self.kyiv, day)
+            self.assertEqual(calendar.get(self.lviv, day), lviv)
+        self.assertGreater(after.day_length, before.day_length)
+
+
+class QuotaManagerTestCase(TestCase):
+    def setUp(self):
+        self.manager = QuotaManager({'upstream': {'per_minute': 5, 'per_day': 100}}, max_wait=0)
+
+    def test_tokens_run_out_and_shed_requests_are_counted(self):
+        for _ in range(5):
+            self.manager.acquire('upstream')
+        with self.assertRaises(QuotaExceededError):
+            self.manager.acquire('upstream')
+        quota = ApiQuota.objects.get(name='upstream')
+        self.assertEqual((quota.used_today, quota.shed_today), (5, 1))
+
+    def test_tokens_refill_over_time(self):
+        for _ in range(5):
+            self.manager.acquire('upstream')
+        ApiQuota.objects.filter(name='upstream').update(refilled=F('refilled') - 12)
+        self.manager.acquire('upstream')
+        with self.assertRaises(QuotaExceededError):
+            self.manager.acquire('upstream')
+
+    def test_background_requests_leave_a_reserve(self):
+        for _ in range(4):
+            self.manager.acquire('upstream', priority=BACKGROUND)
+        with self.assertRaises(QuotaExceededError):
+            self.manager.acquire('upstream', priority=BACKGROUND)
+        self.manager.acquire('upstream')
+
+    def test_daily_limit(self):
+        with self.manager.override({'upstream': {'per_minute': 60, 'per_day': 2}}):
+            self.manager.acquire('upstream')
+            self.manager.acquire('upstream')
+            with self.assertRaises(QuotaExceededError):
+                self.manager.acquire('upstream')
+            self.assertEqual(self.manager.usage()[0]['used_today'], 2)
+
+    def test_unknown_quota_is_unlimited(self):
+        for _ in range(10):
+            self.manager.acquire('other')
+        self.assertFalse(ApiQuota.objects.filter(name='other').exists())
+
+
+class SingleFlightTestCase(TestCase):
+    def run_concurrently(self, func, count=5):
+        flight, started, release = SingleFlight(), threading.Event(), threading.Event()
+        calls, results, errors = [], [], []
+
+        def leader_func():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return func()
+
+        def worker():
+            try:
+                results.append(flight.do('key', leader_func))
+            except ValueError as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=worker) for _ in range(count)]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(flight._calls, {})
+        return len(calls), results, errors
+
+    def test_concurrent_calls_share_one_result(self):
+        self.assertEqual(self.run_concurrently(lambda: 42), (1, [42] * 5, []))
+
+    def test_errors_reach_every_waiter(self):
+        def func():
+            raise ValueError('upstream failed')
+
+        calls, results, errors = self.run_concurrently(func)
+        self.assertEqual((calls, results, len(errors)), (1, [], 5))
+
+
+class DatabaseLockTestCase(TransactionTestCase):
+    def test_lock_is_exclusive_and_expires(self):
+        with DatabaseLock('key', timeout=30, poll_interval=0.01):
+            with self.assertRaises(TimeoutError):
+                with DatabaseLock('key', timeout=0, poll_interval=0.01):
+                    pass
+            UpstreamLock.objects.update(expires=timezone.now() - timezone.timedelta(seconds=1))
+            with DatabaseLock('key', timeout=30, poll_interval=0.01):
+                pass
+        self.assertFalse(UpstreamLock.objects.exists())
+
+
+class WeatherHistoryStoreTestCase(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = WeatherHistoryStore(Path(directory.name), raw_retention=DAY, hourly_retention=3 * DAY)
+        self.start = 100 * DAY
+        for index in range(5 * 24 * 6):
+            self.store.append(1, self.start + index * 600, temperature=index % 24, humidity=50, wind_speed=index % 7)
+
+    def test_out_of_order_samples_are_rejected(self):
+        self.assertFalse(self.store.append(1, self.start, 1, 1, 1))
+        self.assertTrue(self.store.append(2, self.start, 1, 1, 1))
+        self.assertEqual(sorted(self.store.city_ids()), [1, 2])
+
+    def test_downsampling_keeps_aggregates(self):
+        end = self.start + 5 * DAY
+        before = self.store.aggregate(1, self.start, end)
+        self.store.downsample(1, now=end)
+        self.assertEqual(self.store._read(1, 'raw').size, 24 * 6)
+        self.assertEqual(self.store._read(1, 'hour').size, 2 * 24)
+        self.assertEqual(self.store._read(1, 'day').size, 2)
+
+        after = self.store.aggregate(1, self.start, end)
+        for metric, stats in before.items():
+            for stat, value in stats.items():
+                self.assertAlmostEqual(after[metric][stat], value, places=3)
+
+        self.store.downsample(1, now=end + DAY)
+        self.assertEqual(self.store._read(1, 'raw').size, 0)
+        self.assertEqual(self.store._read(1, 'day').size, 3)
+        self.assertAlmostEqual(self.store.aggregate(1, self.start, end)['temperature']['mean'],
+                               before['temperature']['mean'], places=3)
+
+    def test_series_buckets(self):
+        series = self.store.series(1, self.start, self.start + 2 * HOUR, HOUR)
+        self.assertEqual(series['timestamp'], [self.start, self.start + HOUR])
+        self.assertEqual(series['temperature'], [2.5, 8.5])
+        self.assertEqual(series['humidity'], [50.0, 50.0])
+        self.assertIsNone(self.store.aggregate(3, self.start, self.start + DAY))
+
+
+class DescribedModelTestCase(TestCase):
+    def test_description_is_stored_compressed(self):
+        description = '<p>Kyiv is the capital of Ukraine.</p>' * 50
+        country = Country(name='Ukraine', slug='ukraine', code='UA')
+        country.description = description
+        country.save()
+        self.assertLess(len(country.description_zlib), len(description) // 10)
+        self.assertTrue(country.summary.startswith('Kyiv is the capital of Ukraine.'))
+        self.assertNotIn('<p>', country.summary)
+        self.assertLessEqual(len(country.summary), Country.SUMMARY_LENGTH)
+
+        self.assertEqual(Country.objects.get(pk=country.pk).description, description)
+        lean = Country.objects.lean().get(pk=country.pk)
+        self.assertIn('description_zlib', lean.get_deferred_fields())
+        self.assertEqual(lean.summary, country.summary)
+
+    def test_empty_description(self):
+        country = Country(name='Ukraine', slug='ukraine', code='UA')
+        country.description = None
+        self.assertEqual((country.description, country.description_zlib, country.summary), ('', b'', ''))
+
+
+class AlertEvaluatorTestCase(TestCase):
+    def setUp(self):
+        country = Country.objects.create(name='Ukraine', slug='ukraine', code='UA')
+        user = get_user_model().objects.create(username='user', email='user@example.com')
+        self.cities = [City.objects.create(name=name, slug=name.lower(), lat=lat, lon=30, country=country)
+                       for name, lat in (('Kyiv', 50), ('Odesa', 46), ('Poltava', 49))]
+        self.user_cities = [UserCity.objects.create(user=user, city=city) for city in self.cities]
+        for city, temperature in zip(self.cities[:2], (30, 10)):
+            WeatherSnapshot.objects.create(city=city, condition='Clear', icon='01d', temperature=temperature,
+                                           wind_speed=5, humidity=60, observed=timezone.now())
+
+    def subscribe(self, user_city, metric, lower=None, upper=None, is_active=True):
+        return AlertSubscription.objects.create(user_city=user_city, metric=metric, lower=lower, upper=upper,
+                                                is_active=is_active)
+
+    def test_only_breached_thresholds_notify_once_per_window(self):
+        hot = self.subscribe(self.user_cities[0], AlertSubscription.TEMPERATURE, upper=25)
+        self.subscribe(self.user_cities[1], AlertSubscription.TEMPERATURE, lower=0, upper=25)
+        windy = self.subscribe(self.user_cities[1], AlertSubscription.WIND_SPEED, upper=3)
+        self.subscribe(self.user_cities[0], AlertSubscription.HUMIDITY, lower=80, is_active=False)
+        self.subscribe(self.user_cities[2], AlertSubscription.TEMPERATURE, upper=-50)
+
+        evaluator = AlertEvaluator(window=3600, max_age=600)
+        self.assertEqual(evaluator.evaluate(), 2)
+        self.assertEqual(sorted(AlertNotification.objects.values_list('subscription_id', 'value')),
+                         [(hot.id, 30.0), (windy.id, 5.0)])
+        evaluator.evaluate()
+        self.assertEqual(AlertNotification.objects.count(), 2)
+
+    def test_wind_thresholds_use_the_stored_unit(self):
+        self.assertEqual(dict(AlertSubscription.METRIC_CHOICES)[AlertSubscription.WIND_SPEED], 'Wind, m/s')
+        calm = self.subscribe(self.user_cities[0], AlertSubscription.WIND_SPEED, upper=10)
+        self.assertEqual(AlertEvaluator(window=3600, max_age=600).evaluate(), 0)
+        AlertSubscription.objects.filter(id=calm.id).update(upper=4.5)
+        self.assertEqual(AlertEvaluator(window=3600, max_age=600).evaluate(), 1)
+        self.assertEqual(AlertNotification.objects.get().value, 5.0)
+
+    def test_stale_readings_are_ignored(self):
+        self.subscribe(self.user_cities[0], AlertSubscription.TEMPERATURE, upper=25)
+        WeatherSnapshot.objects.update(created=timezone.now() - timezone.timedelta(hours=1))
+        self.assertEqual(AlertEvaluator(window=3600, max_age=600).evaluate(), 0)
+
+
+def openweather_item(weather_id, lat, lon, temperature=15.5, timestamp=1685369142, utc_offset=7200):
+    return {'coord': {'lon': lon, 'lat': lat}, 'sys': {'country': 'UA', 'sunrise': 1685325352, 'sunset': 1685383770},
+            'timezone': utc_offset, 'weather': [{'main': 'Clear', 'icon': '01d'}],
+            'main': {'temp': temperature, 'humidity': 50}, 'wind': {'speed': 2.1}, 'dt': timestamp,
+            'id': weather_id, 'name': f'City {weather_id}'}
+
+
+class StubOpenWeather:
+    def __init__(self, failing_ids=()):
+        self.urls = []
+        self.failing_ids = set(failing_ids)
+        self._lock = threading.Lock()
+
+    def __call__(self, url, timeout=None):
+        with self._lock:
+            self.urls.append(url)
+        query = dict(part.split('=', 1) for part in url.split('?', 1)[1].split('&'))
+        if 'id' in query:
+            ids = [int(weather_id) for weather_id in query['id'].split(',')]
+            if self.failing_ids & set(ids):
+                return http_response(500, {'message': 'Internal error'})
+            return http_response(200, {'cnt': len(ids), 'list': [openweather_item(weather_id, 50, 30)
+                                                                 for weather_id in ids]})
+        lat, lon = float(query['lat']), float(query['lon'])
+        return http_response(200, openweather_item(int(lat * 1000), lat, lon))
+
+    def calls(self, kind):
+        return [url for url in self.urls if f'/{kind}?' in url]
+
+
+def openweather_dto(weather_id, lat=50, lon=30):
+    return parse_weather_json(openweather_item(weather_id, lat, lon))
+
+
+class BatchWeatherServiceTestCase(TestCase):
+    def setUp(self):
+        country = Country.objects.create(name='Ukraine', slug='ukraine', code='UA')
+        self.cities = City.objects.bulk_create(
+            City(name=f'City {index}', slug=f'city-{index}', lat=40 + index * 0.1, lon=20 + index * 0.1,
+                 weather_id=1000 + index, country=country) for index in range(45))
+        self.cities += City.objects.bulk_create(
+            [City(name='Duplicate', slug='duplicate', lat=60, lon=20, weather_id=1000, country=country),
+             City(name='Unknown', slug='unknown', lat=61.5, lon=25, country=country)])
+        patcher = mock.patch.object(quota_manager, '_quotas', {})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_weather(self, upstream):
+        with mock.patch('weather.services.session.get', side_effect=upstream):
+            return BatchWeatherService().get_weather(self.cities, 'key', timeout=5)
+
+    def test_cities_are_grouped_by_weather_id(self):
+        upstream = StubOpenWeather()
+        weather = self.get_weather(upstream)
+        group_sizes = [url.split('id=')[1].split('&')[0].count(',') + 1 for url in upstream.calls('group')]
+        self.assertEqual(sorted(group_sizes), [5, 20, 20])
+        self.assertEqual(len(upstream.calls('weather')), 1)
+        self.assertEqual(set(weather), {city.id for city in self.cities})
+        self.assertEqual(weather[self.cities[0].id], weather[self.cities[45].id])
+        self.assertEqual(weather[self.cities[46].id].city_id, 61500)
+        self.assertEqual((weather[self.cities[1].id].city_id, weather[self.cities[1].id].utc_offset), (1001, 7200))
+
+    def test_failed_group_only_loses_its_cities(self):
+        weather = self.get_weather(StubOpenWeather(failing_ids={1044}))
+        self.assertEqual(len(weather), 47 - 5)
+        self.assertNotIn(self.cities[44].id, weather)
+        self.assertIn(self.cities[46].id, weather)
+
+
+class WeatherPrefetcherTestCase(TestCase):
+    def setUp(self):
+        country = Country.objects.create(name='Ukraine', slug='ukraine', code='UA')
+        user = get_user_model().objects.create(username='tracker', email='tracker@example.com')
+        self.tracked = City.objects.bulk_create(
+            City(name=f'City {index}', slug=f'city-{index}', lat=40 + index, lon=20 + index,
+                 weather_id=1000 + index if index % 2 else None, country=country) for index in range(5))
+        self.untracked = City.objects.create(name='Quiet', slug='quiet', lat=10, lon=10, country=country)
+        UserCity.objects.bulk_create(UserCity(user=user, city=city) for city in self.tracked)
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.history = WeatherHistoryStore(Path(directory.name))
+        for patcher in (mock.patch('weather.prefetch.history_store', self.history),
+                        mock.patch.object(quota_manager, '_quotas', {})):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.prefetcher = WeatherPrefetcher(BatchWeatherService(), 'key', calls_per_minute=60, timeout=5,
+                                            batch_size=3)
+
+    def test_refresh_saves_snapshots_city_info_and_history(self):
+        upstream = StubOpenWeather()
+        with mock.patch('weather.services.session.get', side_effect=upstream), \
+                mock.patch('weather.prefetch.time.sleep'):
+            self.assertEqual(self.prefetcher.refresh(), 5)
+
+        self.assertEqual(set(WeatherSnapshot.objects.values_list('city_id', flat=True)),
+                         {city.id for city in self.tracked})
+        self.assertEqual(len(upstream.calls('weather')), 3)
+        cities = City.objects.in_bulk([city.id for city in self.tracked])
+        self.assertEqual(cities[self.tracked[0].id].weather_id, 40000)
+        self.assertEqual(cities[self.tracked[1].id].weather_id, 1001)
+        self.assertTrue(all(city.utc_offset == 7200 for city in cities.values()))
+        self.assertEqual(sorted(self.history.city_ids()), sorted(cities))
+
+    def test_throttle_spaces_calls(self):
+        self.assertEqual(self.prefetcher._count_calls(self.tracked), 1 + 3)
+        with mock.patch('weather.prefetch.time.monotonic', return_value=100.0), \
+                mock.patch('weather.prefetch.time.sleep') as sleep:
+            self.prefetcher._throttle(4)
+            sleep.assert_not_called()
+            self.prefetcher._throttle(1)
+            sleep.assert_called_once_with(4.0)
+
+    def test_unchanged_city_info_is_not_written(self):
+        weather = {self.tracked[1].id: openweather_dto(1001)}
+        City.objects.filter(id=self.tracked[1].id).update(utc_offset=7200)
+        city = City.objects.get(id=self.tracked[1].id)
+        with self.assertNumQueries(0):
+            WeatherPrefetcher._save_city_info([city], weather)
+
+    def test_prune_removes_old_snapshots(self):
+        for city in self.tracked[:2]:
+            WeatherSnapshot.objects.create(city=city, condition='Clear', icon='01d', temperature=1, wind_speed=1,
+                                           humidity=1, observed=timezone.now())
+        WeatherSnapshot.objects.filter(city=self.tracked[0]).update(
+            created=timezone.now() - timezone.timedelta(hours=2))
+        self.assertEqual(self.prefetcher.prune(max_age=3600), 1)
+        self.assertEqual(list(WeatherSnapshot.objects.values_list('city_id', flat=True)), [self.tracked[1].id])
+
+
+@mock.patch('weather.tasks.enrichment_executor.submit')
+class UserCityListViewTestCase(TestCase):
+    def setUp(self):
+        patcher = mock.patch('weather.tasks._queued_forecasts', set())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = get_user_model().objects.create(username='lister', email='lister@example.com')
+        Profile(user=self.user, gender='female', date_of_birth=date(1990, 1, 1), bio='', info='').save()
+        self.client.force_login(self.user)
+        self.ukraine = Country.objects.create(name='Ukraine', slug='ukraine', code='UA')
+        self.poland = Country.objects.create(name='Poland', slug='poland', code='PL')
+
+    def add_cities(self, country, count):
+        cities = City.objects.bulk_create(
+            City(name=f'{country.name} {index}', slug=f'{country.slug}-{index}', lat=index,
+                 lon=country.id + index, country=country) for index in range(count))
+        UserCity.objects.bulk_create(UserCity(user=self.user, city=city) for city in cities)
+        WeatherSnapshot.objects.bulk_create(
+            WeatherSnapshot(city=city, condition='Clear', icon='01d', temperature=1, wind_speed=1, humidity=1,
+                            observed=timezone.now()) for city in cities)
+
+    def test_query_count_does_not_grow_with_cities(self, submit):
+        for count in (2, 20):
+            self.add_cities(self.ukraine, count // 2)
+            self.add_cities(self.poland, count // 2)
+            with self.assertNumQueries(9):
+                response = self.client.get(reverse('weather:user_city_list'))
+            self.assertEqual(len(response.context['user_cities']), count)
+            UserCity.objects.all().delete()
+            City.objects.all().delete()
+
+    def test_facets_count_all_countries_under_a_filter(self, submit):
+        self.add_cities(self.ukraine, 3)
+        self.add_cities(self.poland, 2)
+        other = get_user_model().objects.create(username='other', email='other@example.com')
+        UserCity.objects.create(user=other, city=City.objects.filter(country=self.poland).first())
+
+        for country in ('ukraine', str(self.ukraine.id)):
+            response = self.client.get(reverse('weather:user_city_list'), {'country': country})
+            self.assertEqual({user_city.city.country_id for user_city in response.context['user_cities']},
+                             {self.ukraine.id})
+            self.assertEqual([(facet['city__country__slug'], facet['count'])
+                              for facet in response.context['country_facets']],
+                             [('poland', 2), ('ukraine', 3)])
+            self.assertEqual(response.context['query_string'], f'&country={country}')
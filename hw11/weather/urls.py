@@ -8,9 +8,17 @@ app_name = 'weather'
 
 urlpatterns = [
     path('today/', views.CityWeatherView.as_view(), name='today'),
+    path('cities/autocomplete/', views.CityAutocompleteView.as_view(), name='city_autocomplete'),
     path('user/city/create/', views.UserCityCreateView.as_view(), name='user_city_create'),
+    path('user/city/import/', views.UserCityImportView.as_view(), name='user_city_import'),
     path('user/city/list/', views.UserCityListView.as_view(), name='user_city_list'),
     path('user/city/delete/', views.UserCityBulkDeleteView.as_view(), name='user_city_delete'),
-    path('user/city_detail/<str:city>/', views.UserCityDetailView.as_view(), name='city_detail'),
-    path('user/country_detail/<str:country>/', views.UserCountryDetailView.as_view(), name='country_detail'),
+    path('user/city_detail/<slug:slug>/', views.UserCityDetailView.as_view(), name='city_detail'),
+    path('user/city_forecast/<slug:slug>/', views.UserCityForecastView.as_view(), name='city_forecast'),
+    path('user/forecast.json', views.UserForecastJsonView.as_view(), name='user_forecast_json'),
+    path('user/city_detail/<slug:slug>/alerts/', views.AlertSubscriptionCreateView.as_view(), name='alert_create'),
+    path('user/alerts/<int:pk>/delete/', views.AlertSubscriptionDeleteView.as_view(), name='alert_delete'),
+    path('user/notifications/', views.UserNotificationListView.as_view(), name='notification_list'),
+    path('quota.json', views.QuotaUsageView.as_view(), name='quota_usage'),
+    path('user/country_detail/<slug:slug>/', views.UserCountryDetailView.as_view(), name='country_detail'),
 ]
@@ -1,17 +1,30 @@
+import time
+from datetime import datetime
 from urllib.parse import urlencode
 
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db.models import Count
+from django.http import JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.utils.text import slugify
 from django.views import View
 from django.views.generic import ListView
 
-from .forms import CityWeatherForm
-from .models import Country, City, UserCity
-from .services import WeatherTodayService, ResponseException, CountryFacade, RestcountriesService, GeonamesService, \
-    WikiService, WikiFacade
+from .deadline import Deadline
+from .forms import CityWeatherForm, AlertSubscriptionForm, CityImportForm, UserCityForm
+from .forecast import forecast_provider
+from .gazetteer import gazetteer
+from .importer import city_importer, parse_rows, CityImportError
+from .geo import city_index
+from .singleflight import upstream_flight
+from .solar import solar_calendar, format_local_time, format_duration
+from .quota import quota_manager
+from .tasks import enqueue_city_enrichment, enqueue_forecast_refresh
+from .history import history_store, HOUR, DAY
+from .models import Country, City, UserCity, WeatherSnapshot, AlertSubscription, AlertNotification
+from .services import ResponseException, weather_today_service
 
 
 class CityWeatherView(View):
@@ -25,91 +38,89 @@ class CityWeatherView(View):
 
         if form.is_valid():
             api_key = settings.WEATHER_API_KEY
-            city = form.clean_city()
-
-            weather_service = WeatherTodayService()
-            try:
-                weather = weather_service.get_weather(city, api_key)
-            except ResponseException as exception:
-                messages.error(request, str(exception))
-                return redirect('weather:today')
+            city = form.cleaned_data['city']
+            place = form.cleaned_data['place']
+            deadline = Deadline(settings.WEATHER_REQUEST_BUDGET)
+
+            weather = self._get_snapshot_weather(city, place, max_age=settings.WEATHER_SNAPSHOT_MAX_AGE)
+            if weather is None:
+                try:
+                    if place is not None:
+                        weather = upstream_flight.do(f'weather:{place.id}', weather_today_service.get_weather_by_id,
+                                                     place.id, api_key, deadline=deadline)
+                    else:
+                        weather = upstream_flight.do(f'weather:{city}', weather_today_service.get_weather,
+                                                     city, api_key, deadline=deadline)
+                except ResponseException as exception:
+                    weather = self._get_snapshot_weather(city, place)
+                    if weather is None:
+                        messages.error(request, str(exception))
+                        return redirect('weather:today')
+                    messages.warning(request, 'Weather service is not responding, showing the last known weather.')
 
         form = CityWeatherForm()
         return render(request, 'weather/today.html', {'form': form, 'weather': weather})
 
+    def _get_snapshot_weather(self, city_name, place, max_age=None):
+        cities = City.objects.lean()
+        if place is not None:
+            city = cities.filter(weather_id=place.id).first()
+        else:
+            city = cities.filter(name=city_name).first()
+        if city is None:
+            return None
+
+        snapshot = WeatherSnapshot.objects.latest_for_cities([city.id]).get(city.id)
+        if snapshot is None or max_age is not None and not snapshot.is_fresh(max_age):
+            return None
+        return snapshot.to_dto()
+
+
+class CityAutocompleteView(View):
+    def get(self, request):
+        cities = gazetteer.complete(request.GET.get('q', ''), limit=10)
+        return JsonResponse({'cities': [city._asdict() for city in cities]})
+
 
 class UserCityCreateView(LoginRequiredMixin, View):
     def post(self, request):
         user = request.user
-        api_key = settings.COUNTRY_API_KEY
-
-        city = request.POST.get('city')
-        country_code = request.POST.get('country_code')
-        lon = float(request.POST.get('lon'))
-        lat = float(request.POST.get('lat'))
 
-        country = self._get_country_or_create(country_code, api_key)
-        if country is None:
-            messages.error(request, 'Something went wrong with get country data')
+        form = UserCityForm(request.POST)
+        if not form.is_valid():
+            messages.error(request, ' '.join(error for errors in form.errors.values() for error in errors))
             return redirect('weather:today')
 
-        city = self._get_city_or_create(city_name=city, country=country, lon=lon, lat=lat)
-        if city is None:
-            messages.error(request, 'Something went wrong with get city data')
-            return redirect('weather:today')
+        country = form.cleaned_data['country']
+        city = self._get_city_or_create(city_name=form.cleaned_data['city'], country=country,
+                                        lon=form.cleaned_data['lon'], lat=form.cleaned_data['lat'])
+
+        if not (country.is_enriched and city.is_enriched):
+            enqueue_city_enrichment(city.id)
 
         if self._check_user_city_exists(user=user, city=city):
             messages.warning(request, f'City {city.name} is already in your list')
             return redirect('weather:today')
 
         self._create_user_city(user=user, city=city)
-        messages.success(request, f'Country {country.name} and city {city.name} successfully added')
+        messages.success(request, f'City {city.name} successfully added')
         return redirect('weather:today')
 
-    def _get_country_or_create(self, country_code, api_key):
-        country = Country.objects.filter(code=country_code).first()
-        if country is not None:
-            return country
-
-        country_facade = CountryFacade(country_services=[RestcountriesService(), GeonamesService()],
-                                       wiki_service=WikiService())
-        country_dto = country_facade.get_country_data(api_key=api_key, code=country_code)
-
-        if not country_facade.is_valid():
-            return None
-
-        country = Country.objects.filter(name=country_dto.name).first()
-        if country is not None:
-            return country
-
-        country = Country.objects.create(name=country_dto.name,
-                                         slug=slugify(country_dto.name),
-                                         code=country_dto.code,
-                                         population=country_dto.population,
-                                         description=country_dto.description,
-                                         flag=country_dto.image,
-                                         capital=country_dto.capital)
-
-        return country
-
     def _get_city_or_create(self, city_name, country, lon, lat):
-        city = City.objects.filter(name=city_name).first()
+        city = City.objects.lean().filter(name=city_name).first()
         if city is not None:
             return city
 
-        wiki_facade = WikiFacade(wiki_service=WikiService())
-        wiki_dto = wiki_facade.get_page_data(city_name)
+        nearest = city_index.nearest(lat, lon, k=1, max_distance=settings.WEATHER_CITY_DEDUP_RADIUS)
+        if nearest:
+            city_id, _ = nearest[0]
+            return City.objects.lean().get(id=city_id)
 
-        if not wiki_facade.is_valid():
-            return None
-
-        city = City.objects.create(name=city_name,
-                                   slug=slugify(city_name),
-                                   description=wiki_dto.description,
-                                   image=wiki_dto.image,
-                                   lat=lat,
-                                   lon=lon,
-                                   country=country)
+        city, _ = City.objects.get_or_create(name=city_name,
+                                             defaults={'slug': slugify(city_name),
+                                                       'lat': lat,
+                                                       'lon': lon,
+                                                       'country': country})
         return city
 
     def _check_user_city_exists(self, user, city):
@@ -121,22 +132,58 @@ class UserCityCreateView(LoginRequiredMixin, View):
         return user_city
 
 
+class UserCityImportView(LoginRequiredMixin, View):
+    template_name = 'weather/city/user_city_import.html'
+
+    def get(self, request):
+        return render(request, self.template_name, {'form': CityImportForm()})
+
+    def post(self, request):
+        form = CityImportForm(request.POST, request.FILES)
+        results = []
+        if form.is_valid():
+            try:
+                rows = parse_rows(form.cleaned_data['data'], form.cleaned_data['format'])
+            except CityImportError as error:
+                form.add_error(None, str(error))
+            else:
+                results = city_importer.run(request.user, rows)
+                added = sum(result.status in (city_importer.CREATED, city_importer.ADDED) for result in results)
+                messages.success(request, f'Imported {added} of {len(results)} cities')
+        return render(request, self.template_name, {'form': form, 'results': results})
+
+
 class UserCityListView(LoginRequiredMixin, ListView):
     template_name = 'weather/city/user_city_list.html'
     context_object_name = 'user_cities'
-    paginate_by = 2
+    paginate_by = 50
+    max_paginate_by = 300
 
     def get_queryset(self):
-        queryset = UserCity.objects.filter(user=self.request.user)
+        queryset = (UserCity.objects
+                    .filter(user=self.request.user)
+                    .select_related('city__country')
+                    .defer('city__description_zlib', 'city__country__description_zlib')
+                    .order_by('city__name'))
         country = self.request.GET.get('country')
         if country:
-            queryset = queryset.filter(city__country__name=country)
+            if country.isdigit():
+                queryset = queryset.filter(city__country_id=country)
+            else:
+                queryset = queryset.filter(city__country__slug=country)
         return queryset
 
+    def get_paginate_by(self, queryset):
+        per_page = self.request.GET.get('per_page', '')
+        if per_page.isdigit() and int(per_page) > 0:
+            return min(int(per_page), self.max_paginate_by)
+        return self.paginate_by
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['page'] = context.pop('page_obj', None)
         context['country'] = self.request.GET.get('country')
+        context['country_facets'] = self._get_country_facets()
 
         query_params = self.request.GET.copy()
         query_params.pop('page', None)
@@ -146,8 +193,23 @@ class UserCityListView(LoginRequiredMixin, ListView):
             query_string = '&' + query_string
 
         context['query_string'] = query_string
+        self._attach_weather(context['user_cities'])
+        enqueue_forecast_refresh([user_city.city for user_city in context['user_cities']])
         return context
 
+    def _get_country_facets(self):
+        return list(UserCity.objects
+                    .filter(user=self.request.user)
+                    .values('city__country_id', 'city__country__name', 'city__country__slug')
+                    .annotate(count=Count('id'))
+                    .order_by('city__country__name'))
+
+    def _attach_weather(self, user_cities):
+        user_cities = list(user_cities)
+        snapshots = WeatherSnapshot.objects.latest_for_cities([user_city.city_id for user_city in user_cities])
+        for user_city in user_cities:
+            user_city.weather = snapshots.get(user_city.city_id)
+
 
 class UserCityBulkDeleteView(LoginRequiredMixin, View):
     def post(self, request):
@@ -168,22 +230,139 @@ class UserCityBulkDeleteView(LoginRequiredMixin, View):
 
 
 class UserCityDetailView(LoginRequiredMixin, View):
-    def get(self, request, city):
+    def get(self, request, slug):
         template_name = 'weather/city/user_city_detail.html'
-        city_info = City.objects.get(name=city)
-        print(city_info.name)
-        if city:
-            return render(request,template_name , {'city_info': city_info})
+        city_info = get_object_or_404(City.objects.lean().select_related('country')
+                                      .defer('country__description_zlib'), slug=slug)
+        weather = WeatherSnapshot.objects.latest_for_cities([city_info.id]).get(city_info.id)
+        history = self._get_history(city_info.id)
+        nearby_cities = self._get_nearby_cities(city_info)
+        alerts = AlertSubscription.objects.filter(user_city__user=request.user, user_city__city=city_info)
+        return render(request, template_name, {'city_info': city_info, 'weather': weather,
+                                               'nearby_cities': nearby_cities, 'alerts': alerts,
+                                               'sun': self._get_sun_times(city_info),
+                                               'alert_form': AlertSubscriptionForm(),
+                                               'page_cache_timeout': settings.WEATHER_PAGE_CACHE_TIMEOUT, **history})
+
+    def _get_sun_times(self, city):
+        solar_times = solar_calendar.get(city)
+        utc_offset = city.get_utc_offset()
+        return {
+            'sunrise': format_local_time(solar_times.sunrise, utc_offset),
+            'sunset': format_local_time(solar_times.sunset, utc_offset),
+            'day_length': format_duration(solar_times.day_length),
+        }
+
+    def _get_nearby_cities(self, city):
+        nearest = city_index.nearest(city.lat, city.lon, k=5, max_distance=settings.WEATHER_NEARBY_RADIUS,
+                                     exclude=city.id)
+        cities = (City.objects
+                  .select_related('country')
+                  .defer('description_zlib', 'country__description_zlib')
+                  .in_bulk([city_id for city_id, _ in nearest]))
+        return [(cities[city_id], distance) for city_id, distance in nearest if city_id in cities]
+
+    def _get_history(self, city_id):
+        now = int(time.time())
+        periods = (('Last 24 hours', DAY), ('Last 7 days', 7 * DAY), ('Last 30 days', 30 * DAY),
+                   ('Last year', 365 * DAY))
+        history_stats = [(label, history_store.aggregate(city_id, now - period, now)) for label, period in periods]
+        return {
+            'history_stats': [(label, stats) for label, stats in history_stats if stats is not None],
+            'history_series': history_store.series(city_id, now - 7 * DAY, now, step=HOUR),
+        }
+
+
+class AlertSubscriptionCreateView(LoginRequiredMixin, View):
+    def post(self, request, slug):
+        user_city = get_object_or_404(UserCity.objects.select_related('city'), user=request.user, city__slug=slug)
+        form = AlertSubscriptionForm(request.POST)
+        if form.is_valid():
+            alert = form.save(commit=False)
+            alert.user_city = user_city
+            alert.save()
+            messages.success(request, f'Alert for {user_city.city} successfully added')
         else:
-            return render(request, 'error.html', {'error': '404'})
+            messages.error(request, ' '.join(error for errors in form.errors.values() for error in errors))
+        return redirect('weather:city_detail', slug=slug)
+
+
+class AlertSubscriptionDeleteView(LoginRequiredMixin, View):
+    def post(self, request, pk):
+        alert = get_object_or_404(AlertSubscription.objects.select_related('user_city__city'),
+                                  id=pk, user_city__user=request.user)
+        alert.delete()
+        messages.success(request, 'Alert successfully deleted')
+        return redirect('weather:city_detail', slug=alert.user_city.city.slug)
+
+
+class UserNotificationListView(LoginRequiredMixin, ListView):
+    template_name = 'weather/city/user_notification_list.html'
+    context_object_name = 'notifications'
+    paginate_by = 50
+
+    def get_queryset(self):
+        return (AlertNotification.objects
+                .filter(subscription__user_city__user=self.request.user)
+                .select_related('subscription__user_city__city'))
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['page'] = context.pop('page_obj', None)
+        unread = [notification.id for notification in context['notifications'] if not notification.is_read]
+        AlertNotification.objects.filter(id__in=unread).update(is_read=True)
+        return context
+
+
+class UserCityForecastView(LoginRequiredMixin, View):
+    def get(self, request, slug):
+        city_info = get_object_or_404(City.objects.lean().select_related('country'), slug=slug)
+        forecast = forecast_provider.get_forecast(city_info, deadline=Deadline(settings.WEATHER_REQUEST_BUDGET))
+        return render(request, 'weather/city/user_city_forecast.html', {
+            'city_info': city_info,
+            'days': self._group_by_day(forecast) if forecast else [],
+        })
+
+    def _group_by_day(self, forecast):
+        days = {}
+        for item in forecast.items:
+            local_time = datetime.utcfromtimestamp(item.timestamp + forecast.timezone)
+            days.setdefault(local_time.date(), []).append((local_time.strftime('%H:%M'), item))
+        return list(days.items())
+
+
+class UserForecastJsonView(LoginRequiredMixin, View):
+    def get(self, request):
+        cities = City.objects.lean().filter(users__user=request.user).order_by('name')
+        city = request.GET.get('city')
+        if city:
+            cities = cities.filter(name=city)
+
+        cities = list(cities)
+        forecasts = forecast_provider.get_forecasts(cities, fetch=False)
+        enqueue_forecast_refresh(cities)
+        return JsonResponse({
+            'forecasts': [
+                {
+                    'city': city.name,
+                    'timezone': forecasts[city.id].timezone,
+                    'items': [item._asdict() for item in forecasts[city.id].items],
+                }
+                for city in cities if city.id in forecasts
+            ],
+            'pending': [city.name for city in cities if city.id not in forecasts],
+        })
+
+
+class QuotaUsageView(LoginRequiredMixin, View):
+    def get(self, request):
+        return JsonResponse({'quotas': quota_manager.usage()})
 
 
 class UserCountryDetailView(LoginRequiredMixin, View):
-    def get(self, request, country):
+    def get(self, request, slug):
         template_name = 'weather/city/user_country_detail.html'
-        country_info = Country.objects.get(name=country)
-        print(country_info.name)
-        if country_info:
-            return render(request,template_name , {'country_info': country_info})
-        else:
-            return render(request, 'error.html', {'error': '404'})
+        country_info = get_object_or_404(Country.objects.lean(), slug=slug)
+        cities = country_info.cities.only('name', 'slug')
+        return render(request, template_name, {'country_info': country_info, 'cities': cities,
+                                               'page_cache_timeout': settings.WEATHER_PAGE_CACHE_TIMEOUT})